@@ -5,27 +5,54 @@
 from __future__ import annotations
 
 import copy
+import sys
 from collections import OrderedDict  # noqa
 from collections.abc import Callable
 from collections.abc import Iterable
 from functools import partial
 from typing import Any
+from typing import Literal
 from typing import NoReturn
 from typing import TypeVar
 from typing import cast
+from typing import overload
 
 from duper import _msg
+from duper import metrics
+from duper.adaptive import deepcopy  # noqa: F401
+from duper.adaptive import install  # noqa: F401
+from duper.adaptive import uninstall  # noqa: F401
 from duper.constants import BUILTIN_COLLECTIONS
 from duper.constants import BUILTIN_MUTABLE
 from duper.constants import IMMUTABLE_NON_COLLECTIONS
 from duper.constants import IMMUTABLE_TYPES
 from duper.constants import BuiltinCollectionType
 from duper.constants import BuiltinMutableType
+from duper.factories.ast import ast_batch_factory
 from duper.factories.ast import ast_factory
+from duper.factories.ast import ast_many_factory
+from duper.factories.ast import ast_memo_factory
+from duper.factories.ast import isolate
+from duper.factories.bytecode import bytecode_factory  # noqa: F401
+from duper.factories.cache import DiskCache  # noqa: F401
+from duper.factories.incremental import SPLIT_TYPES
+from duper.factories.incremental import RefreshableFactory  # noqa: F401
+from duper.factories.incremental import Shared
+from duper.factories.incremental import collect_split
+from duper.factories.lazy import LazyDict  # noqa: F401
+from duper.factories.lazy import LazyList  # noqa: F401
+from duper.factories.lazy import LazyTemplate
+from duper.factories.registry import SHARE  # noqa: F401
+from duper.factories.registry import emitters
+from duper.factories.registry import register  # noqa: F401
+from duper.factories.registry import share  # noqa: F401
 from duper.factories.runtime import debunk_reduce
 from duper.factories.runtime import get_reduce
+from duper.factories.runtime import produce_batch
 from duper.factories.runtime import reconstruct_copy
 from duper.factories.runtime import returns
+from duper.factories.runtime import without_gc
+from duper.factories.shape import shape_factory  # noqa: F401
 
 
 T = TypeVar("T")
@@ -33,6 +60,7 @@ T = TypeVar("T")
 
 Constructor = Callable[[], T]
 Factory = Callable[[T], Constructor[T]]
+BatchConstructor = Callable[[int], list[T]]
 
 
 class Error(copy.Error, TypeError):
@@ -68,30 +96,36 @@ def fail(obj: T, _: Any, factory: Callable[[T], Callable[[], T]], error: Excepti
     ) from error
 
 
-def deepdups(
+def fallback_part(
+    fallback: Callable[..., Callable[[], T]],
+    factory: Callable[..., Any],
     obj: T,
-    /,
-    *,
-    factory: Callable[[T], Callable[[], T]] = ast_factory,
-    fallback: Callable[..., Callable[[], T]] = fail,
-    check: bool = True,
+    path: str,
+    error: Exception,
 ) -> Callable[[], T]:
     """
-    Finds the fastest way of deep-copying an object.
+    Falls back for a part of an object, so the rest of it is still reconstructed by the factory
+    """
+    part_error = Error(f"Can't reconstruct {path}: {error!r}")
+    part_error.__cause__ = error
+    metrics.fallback_part()
+    return fallback(obj, None, factory, part_error)
 
-    If object is immutable, it will be returned as is.
-    If it's an empty builtin collection, it will return its class (list, dict, etc.)
 
-    If obj is non-empty builtin collection, it will check if all values
+def isolating(
+    fallback: Callable[..., Callable[[], Any]], factory: Callable[..., Any]
+) -> Callable[[Any, str, Exception], Callable[[], Any]] | None:
+    """
+    Fallback for parts of an object, see duper.factories.ast.isolate()
 
-    Then it will check for __deepcopy__ method and will use it, if it's defined.
+    Failing part fails the whole object with `fail`, so it's not isolated
+    """
+    return None if fallback is fail else partial(fallback_part, fallback, factory)
 
-    Constructs a factory that knows how to reconstruct an object _fast_.
 
-    :param obj: object to reconstruct
-    :param factory: an internal factory that will do the work if we
-    :param fallback:
-    :param check:
+def find_shortcut(obj: T) -> Callable[[], T] | None:
+    """
+    Returns a constructor for objects that don't need a compiled factory
     """
     if (cls := cast(type[Any], type(obj))) in IMMUTABLE_NON_COLLECTIONS or issubclass(cls, type):
         return partial(returns, obj)
@@ -113,20 +147,211 @@ def deepdups(
         # seems like we can't speed things up here, unfortunately
         # being consistent with builtin deepcopy is better
         # than being just faster
-        if (cp := getattr(obj, "__deepcopy__", None)) is not None:
+        if cls not in emitters and (cp := getattr(obj, "__deepcopy__", None)) is not None:
             return partial(cp({}).__deepcopy__, {})
+    return None
+
+
+def deepdups(
+    obj: T,
+    /,
+    *,
+    factory: Callable[[T], Callable[[], T]] = ast_factory,
+    fallback: Callable[..., Callable[[], T]] = fail,
+    check: bool = True,
+) -> Callable[[], T]:
+    """
+    Finds the fastest way of deep-copying an object.
+
+    If object is immutable, it will be returned as is.
+    If it's an empty builtin collection, it will return its class (list, dict, etc.)
+
+    If obj is non-empty builtin collection, it will check if all values
+
+    Then it will check for __deepcopy__ method and will use it, if it's defined.
+
+    Constructs a factory that knows how to reconstruct an object _fast_.
+
+    :param obj: object to reconstruct
+    :param factory: an internal factory that will do the work if we
+    :param fallback: called on errors, returns a constructor to use instead.
+    Parts of obj that can't be reconstructed are copied by constructors it returns for them,
+    while the rest of obj is still compiled, unless fallback is `fail`
+    :param check:
+    """
+    if (shortcut := find_shortcut(obj)) is not None:
+        return shortcut
+
+    build = metrics.begin(type(obj))
+    previous = isolate(isolating(fallback, factory))
+    try:
+        compiled = factory(obj)
+        if check:
+            try:
+                with metrics.phase("check"):
+                    compiled()
+            except Exception as e:
+                raise Error("Cannot reconstruct this object, see details above") from e
+    except Exception as e:
+        if build is not None:
+            build.fallback = True
+        compiled = fallback(obj, None, factory, e)
+    finally:
+        isolate(previous)
+        metrics.end(build)
+    return cast(Callable[[], T], metrics.counted(compiled, build))
+
+
+def deepdups_batch(
+    obj: T,
+    /,
+    *,
+    factory: Callable[[T], BatchConstructor[T]] = ast_batch_factory,
+    fallback: Callable[..., Callable[[], T]] = fail,
+    check: bool = True,
+    pause_gc: bool = False,
+) -> BatchConstructor[T]:
+    """
+    Same as deepdups(), but returned function produces a list of n copies at once.
+
+    Copies are produced in a loop inside the compiled function, so there's no call overhead per copy.
+
+    >>> produce = deepdups_batch({"a": []})
+    >>> produce(2)
+    [{'a': []}, {'a': []}]
 
+    :param obj: object to reconstruct
+    :param factory: compiles a function that takes n and returns a list of n copies
+    :param fallback: called on errors, returns a single copy constructor to use instead
+    :param check: produce one copy right away to make sure reconstruction works
+    :param pause_gc: disable cyclic garbage collector while batch is being produced
+    """
+    build = metrics.begin(type(obj))
+    previous = isolate(isolating(fallback, factory))
     try:
         compiled = factory(obj)
-        if not check:
-            return compiled
+        if check:
+            try:
+                with metrics.phase("check"):
+                    compiled(1)
+            except Exception as e:
+                raise Error("Cannot reconstruct this object, see details above") from e
+    except Exception as e:
+        if build is not None:
+            build.fallback = True
+        compiled = partial(produce_batch, fallback(obj, None, factory, e))
+    finally:
+        isolate(previous)
+        metrics.end(build)
+    compiled = cast(BatchConstructor[T], metrics.counted(compiled, build, batch=True))
+
+    if pause_gc:
+        return partial(without_gc, compiled)
+    return compiled
+
+
+def deepdups_many(
+    objs: Iterable[T],
+    /,
+    *,
+    fallback: Callable[..., Callable[[], T]] = fail,
+    check: bool = True,
+) -> list[Callable[[], T]]:
+    """
+    Same as deepdups() for each object, but all factories are compiled at once.
+
+    Factories come from one generated module, compiled with a single compile() and exec() call,
+    so the fixed cost of compiling is paid once, instead of once per object.
+
+    >>> produce_a, produce_b = deepdups_many([{"a": []}, [{}]])
+    >>> produce_a(), produce_b()
+    ({'a': []}, [{}])
+
+    :param objs: objects to reconstruct
+    :param fallback: called on errors, returns a constructor to use instead
+    :param check: produce one copy of each object right away to make sure reconstruction works
+    """
+    objs = list(objs)
+    factories = [find_shortcut(obj) for obj in objs]
+    # phases of the shared module are recorded separately from the objects
+    build = metrics.begin(deepdups_many)
+    previous = isolate(isolating(fallback, ast_many_factory))
+    try:
+        compiled = iter(ast_many_factory([obj for obj, f in zip(objs, factories) if f is None]))
+    except Exception:
+        isolate(previous)
+        if build is not None:
+            build.fallback = True
+        metrics.end(build)
+        # some of the objects can't be reconstructed, so each one is compiled on its own
+        return [
+            f or deepdups(obj, fallback=fallback, check=check) for obj, f in zip(objs, factories)
+        ]
+    isolate(previous)
+    metrics.end(build)
+
+    for index, (obj, factory) in enumerate(zip(objs, factories)):
+        if factory is not None:
+            continue
+        factory = next(compiled)
+        build = metrics.begin(type(obj))
         try:
-            compiled()
+            if check:
+                try:
+                    with metrics.phase("check"):
+                        factory()
+                except Exception as e:
+                    raise Error("Cannot reconstruct this object, see details above") from e
         except Exception as e:
-            raise Error("Cannot reconstruct this object, see details above") from e
-        return compiled
-    except Exception as e:
-        return fallback(obj, None, factory, e)
+            if build is not None:
+                build.fallback = True
+            factory = fallback(obj, None, ast_many_factory, e)
+        finally:
+            metrics.end(build)
+        factories[index] = metrics.counted(factory, build)
+    return cast("list[Callable[[], T]]", factories)
+
+
+def lazydups(
+    obj: T,
+    /,
+    *,
+    factory: Callable[[T], Callable[[], T]] = ast_factory,
+    fallback: Callable[..., Callable[[], T]] = fail,
+    check: bool = True,
+) -> Callable[[], T]:
+    """
+    Same as deepdups(), but dicts and lists are copied lazily.
+
+    Copies are LazyDict and LazyList instances, their nested objects are built
+    by compiled factories on first access, so copies that are only partially read are cheap.
+    If any mutable object is referenced more than once, copies are built eagerly with deepdups().
+
+    Copies are not safe to pass to C code that reads list or dict storage directly,
+    e.g. heapq functions, list.__iter__(copy) or dict.values(copy): it gets placeholders
+    instead of items that weren't accessed yet, or fails on them.
+    Iteration, comparisons, sorted(), json and pickle build items first.
+    copy[:] and dict(copy) give plain containers of built items for such code.
+
+    >>> produce = lazydups({"a": [1], "b": {"c": []}})
+    >>> copy = produce()
+    >>> copy["a"].append(2)  # only "a" is built
+    >>> copy
+    {'a': [1, 2], 'b': {'c': []}}
+
+    :param obj: object to reconstruct
+    :param factory: compiles nested objects other than dicts and lists
+    :param fallback: called on errors, same as in deepdups()
+    :param check: same as in deepdups()
+    """
+    compile = partial(deepdups, factory=factory, fallback=fallback, check=check)
+    if cast(type[Any], type(obj)) not in SPLIT_TYPES:
+        return compile(obj)
+    try:
+        collect_split(obj, sys.maxsize, {})
+    except Shared:
+        return compile(obj)
+    return cast(Callable[[], T], LazyTemplate(cast("dict[Any, Any] | list[Any]", obj), compile))
 
 
 def deepdupe(
@@ -149,16 +374,22 @@ def deepdupe(
     >>> assert o == c
     >>> assert o["a"] is not c["a"]
 
+    When memo is given, copies are recorded in it and shared with other copies made with it,
+    same as in copy.deepcopy. Such copies are always made by ast_memo_factory(),
+    factory is not used.
+    It's not a fast path: a new function is compiled on each call, which takes tens of times longer
+    than copy.deepcopy(obj, memo). When the same object is copied with memo many times,
+    e.g. from __deepcopy__ methods, compile it once with ast_memo_factory(obj)
+    and call the result with memo instead.
 
     :return:
     """
-    if memo is not None:  # error: Local variable "memo" has inferred type None; add an annotation
-        return fallback(
-            obj,
-            memo,
-            factory,
-            NotImplementedError("Usage of memo is not supported."),
-        )()
+    if memo is not None:
+        try:
+            produce = ast_memo_factory(obj)
+        except Exception as e:
+            return fallback(obj, memo, ast_memo_factory, e)()
+        return produce(memo)
     return deepdups(obj, factory=factory, fallback=fallback)()
 
 
@@ -213,3 +444,29 @@ def dupe(obj: T) -> T:
     :return:
     """
     return dups(obj)()
+
+
+@overload
+def stats(format: Literal["dict"] = "dict") -> dict[str, Any]: ...
+
+
+@overload
+def stats(format: Literal["prometheus"]) -> str: ...
+
+
+def stats(format: str = "dict") -> dict[str, Any] | str:
+    """
+    Counters and timings of factories, recorded while duper.metrics are enabled
+
+    >>> duper.metrics.enable()
+    >>> produce = duper.deepdups({"a": [1]})
+    >>> duper.stats()["types"]["dict"]["builds"]
+    1
+
+    :param format: "dict" for a snapshot, or "prometheus" for Prometheus text exposition format
+    """
+    if format == "dict":
+        return metrics.snapshot()
+    if format == "prometheus":
+        return metrics.prometheus()
+    raise ValueError(f"Unknown stats format: {format!r}, expected 'dict' or 'prometheus'")
@@ -0,0 +1,60 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Command line interface
+
+python -m duper compile myapp.defaults:TEMPLATE -o myapp/produce_template.py
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+from collections.abc import Sequence
+from typing import Any
+
+from duper.factories.source import generate_module
+
+
+def import_object(target: str) -> Any:
+    """
+    Imports object by `module:attribute.path`
+    """
+    module, _, path = target.partition(":")
+    if not module or not path:
+        raise ValueError(f"Expected module:attribute, got {target!r}")
+    value: Any = importlib.import_module(module)
+    for attribute in path.split("."):
+        value = getattr(value, attribute)
+    return value
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m duper")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_command = commands.add_parser(
+        "compile", help="write a module with a function that produces copies of an object"
+    )
+    compile_command.add_argument("target", help="object to copy, as module:attribute")
+    compile_command.add_argument("-o", "--output", help="file to write, stdout if omitted")
+    compile_command.add_argument(
+        "-n", "--name", default="produce", help="name of generated function (default: produce)"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        source = generate_module(import_object(args.target), args.name, args.target)
+    except Exception as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+    if args.output is None:
+        sys.stdout.write(source)
+    else:
+        with open(args.output, "w") as file:
+            file.write(source)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
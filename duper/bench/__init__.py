@@ -0,0 +1,204 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Benchmarks of building and calling factories, compared to other ways of copying
+
+Each method is measured as two costs: one-time build, and a copy made afterwards.
+deepcopy() builds nothing, pickle and marshal dump the object once and load it for every copy,
+duper compiles a factory once and calls it for every copy.
+duper_adaptive is duper.deepcopy() of an object that became hot, so each copy includes
+the check that it wasn't changed, duper_adaptive_top checks only its top level.
+Break-even is the number of copies after which build of a method pays off against another.
+
+python -m duper.bench --sizes 10,1000 --shapes json,slotted -o results.json
+"""
+from __future__ import annotations
+
+import copy
+import gc
+import marshal
+import math
+import pickle
+import platform
+import sys
+from collections.abc import Callable
+from collections.abc import Iterable
+from functools import partial
+from time import perf_counter
+from typing import Any
+from typing import Final
+
+from duper import adaptive
+from duper import deepdups
+from duper.__about__ import __version__
+from duper.bench.shapes import SHAPES
+from duper.factories.ast import COMPILED
+from duper.factories.bytecode import bytecode_factory
+
+
+try:
+    import dill  # type: ignore[import-not-found]
+except ImportError:  # dill is a part of benchmark extra
+    dill = None
+
+Prepare = Callable[[Any], Callable[[], Any]]
+
+SIZES: Final = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def pickled(x: Any) -> Callable[[], Any]:
+    return partial(pickle.loads, pickle.dumps(x, pickle.HIGHEST_PROTOCOL))
+
+
+def marshalled(x: Any) -> Callable[[], Any]:
+    return partial(marshal.loads, marshal.dumps(x))
+
+
+def dilled(x: Any) -> Callable[[], Any]:
+    return partial(dill.loads, dill.dumps(x))
+
+
+def deepcopied(x: Any) -> Callable[[], Any]:
+    return partial(copy.deepcopy, x)
+
+
+class Holder:
+    """
+    Holds benchmarked object, since only objects that can be referenced weakly become hot
+    """
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+
+def adapted(x: Any, deep_check: bool = True) -> Callable[[], Any]:
+    """
+    Copies x with duper.deepcopy() until it becomes hot, and returns next copies
+    """
+    holder = Holder(x)
+    previous = adaptive.background, adaptive.deep_check
+    adaptive.background, adaptive.deep_check = False, deep_check
+    try:
+        for _ in range(adaptive.threshold):
+            adaptive.deepcopy(holder)
+    finally:
+        adaptive.background, adaptive.deep_check = previous
+    if (entry := adaptive.hot.get(id(holder))) is None or entry.factory is None:
+        raise copy.Error("Object didn't get a factory")
+    return partial(adaptive.deepcopy, holder)
+
+
+METHODS: Final[dict[str, Prepare]] = {
+    "deepcopy": deepcopied,
+    "pickle": pickled,
+    "marshal": marshalled,
+    **({"dill": dilled} if dill is not None else {}),
+    "duper": deepdups,
+    "duper_bytecode": partial(deepdups, factory=bytecode_factory),
+    "duper_adaptive": adapted,
+    "duper_adaptive_top": partial(adapted, deep_check=False),
+}
+# methods compared to every other method when break-even is calculated
+FACTORIES: Final = ("duper", "duper_bytecode")
+
+
+def timed(function: Callable[[], Any], number: int = 1) -> float:
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = perf_counter()
+        for _ in range(number):
+            function()
+        return perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def per_call(function: Callable[[], Any], min_time: float, repeat: int) -> float:
+    """
+    Best time of one call, calls are repeated until they take at least min_time
+    """
+    number = 1
+    while (elapsed := timed(function, number)) < min_time and number < 1 << 20:
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    return min([elapsed / number] + [timed(function, number) / number for _ in range(repeat - 1)])
+
+
+def measure(prepare: Prepare, x: Any, min_time: float, repeat: int) -> dict[str, Any]:
+    """
+    Build and copy time of a method, or error that it raised
+    """
+    build = math.inf
+    try:
+        for _ in range(repeat):
+            start = perf_counter()
+            produce = prepare(x)
+            build = min(build, perf_counter() - start)
+            if build > min_time:  # slow builds are measured once
+                break
+        if produce() is x:
+            raise copy.Error("Method returned the original object")
+        return {"build": build, "copy": per_call(produce, min_time, repeat)}
+    except (Exception, RecursionError) as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def break_even(method: dict[str, Any], other: dict[str, Any]) -> int | None:
+    """
+    Copies after which method is not slower than other, counting the build, None if never
+    """
+    build: float = method["build"] - other["build"]
+    saved: float = other["copy"] - method["copy"]
+    if build <= 0 and saved >= 0:
+        return 1
+    if saved <= 0:
+        return None
+    return max(math.ceil(build / saved), 1)
+
+
+def run_one(shape: str, size: int, min_time: float, repeat: int) -> dict[str, Any]:
+    x = SHAPES[shape](size)
+    methods = {name: measure(prepare, x, min_time, repeat) for name, prepare in METHODS.items()}
+    return {
+        "shape": shape,
+        "size": size,
+        "methods": methods,
+        "break_even": {
+            name: {
+                other: break_even(methods[name], methods[other])
+                for other in methods
+                if other != name and "error" not in methods[other]
+            }
+            for name in FACTORIES
+            if "error" not in methods[name]
+        },
+    }
+
+
+def run(
+    shapes: Iterable[str] = SHAPES,
+    sizes: Iterable[int] = SIZES,
+    min_time: float = 0.1,
+    repeat: int = 3,
+    report: Callable[[dict[str, Any]], Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Runs benchmarks of every shape at every size, calling report() with each result
+    """
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            results.append(result := run_one(shape, size, min_time, repeat))
+            if report is not None:
+                report(result)
+    return {
+        "duper": __version__,
+        "compiled": COMPILED,
+        "python": sys.version,
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "results": results,
+    }
@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+python -m duper.bench [--shapes json,slotted] [--sizes 10,1000] [-o results.json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections.abc import Sequence
+from typing import Any
+
+from duper.bench import SIZES
+from duper.bench import run
+from duper.bench.shapes import SHAPES
+
+
+def seconds(measurement: dict[str, Any]) -> str:
+    if "error" in measurement:
+        return str(measurement["error"]).partition(":")[0]
+    return f"{measurement['build'] * 1e3:10.3f}ms {measurement['copy'] * 1e6:12.3f}us"
+
+
+def report(result: dict[str, Any]) -> None:
+    print(f"{result['shape']} x {result['size']}:")
+    for name, measurement in result["methods"].items():
+        line = f"  {name:20}{seconds(measurement)}"
+        if name in result["break_even"]:
+            line += "  break-even vs " + ", ".join(
+                f"{other}: {copies if copies is not None else 'never'}"
+                for other, copies in result["break_even"][name].items()
+            )
+        print(line)
+    sys.stdout.flush()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m duper.bench",
+        description="Build and copy time of duper factories compared to other ways of copying",
+    )
+    parser.add_argument(
+        "--shapes",
+        default=",".join(SHAPES),
+        help=f"comma separated shapes of objects (default: {','.join(SHAPES)})",
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, SIZES)),
+        help="comma separated numbers of nodes in each object (default: 10 to 10^6)",
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.1, help="seconds to spend timing copies of a method"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timings to take the best of")
+    parser.add_argument("-o", "--output", help="file to write JSON results to")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't print results")
+    args = parser.parse_args(argv)
+
+    shapes = args.shapes.split(",")
+    if unknown := [shape for shape in shapes if shape not in SHAPES]:
+        parser.error(f"unknown shapes: {', '.join(unknown)}")
+    try:
+        sizes = [int(size) for size in args.sizes.split(",")]
+    except ValueError:
+        parser.error(f"sizes must be integers, got {args.sizes!r}")
+
+    results = run(shapes, sizes, args.min_time, args.repeat, None if args.quiet else report)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
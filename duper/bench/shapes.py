@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Objects of different shapes to benchmark, each built with roughly `n` nodes
+
+Every container, instance and value in it counts as a node, keys of dicts don't.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+from typing import Final
+
+
+class Instance:
+    def __init__(self, name: str, value: int, tags: list[str]) -> None:
+        self.name = name
+        self.value = value
+        self.tags = tags
+
+
+class Slotted:
+    __slots__ = ("name", "value", "tags")
+
+    def __init__(self, name: str, value: int, tags: list[str]) -> None:
+        self.name = name
+        self.value = value
+        self.tags = tags
+
+
+def flat(n: int) -> dict[str, int]:
+    """
+    {"k0": 0, "k1": 1, ...}
+    """
+    return {f"k{i}": i for i in range(max(n - 1, 1))}
+
+
+def json(n: int) -> dict[str, Any]:
+    """
+    Nested dicts and lists of strings, numbers, booleans and None, like a parsed JSON document
+    """
+    remaining = [max(n - 1, 1)]
+
+    def node(depth: int) -> Any:
+        remaining[0] -= 1
+        if depth == 0 or remaining[0] <= 0:
+            return (None, True, 1.5, "text")[remaining[0] % 4]
+        if depth % 2:
+            return [node(depth - 1) for _ in range(min(4, remaining[0]))]
+        return {f"key{i}": node(depth - 1) for i in range(min(4, remaining[0]))}
+
+    document: dict[str, Any] = {}
+    while remaining[0] > 0:
+        document[f"item{len(document)}"] = node(4)
+    return document
+
+
+def instances(n: int) -> list[Instance]:
+    """
+    Objects with __dict__, each is 5 nodes: instance, its 2 values and a list of 1 tag
+    """
+    return [Instance(f"name{i}", i, [f"tag{i}"]) for i in range(max(n // 5, 1))]
+
+
+def slotted(n: int) -> list[Slotted]:
+    """
+    Same as instances(), with __slots__
+    """
+    return [Slotted(f"name{i}", i, [f"tag{i}"]) for i in range(max(n // 5, 1))]
+
+
+def deep(n: int) -> list[Any]:
+    """
+    Lists nested n levels deep: [[[...[0]...]]]
+    """
+    x: list[Any] = [0]
+    for _ in range(n - 2):
+        x = [x]
+    return x
+
+
+def wide(n: int) -> dict[int, list[int]]:
+    """
+    One dict with many small lists: {0: [0], 1: [1], ...}
+    """
+    return {i: [i] for i in range(max(n // 2, 1))}
+
+
+SHAPES: Final[dict[str, Callable[[int], Any]]] = {
+    "flat": flat,
+    "json": json,
+    "instances": instances,
+    "slotted": slotted,
+    "deep": deep,
+    "wide": wide,
+}
@@ -35,7 +35,7 @@ BUILTIN_MUTABLE: Final = frozenset({bytearray, dict, list, set})
 
 BuiltinMutableType = Union[bytearray, dict[Any, Any], list[Any], set[Any]]
 BuiltinCollectionType = Union[dict[Any, Any], list[Any], set[Any], tuple[Any, ...], frozenset[Any]]
-ImmutableCollectionType = Union[tuple[Any, ...], frozenset, slice]
+ImmutableCollectionType = Union[tuple[Any, ...], frozenset[Any], slice]
 ImmutableType = Union[
     type[None],
     type[Any],
@@ -50,6 +50,6 @@ ImmutableType = Union[
     range,
     types.BuiltinFunctionType,
     types.FunctionType,
-    weakref.ref,
+    weakref.ref[Any],
     property,
 ]
@@ -7,28 +7,66 @@ Construct AST that creates a deep copy of a given object
 """
 from __future__ import annotations
 
+import array
 import ast
+import copyreg
+import gc
 import linecache
+import threading
 import types
+from collections import deque
 from collections.abc import Callable
 from collections.abc import Iterable
+from functools import partial
+from pickle import PickleBuffer
 from threading import Lock
+from types import CodeType
 from types import FunctionType
 from typing import Any
 from typing import Final
 from typing import TypeVar
 from typing import cast
+from weakref import WeakKeyDictionary
 
 import duper
+from duper import metrics
 from duper.constants import IMMUTABLE_NON_COLLECTIONS
 from duper.constants import IMMUTABLE_TYPES
 from duper.constants import ImmutableType
+from duper.factories.buffers import layout
+from duper.factories.buffers import spans_whole
+from duper.factories.emission import CONSTRUCTOR
+from duper.factories.emission import COPY
+from duper.factories.emission import choose
+from duper.factories.emission import computes_hashes
+from duper.factories.ndarray import allocate
+from duper.factories.ndarray import batchable
+from duper.factories.ndarray import numpy
+from duper.factories.ndarray import shareable
+from duper.factories.ndarray import template
+from duper.factories.registry import emitters
+from duper.factories.registry import get_emission
+from duper.factories.runtime import PLAIN
+from duper.factories.runtime import REDUCE
+from duper.factories.runtime import copy_with_memo
 from duper.factories.runtime import debunk_reduce
+from duper.factories.runtime import fill
+from duper.factories.runtime import get_plan
 from duper.factories.runtime import get_reduce
+from duper.factories.runtime import get_slots
+from duper.factories.runtime import inline_tail
+from duper.factories.runtime import memoize
+from duper.factories.runtime import produce_batch
 from duper.factories.runtime import reconstruct_state
+from duper.fastast import OR
+from duper.fastast import Assign
+from duper.fastast import Attribute
+from duper.fastast import BoolOp
 from duper.fastast import Call
 from duper.fastast import Constant
 from duper.fastast import Dict
+from duper.fastast import Expr
+from duper.fastast import For
 from duper.fastast import FunctionDef
 from duper.fastast import List
 from duper.fastast import Load
@@ -38,7 +76,10 @@ from duper.fastast import NamedExpr
 from duper.fastast import Return
 from duper.fastast import Set
 from duper.fastast import Store
+from duper.fastast import Subscript
 from duper.fastast import Tuple
+from duper.fastast import arg
+from duper.fastast import arguments
 from duper.fastast import expr
 from duper.fastast import keyword
 from duper.fastast import stmt
@@ -55,29 +96,108 @@ STORE: Final = Store()
 LOC: Final = dict(lineno=1, col_offset=0, end_lineno=1, end_col_offset=0)
 Undefined: Final = NamedExpr(Name("UNDEFINED"), Constant(1))
 CONSTANT_AST_TYPES: Final = frozenset({Name, Constant})
+# objects nested deeper than this can't be reconstructed in a single expression,
+# since both reconstruction and compile() are recursive, see reconstruct_deep()
+MAX_DEPTH: Final = 64
+# how many levels of nesting are reconstructed within one statement, when splitting
+SPLIT_DEPTH: Final = MAX_DEPTH // 2
+# this module and runtime are compiled with mypyc, when wheel is built with mypyc hook enabled
+COMPILED: Final = not __file__.endswith(".py")
 
 
 def __loader__() -> None:
     """Special method to tell inspect that this file has special logic for loading the code"""
 
 
+class Pending(Constant[None]):
+    """
+    Placeholder for a reference to a tuple that is still being reconstructed
+
+    Container that holds the reference gets patched with actual value after reconstruction
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__(None)
+        self.name = name
+
+
+class TooDeep(Exception):
+    """Object is nested deeper than MAX_DEPTH"""
+
+
+# copies parts of objects that can't be reconstructed, set by duper.deepdups(), see isolate()
+local = threading.local()
+Isolate = Callable[[Any, str, Exception], Callable[[], Any]]
+
+
+def isolate(fallback: Isolate | None) -> Isolate | None:
+    """
+    Sets fallback for parts of objects that are reconstructed in current thread, returns previous one
+
+    Part that can't be reconstructed is copied by a constructor that fallback returns,
+    and the rest of the object is still reconstructed. Without fallback, whole reconstruction fails.
+    Fallback is called with the part, its path from the reconstructed object, and the error.
+    """
+    previous: Isolate | None = getattr(local, "fallback", None)
+    local.fallback = fallback
+    return previous
+
+
 class Namespace:
-    def __init__(self) -> None:
+    def __init__(
+        self, batch: bool = False, shared: Namespace | None = None, memo: bool = False
+    ) -> None:
         self.forbid_references: dict[int, Any] = {}
-        self.names: dict[str, Any] = {}
+        # functions compiled in one module share stored objects, see ast_many_factory()
+        self.names: dict[str, Any] = {} if shared is None else shared.names
+        self.stored: dict[int, str] = {} if shared is None else shared.stored
+        # ids of stored containers of constants that copies are made from, see emission
+        self.templates: set[int] = set() if shared is None else shared.templates
         self.used_names: set[str] = set()
+        # last suffix given to each base name, see local_name()
+        self.suffixes: dict[str, int] = {} if shared is None else shared.suffixes
         self.vid_to_name: dict[int, str] = {}
         self.reconstructed: dict[int, expr] = {}
+        # temporary objects, like values from reduce, must outlive reconstruction
+        # otherwise their ids may be reused by other objects
+        self.alive: list[Any] = []
+        # lists, dicts and sets that were referenced before they were reconstructed
+        # these are created empty first, and filled with items after
+        self.shells: dict[int, str] = {}
+        # references to unfinished tuples, that are yet to be patched in their containers
+        self.pending: dict[int, Pending] = {}
+        self.pending_targets: set[int] = set()
+        self.patches: list[stmt] = []
+        # objects nested too deep are reconstructed by statements that precede the expression
+        self.prelude: list[stmt] = []
+        self.hoisted: dict[int, str] = {}
+        self.reduced: dict[int, tuple[Any, ...]] = {}
+        self.depth = 0
+        # names of batch size and index of a copy in a batch, see ast_batch_factory()
+        self.batch = (self.local_name("n"), self.local_name("i")) if batch else None
+        # statements that are executed once per batch, before any copy is made
+        self.setup: list[stmt] = []
+        # name of memo argument, see ast_memo_factory()
+        self.memo = self.local_name("memo") if memo else None
+        # whether any __deepcopy__() is called while copying, see delegate()
+        self.delegated = False
+        self.fallback: Isolate | None = getattr(local, "fallback", None)
+        # parts that couldn't be reconstructed, with errors and names of their constructors
+        self.failed: list[tuple[Any, Exception, str]] = []
 
-    def check_references(self, value: Any) -> Name | None:
+    def check_references(self, value: Any) -> Name | Pending | None:
+        if (name := self.hoisted.get(id(value))) is not None:
+            return Name(name)  # assigned by a statement in prelude
         if (vid := id(value)) in self.reconstructed:
             # This is the hackiest hack, and it shouldn't be done like this
             # but this allows to make things simpler in other places
             # which is a good trade for now.
             # In later versions this will be resolved in a more general way.
             expression = self.reconstructed[vid]
+            if type(expression) is Name:
+                return Name(expression.id)  # stored as is
             name = self.get_name(value)
-            if isinstance(expression, NamedExpr):
+            if isinstance(expression, NamedExpr) or vid in self.shells:
                 return Name(name)
             new_expression = NamedExpr(target=Name(name, ctx=STORE), value=duper.dupe(expression))
             expression.__dict__.clear()
@@ -86,32 +206,136 @@ class Namespace:
             expression.__class__ = ast.NamedExpr
             return Name(name)
 
-        if (vid := id(value)) in self.forbid_references and vid not in self.vid_to_name:
+        if (vid := id(value)) in self.forbid_references:
             # If we end up here, it must mean type has been referenced again before we
             # finished reconstructing an AST statement for it.
-            # this can be resolved, but I don't want to overcomplicate the logic to include
-            # all such interactions before releasing the PoC.
+            # Containers are created empty in advance for such references (see fill_shell),
+            # and references to tuples are patched after the whole object is reconstructed.
             # There are some special cases that duper handles already, like reconstruction from
             # reduce, which may require reconstructed instance value to be present
-            # to reconstruct its state, but a more general approach is needed to support them all
-            raise NotImplementedError(
-                f"Already seen {type(value)=}, {id(value)=} self-reflexive types are not supported yet"
-            )
+            # to reconstruct its state, which is resolved there.
+            if (cls := type(value)) in SHELLS:
+                if vid not in self.shells:
+                    self.shells[vid] = self.get_name(value)
+                return Name(self.shells[vid])
+            if cls is tuple:
+                self.pending_targets.add(vid)
+                placeholder = Pending(self.get_name(value))
+                self.pending[id(placeholder)] = placeholder
+                return placeholder
+            if vid not in self.vid_to_name:
+                raise NotImplementedError(
+                    f"Already seen {type(value)=}, {id(value)=} self-reflexive types are not supported yet"
+                )
         self.forbid_references[vid] = value
         return None
 
     def unlock_references(self, value: Any, expression: T) -> T:
         self.forbid_references.pop(vid := id(value), None)
+        if vid in self.shells:
+            expression = cast(T, self.fill_shell(value, cast(expr, expression)))
+        elif vid in self.pending_targets and not isinstance(expression, NamedExpr):
+            expression = cast(
+                T,
+                NamedExpr(
+                    target=Name(self.get_name(value), ctx=STORE), value=cast(expr, expression)
+                ),
+            )
         self.reconstructed[vid] = cast(expr, expression)
+        self.alive.append(value)
         return expression
 
-    def store(self, x: T) -> Name:
+    def fill_shell(self, value: Any, expression: expr) -> Call:
+        """
+        (name := []) is evaluated before the items, so they can reference it
+        fill((name := []), [..., name, ...])
         """
-        Stores object as is to be available in namespace
+        if isinstance(expression, NamedExpr):  # container was named to be patched
+            expression = expression.value
+        return Call(
+            func=self.store(fill),
+            args=[
+                NamedExpr(
+                    target=Name(self.shells[id(value)], ctx=STORE),
+                    value=SHELLS[type(value)](self),
+                ),
+                expression,
+            ],
+            keywords=[],
+        )
+
+    def patch_pending(
+        self, container: Any, expression: E, items: Iterable[tuple[expr, expr]]
+    ) -> E | NamedExpr[E]:
+        """
+        Replaces references to unfinished tuples in container with `container[key] = tuple`
+        patches that are executed after the whole object is reconstructed
+        """
+        name = None
+        for key, value in items:
+            if type(value) is not Pending or self.pending.pop(id(value), None) is None:
+                continue
+            if type(key) not in CONSTANT_AST_TYPES:
+                raise NotImplementedError(
+                    f"Can't patch a reference to self-reflexive tuple in {type(container)}"
+                )
+            if name is None:
+                name = self.get_name(container)
+            self.patches.append(
+                Assign(
+                    targets=[Subscript(Name(name), key, ctx=STORE)],
+                    value=Name(value.name),
+                )
+            )
+        if name is None:
+            return expression
+        return NamedExpr(target=Name(name, ctx=STORE), value=expression)
+
+    def retarget_patches(self, container: expr, target: expr | None) -> None:
         """
-        name = self.get_name(x)
-        self.names[name] = x
-        return Name(id=name)
+        Moves patches from container that is copied into another object to that object
+
+        When target is None, copy can't be patched
+        """
+        if not isinstance(container, NamedExpr):
+            return
+        name = container.target.id
+        for patch in self.patches:
+            subscript = cast(Assign[Any], patch).targets[0]
+            if type(subscript) is Subscript and cast(Name, subscript.value).id == name:
+                if target is None:
+                    raise NotImplementedError(
+                        "Can't patch a reference to self-reflexive tuple in reduce value"
+                    )
+                subscript.value = target
+
+    def statements(self, result: expr, consume: Callable[[expr], stmt]) -> list[stmt]:
+        """
+        Statements that pass reconstructed object to consume() after applying the patches
+        """
+        if self.pending:
+            raise NotImplementedError(
+                "Can't patch references to self-reflexive tuple outside of list or dict"
+            )
+        if not self.patches:
+            return [*self.prelude, consume(result)]
+        name = self.local_name("result")
+        return [
+            *self.prelude,
+            Assign(targets=[Name(name, ctx=STORE)], value=result),
+            *self.patches,
+            consume(Name(name)),
+        ]
+
+    def store(self, x: T, name: str | None = None) -> Name:
+        """
+        Stores object as is to be available in namespace, under given name if it's not taken
+        """
+        if (stored := self.stored.get(id(x))) is None:
+            stored = self.get_name(x) if name is None else self.local_name(name)
+            self.stored[id(x)] = stored
+            self.names[stored] = x
+        return Name(id=stored)
 
     def get_name(self, value: Any) -> str:
         """
@@ -128,17 +352,53 @@ class Namespace:
         if (name := getattr(value, "__qualname__", None)) is None:
             name = type(value).__name__.lower()
 
-        i = 1
-        while name in self.used_names:
-            name = f"{name}{i}"
-            i += 1
-
         # remember assigned names for future lookup
-        self.vid_to_name[vid] = name
+        name = self.vid_to_name[vid] = self.local_name(name)
+        return name
+
+    def rollback(self, x: Any, depth: int, alive: int, pending: int, patches: int) -> None:
+        """
+        Forgets objects inside x that were reconstructed before x failed, see reconstruct_isolated()
+        """
+        self.depth = depth
+        for value in self.alive[alive:]:
+            self.reconstructed.pop(id(value), None)
+        for vid in reversed(list(self.forbid_references)):
+            if vid == id(x):
+                break
+            del self.forbid_references[vid]
+        for key in list(self.pending)[pending:]:
+            del self.pending[key]
+        del self.patches[patches:]
+
+    def local_name(self, name: str) -> str:
+        """
+        Reserves a name for a local variable, so it won't shadow any name from the namespace
+
+        Collisions are resolved with a numeric suffix that is counted per base name,
+        so thousands of objects of the same type are named node, node1, node2... without retries
+        """
+        base = name
+        while name in self.used_names or name in self.names:
+            suffix = self.suffixes[base] = self.suffixes.get(base, 0) + 1
+            name = f"{base}{suffix}"
         self.used_names.add(name)
         return name
 
 
+def delegate(x: T, copier: Callable[[dict[int, Any]], T], namespace: Namespace) -> expr:
+    """
+    copier(memo) for objects that copy themselves with __deepcopy__
+
+    Without memo, copier is given an empty dict, so it can't share copies with the rest of x,
+    which is why ast_factory() copies such objects with ast_memo_factory() instead.
+    """
+    namespace.delegated = True
+    if namespace.memo is not None:
+        return Call(func=namespace.store(copier), args=[Name(namespace.memo)], keywords=[])
+    return reconstruct_from_reduce(x, namespace, copier, ({},), {})
+
+
 def reconstruct_from_reduce(
     x: T,
     namespace: Namespace,
@@ -148,56 +408,196 @@ def reconstruct_from_reduce(
     state: Any = None,
     listiter: Iterable[Any] | None = None,
     dictiter: Iterable[tuple[Any, Any]] | None = None,
-) -> Call:
+) -> Call | Subscript[Tuple]:
+    new = Call(
+        func=namespace.store(func),
+        args=[reconstruct_expression(item, namespace) for item in args],
+        keywords=[
+            keyword(
+                arg=name,
+                value=reconstruct_expression(item, namespace),
+            )
+            for name, item in kwargs.items()
+        ],
+    )
     if state is None and listiter is None and dictiter is None:
-        return Call(
-            func=namespace.store(func),
-            args=[reconstruct_expression(item, namespace) for item in args],
-            keywords=[
-                keyword(
-                    arg=name,
-                    value=reconstruct_expression(item, namespace),
-                )
-                for name, item in kwargs.items()
+        return new
+
+    name = namespace.get_name(x)
+    # newly created instance will be referenced during reconstruction
+    named = namespace.unlock_references(x, NamedExpr(target=Name(id=name, ctx=STORE), value=new))
+    setstate = getattr(x, "__setstate__", None) is not None
+    expression: Call | Subscript[Tuple]
+    if inline_tail(type(x), state, listiter is not None, dictiter is not None):
+        # (name := func(...), name.__setstate__(...), name.extend([...]), name.update({...}))[0]
+        parts: list[expr] = [named]
+        state_ast = listiter_ast = dictiter_ast = None
+        if state is not None:
+            method = (
+                Attribute(Name(name), "__setstate__")
+                if setstate
+                else Attribute(Attribute(Name(name), "__dict__"), "update")
+            )
+            state_ast = reconstruct_expression(state, namespace)
+            parts.append(Call(func=method, args=[state_ast], keywords=[]))
+        if listiter is not None:
+            listiter_ast = reconstruct_list(list(listiter), namespace)
+            parts.append(
+                Call(func=Attribute(Name(name), "extend"), args=[listiter_ast], keywords=[])
+            )
+        if dictiter is not None:
+            dictiter_ast = reconstruct_dict(dict(dictiter), namespace)
+            parts.append(
+                Call(func=Attribute(Name(name), "update"), args=[dictiter_ast], keywords=[])
+            )
+        expression = Subscript(Tuple(parts), Constant(0))
+    else:
+        expression = Call(
+            func=namespace.store(reconstruct_state),
+            args=[
+                named,
+                state_ast := reconstruct_expression(state, namespace),
+                Call(
+                    func=reconstruct_const(iter, namespace),
+                    args=[
+                        listiter_ast := reconstruct_list(
+                            list(listiter) if listiter else [], namespace
+                        )
+                    ],
+                    keywords=[],
+                ),
+                Call(
+                    func=reconstruct_const(dict.items, namespace),
+                    args=[
+                        dictiter_ast := reconstruct_dict(
+                            dict(dictiter) if dictiter else {}, namespace
+                        )
+                    ],
+                    keywords=[],
+                ),
             ],
+            keywords=[],
         )
+    if namespace.patches:
+        # values below are copied into the new instance, so patches must be applied to it
+        plain_state = type(state) is dict and not setstate
+        for part, target in (
+            (state_ast, Attribute(Name(name), "__dict__") if plain_state else None),
+            (listiter_ast, None),
+            (dictiter_ast, None),
+        ):
+            if part is not None:
+                namespace.retarget_patches(part, target)
+    return expression
+
+
+def reconstruct_plain(x: Any, namespace: Namespace) -> Call | BoolOp:
+    """
+    Instance that is reconstructed from its __dict__ alone:
+    setattr((name := new(cls)), "__dict__", {...}) or name
+    """
+    new = reconstruct_new(x, namespace)
+    if not x.__dict__:
+        return new
+    name = namespace.get_name(x)
+    # newly created instance will be referenced during reconstruction
+    namespace.unlock_references(x, named := NamedExpr(target=Name(name, ctx=STORE), value=new))
+    return BoolOp(op=OR, values=[set_plain_state(x, namespace, named), Name(name)])
+
+
+def set_plain_state(x: Any, namespace: Namespace, instance: expr) -> Call:
+    """
+    setattr(instance, "__dict__", {...})
+    """
+    cls = type(x)
+    setter = setattr if getattr(cls, "__setattr__") is object.__setattr__ else object.__setattr__
     return Call(
-        func=namespace.store(reconstruct_state),
-        args=[
-            # newly created instance will be referenced during reconstruction
-            namespace.unlock_references(
-                x,
-                NamedExpr(
-                    target=Name(id=namespace.get_name(x), ctx=STORE),
-                    value=Call(
-                        func=namespace.store(func),
-                        args=[reconstruct_expression(item, namespace) for item in args],
-                        keywords=[
-                            keyword(
-                                arg=name,
-                                value=reconstruct_expression(item, namespace),
-                            )
-                            for name, item in kwargs.items()
-                        ],
-                    ),
-                ),
-            ),
-            reconstruct_expression(state, namespace),
-            Call(
-                func=reconstruct_const(iter, namespace),
-                args=[reconstruct_list(list(listiter) if listiter else [], namespace)],
-                keywords=[],
-            ),
-            Call(
-                func=reconstruct_const(dict.items, namespace),
-                args=[reconstruct_dict(dict(dictiter) if dictiter else {}, namespace)],
-                keywords=[],
-            ),
-        ],
+        func=namespace.store(setter),
+        args=[instance, Constant("__dict__"), reconstruct_dict(x.__dict__, namespace)],
+        keywords=[],
+    )
+
+
+def reconstruct_slots(x: Any, namespace: Namespace) -> Call:
+    """
+    Instance that is reconstructed from its __slots__ and __dict__ (if any):
+    set_slots((name := new(cls)), {...}, a, b), see slots_setter()
+    """
+    new = reconstruct_new(x, namespace)
+    if not get_slots(x) and not getattr(x, "__dict__", None):
+        return new
+    name = namespace.get_name(x)
+    # newly created instance will be referenced during reconstruction
+    named = namespace.unlock_references(x, NamedExpr(target=Name(name, ctx=STORE), value=new))
+    return set_slots_state(x, namespace, named)
+
+
+def set_slots_state(x: Any, namespace: Namespace, instance: expr) -> Call:
+    """
+    set_slots(instance, {...}, a, b), see slots_setter()
+    """
+    state = getattr(x, "__dict__", None) or None
+    slots = get_slots(x)
+    args: list[expr] = [instance]
+    if state is not None:
+        args.append(reconstruct_dict(state, namespace))
+    args += [reconstruct_expression(value, namespace) for value in slots.values()]
+    return Call(
+        func=namespace.store(slots_setter(type(x), tuple(slots), state is not None)),
+        args=args,
+        keywords=[],
+    )
+
+
+def reconstruct_new(x: Any, namespace: Namespace) -> Call:
+    """
+    cls.__new__(cls)
+    """
+    cls = type(x)
+    return Call(
+        func=namespace.store(cls.__new__),
+        args=[reconstruct_const(cls, namespace)],
         keywords=[],
     )
 
 
+# setters for each combination of set slots, see slots_setter()
+setters: WeakKeyDictionary[type[Any], dict[tuple[tuple[str, ...], bool], FunctionType]] = (
+    WeakKeyDictionary()
+)
+
+
+def slots_setter(cls: type[Any], slots: tuple[str, ...], with_dict: bool) -> FunctionType:
+    """
+    Compiles a function that sets given slots (and __dict__) of a new instance,
+    so stores go straight through member descriptors, and are specialized by the interpreter:
+
+    def set_slots(obj, state, a, b):
+        obj.__dict__ = state
+        obj.a = a
+        obj.b = b
+        return obj
+    """
+    key = (slots, with_dict)
+    if (setter := setters.setdefault(cls, {}).get(key)) is not None:
+        return setter
+    names = [f"value{i}" for i in range(len(slots))]
+    body: list[stmt] = [
+        Assign(targets=[Attribute(Name("obj"), slot, ctx=STORE)], value=Name(value))
+        for slot, value in zip(slots, names)
+    ]
+    if with_dict:
+        body.insert(
+            0, Assign(targets=[Attribute(Name("obj"), "__dict__", ctx=STORE)], value=Name("state"))
+        )
+        names.insert(0, "state")
+    body.append(Return(Name("obj")))
+    setter = setters[cls][key] = compile_function(
+        f"set_{cls.__name__}_slots", body, Namespace(), args=("obj", *names)
+    )
+    return setter
+
+
 def reconstruct_const(x: T, namespace: Namespace) -> Name | Constant[Any]:
     return (
         # can't use Constant with types in ast (which makes sense, there's no literals for them)
@@ -220,24 +620,60 @@ def reconstruct_const(x: T, namespace: Namespace) -> Name | Constant[Any]:
     )
 
 
-def reconstruct_list(x: list[Any], namespace: Namespace) -> List:
-    return List([reconstruct_expression(i, namespace) for i in x])
+def reconstruct_constants(
+    x: list[Any] | set[Any] | dict[Any, Any], items: list[expr], namespace: Namespace
+) -> Call | None:
+    """
+    template.copy(), list(tuple) or set(frozenset) for container of constants,
+    if it's cheaper than a literal, see emission
+    """
+    if not x or not all(type(item) is Constant for item in items):
+        return None
+    strategy = choose(type(x), len(x), computes_hashes(x))
+    if strategy is COPY:
+        template = namespace.store(snapshot := x.copy(), "template")
+        namespace.templates.add(id(snapshot))
+        return Call(func=Attribute(template, "copy"), args=[], keywords=[])
+    if strategy is CONSTRUCTOR:
+        constant = tuple(x) if type(x) is list else frozenset(x)
+        return Call(func=namespace.store(type(x)), args=[Constant(constant)], keywords=[])
+    return None
+
+
+def reconstruct_list(x: list[Any], namespace: Namespace) -> List | NamedExpr[List] | Call:
+    expression = List([reconstruct_expression(i, namespace) for i in x])
+    if (constants := reconstruct_constants(x, expression.elts, namespace)) is not None:
+        return constants
+    if namespace.pending:
+        return namespace.patch_pending(
+            x, expression, ((Constant(i), e) for i, e in enumerate(expression.elts))
+        )
+    return expression
 
 
-def reconstruct_set(x: set[Any], namespace: Namespace) -> Set:
-    return Set([reconstruct_expression(i, namespace) for i in x])
+def reconstruct_set(x: set[Any], namespace: Namespace) -> Set | Call:
+    expression = Set([reconstruct_expression(i, namespace) for i in x])
+    if (constants := reconstruct_constants(x, expression.elts, namespace)) is not None:
+        return constants
+    return expression
 
 
-def reconstruct_dict(x: dict[Any, Any], namespace: Namespace) -> Dict | Call | Name:
-    return Dict(
+def reconstruct_dict(x: dict[Any, Any], namespace: Namespace) -> Dict | NamedExpr[Dict] | Call:
+    expression = Dict(
         keys=[reconstruct_expression(i, namespace) for i in x.keys()],
         values=[reconstruct_expression(i, namespace) for i in x.values()],
     )
+    items = [*expression.keys, *expression.values]
+    if (constants := reconstruct_constants(x, items, namespace)) is not None:
+        return constants
+    if namespace.pending:
+        return namespace.patch_pending(x, expression, zip(expression.keys, expression.values))
+    return expression
 
 
 def reconstruct_tuple(
     x: tuple[Any, ...] | frozenset[Any], namespace: Namespace
-) -> Tuple | NamedExpr[Any] | Name | Constant[tuple[ImmutableType, ...]]:
+) -> Tuple | Call | NamedExpr[Any] | Name | Constant[tuple[ImmutableType, ...]]:
     immutable = True
     values = [
         expression
@@ -261,10 +697,98 @@ def reconstruct_tuple(
         )
     ]
     if immutable:
-        return reconstruct_const(x, namespace)
+        if all(isinstance(value, Constant) for value in values):
+            return reconstruct_const(x, namespace)
+        return namespace.store(x)  # holds objects that can't be in a constant, like types
+    if type(x) is frozenset:
+        return Call(func=namespace.store(frozenset), args=[Set(values)], keywords=[])
     return Tuple(elts=values)
 
 
+def reconstruct_ndarray(x: Any, namespace: Namespace) -> expr:
+    """
+    template.copy("K"), or a slice of a block allocated once per batch: block[i]
+    Read-only arrays are shared as is
+    """
+    if x.dtype.hasobject:  # objects in array must be copied as well
+        return delegate(x, x.__deepcopy__, namespace)
+    if shareable(x):
+        return namespace.store(x)
+    array = template(x)
+    if namespace.batch is not None and batchable(x):
+        n, index = namespace.batch
+        block = namespace.local_name("block")
+        namespace.setup.append(
+            Assign(
+                targets=[Name(block, ctx=STORE)],
+                value=Call(
+                    func=namespace.store(allocate),
+                    args=[namespace.store(array), Name(n)],
+                    keywords=[],
+                ),
+            )
+        )
+        return Subscript(Name(block), Name(index))
+    return Call(func=Attribute(namespace.store(array), "copy"), args=[Constant("K")], keywords=[])
+
+
+def reconstruct_buffer(contents: bytes, readonly: bool, namespace: Namespace) -> expr:
+    """
+    contents, or bytearray(contents) if copy must be writable
+    """
+    if readonly:
+        return Constant(contents)
+    return Call(func=namespace.store(bytearray), args=[Constant(contents)], keywords=[])
+
+
+def reconstruct_bytearray(x: bytearray, namespace: Namespace) -> expr:
+    return reconstruct_buffer(bytes(x), False, namespace)
+
+
+def reconstruct_array(x: array.array[Any], namespace: Namespace) -> Call:
+    return Call(
+        func=namespace.store(array.array),
+        args=[Constant(x.typecode), Constant(x.tobytes())],
+        keywords=[],
+    )
+
+
+def reconstruct_memoryview(x: memoryview, namespace: Namespace) -> expr:
+    """
+    memoryview(<copy of viewed object>), cast to the same format and shape
+
+    View over a part of an object is copied on its own, without the rest of the object
+    """
+    if x.readonly and type(x.obj) is bytes:
+        return namespace.store(x)
+    if spans_whole(x):
+        source = memoryview(x.obj)
+        value: expr = reconstruct_expression(x.obj, namespace)
+    else:
+        source = memoryview(contents := x.tobytes())
+        value = reconstruct_buffer(contents, x.readonly, namespace)
+    value = Call(func=namespace.store(memoryview), args=[value], keywords=[])
+    if (cast_to := layout(x, source)) is not None:
+        flat = Call(func=Attribute(value, "cast"), args=[Constant("B")], keywords=[])
+        value = Call(func=Attribute(flat, "cast"), args=list(map(Constant, cast_to)), keywords=[])
+    if x.readonly and not source.readonly:
+        value = Call(func=Attribute(value, "toreadonly"), args=[], keywords=[])
+    return value
+
+
+def reconstruct_pickle_buffer(x: PickleBuffer, namespace: Namespace) -> Call:
+    """
+    Buffers in protocol 5 reduce values usually wrap the object that is being reduced,
+    so they're always copied on their own
+    """
+    view = memoryview(x)
+    return Call(
+        func=namespace.store(PickleBuffer),
+        args=[reconstruct_buffer(view.tobytes(), view.readonly, namespace)],
+        keywords=[],
+    )
+
+
 def reconstruct_method(x: types.MethodType, namespace: Namespace) -> Call:
     return Call(
         func=reconstruct_const(type(x), namespace),
@@ -283,39 +807,535 @@ def reconstruct_expression(x: Any, namespace: Namespace) -> expr:
 
     cls = type(x)
     if cls in IMMUTABLE_NON_COLLECTIONS:
-        return namespace.unlock_references(x, reconstruct_const(x, namespace))
+        # constants are never referenced by name, so they're not tracked
+        return reconstruct_const(x, namespace)
 
     existing = namespace.check_references(x)
     if existing is not None:
         return existing
 
+    if namespace.depth == MAX_DEPTH:
+        raise TooDeep(f"{cls} is nested deeper than {MAX_DEPTH} levels")
+    namespace.depth += 1
+    if namespace.fallback is None:
+        expression = reconstruct_object(x, cls, namespace)
+    else:
+        expression = reconstruct_isolated(x, cls, namespace)
+    expression = namespace.unlock_references(x, expression)
+    namespace.depth -= 1
+    return expression
+
+
+def reconstruct_isolated(x: Any, cls: type[Any], namespace: Namespace) -> expr:
+    """
+    Same as reconstruct_object(), but if x can't be reconstructed, it's copied by a constructor
+    from namespace.fallback, which is assigned to the name after reconstruction, see resolve_failed()
+    """
+    marks = (namespace.depth, len(namespace.alive), len(namespace.pending), len(namespace.patches))
+    try:
+        return reconstruct_object(x, cls, namespace)
+    except TooDeep:
+        raise
+    except Exception as e:
+        namespace.rollback(x, *marks)
+        name = namespace.local_name(f"copy_{cls.__name__.lower()}")
+        namespace.failed.append((x, e, name))
+        return Call(func=Name(name), args=[], keywords=[])
+
+
+def resolve_failed(x: Any, namespace: Namespace) -> None:
+    """
+    Stores constructors for parts of x that couldn't be reconstructed
+
+    Part that references objects reconstructed with the rest of x can't be copied on its own,
+    its copy wouldn't reference their copies, so then x fails as a whole
+    """
+    copied = {
+        vid
+        for vid, expression in namespace.reconstructed.items()
+        if type(expression) not in CONSTANT_AST_TYPES
+    }
+    for value, error, _ in namespace.failed:
+        if value is x or references(value, copied):
+            raise error
+    fallback = cast(Isolate, namespace.fallback)
+    paths = find_paths(x, {id(value): value for value, _, _ in namespace.failed})
+    for value, error, name in namespace.failed:
+        constructor = fallback(value, paths.get(id(value), f"<{type(value).__name__}>"), error)
+        namespace.names[name] = constructor
+        namespace.alive.append(constructor)
+
+
+def references(x: Any, ids: set[int]) -> bool:
+    """
+    Whether any object with one of ids is reachable from x, other than x itself
+    """
+    seen = {id(x)}
+    stack = gc.get_referents(x)
+    while stack:
+        value = stack.pop()
+        if (vid := id(value)) in seen:
+            continue
+        seen.add(vid)
+        if type(value) in IMMUTABLE_NON_COLLECTIONS or isinstance(value, (type, types.ModuleType)):
+            continue  # these are not copied by deepcopy
+        if vid in ids:
+            return True
+        stack += gc.get_referents(value)
+    return False
+
+
+def find_paths(x: Any, targets: dict[int, Any]) -> dict[int, str]:
+    """
+    Shortest paths from x to targets, like `obj["a"][0].b`, found by breadth-first search
+
+    Only items of builtin collections and attributes of instances are followed
+    """
+    paths: dict[int, str] = {}
+    seen = {id(x)}
+    queue = deque([(x, "obj")])
+    while queue and len(paths) < len(targets):
+        value, path = queue.popleft()
+        if id(value) in targets:
+            paths[id(value)] = path
+            continue
+        cls = type(value)
+        if cls in IMMUTABLE_NON_COLLECTIONS:
+            continue
+        items: Iterable[tuple[str, Any]]
+        if isinstance(value, dict):
+            items = [(f"{path}[{key!r}]", item) for key, item in value.items()]
+        elif isinstance(value, (list, tuple)):
+            items = [(f"{path}[{i}]", item) for i, item in enumerate(value)]
+        elif isinstance(value, (set, frozenset)):
+            items = [(f"{path}{{{item!r}}}", item) for item in value]
+        else:
+            state = getattr(value, "__dict__", None)
+            attributes = {**state} if isinstance(state, dict) else {}
+            try:
+                attributes.update(get_slots(value))
+            except Exception:
+                pass
+            items = [(f"{path}.{name}", item) for name, item in attributes.items()]
+        for item_path, item in items:
+            if id(item) not in seen:
+                seen.add(id(item))
+                queue.append((item, item_path))
+    return paths
+
+
+def reconstruct_object(x: Any, cls: type[Any], namespace: Namespace) -> expr:
     constructor: Callable[[Any, Namespace], expr] | None = optimized_constructors.get(cls)
 
     if constructor is not None:
-        return namespace.unlock_references(x, constructor(x, namespace))
+        return constructor(x, namespace)
+
+    if (plan := get_plan(cls)) is not REDUCE and cls not in copyreg.dispatch_table:
+        return reconstruct_plain(x, namespace) if plan is PLAIN else reconstruct_slots(x, namespace)
+
+    if (emitter := emitters.get(cls)) is not None:
+        # emission is taken in advance for objects nested too deep, see children()
+        if (rv := namespace.reduced.pop(id(x), None)) is None:
+            if (rv := get_emission(x, emitter)) is None:
+                return namespace.store(x)
+            namespace.alive.append(rv)
+        return reconstruct_from_reduce(x, namespace, *rv)
 
     if (custom_copier := getattr(x, "__deepcopy__", None)) is not None:
-        return namespace.unlock_references(
-            x, reconstruct_from_reduce(x, namespace, custom_copier, ({},), {}, None, None, None)
-        )
+        return delegate(x, custom_copier, namespace)
+
+    # objects nested too deep are reduced in advance, see split_deep()
+    if (rv := namespace.reduced.pop(id(x), None)) is None:
+        reduced = get_reduce(x, cls)
+        if isinstance(reduced, str):  # global name
+            return reconstruct_const(x, namespace)
+        rv = debunk_reduce(*reduced)
+
+    return reconstruct_from_reduce(x, namespace, *rv)
+
+
+def children(x: Any, namespace: Namespace) -> list[Any]:
+    """
+    Objects that reconstruct_expression(x) reconstructs along with x, in the same order
+    """
+    cls = type(x)
+    if cls is dict:
+        return [*x.keys(), *x.values()]
+    if cls in (list, set, tuple, frozenset):
+        return list(x)
+    if cls is types.MethodType:
+        return [x.__self__]
+    if cls is memoryview:
+        return [x.obj] if spans_whole(x) and not (x.readonly and type(x.obj) is bytes) else []
+    if cls in optimized_constructors:
+        return []
+
+    if (plan := get_plan(cls)) is not REDUCE and cls not in copyreg.dispatch_table:
+        state = getattr(x, "__dict__", None) or {}
+        if plan is PLAIN:
+            return children(state, namespace)
+        return [*children(state, namespace), *get_slots(x).values()]
+
+    if (emitter := emitters.get(cls)) is not None:
+        try:
+            emission = get_emission(x, emitter)
+        except Exception:
+            if namespace.fallback is None:
+                raise
+            return []  # it's copied by fallback, see reconstruct_isolated()
+        if emission is None:
+            return []
+        namespace.reduced[id(x)] = emission
+        namespace.alive.append(emission)
+        return [*emission[1], *emission[2].values()]
+
+    if getattr(x, "__deepcopy__", None) is not None:
+        return []
+
+    try:
+        reduced = get_reduce(x, cls)
+        if isinstance(reduced, str):
+            return []
+        func, args, kwargs, state, listiter, dictiter = debunk_reduce(*reduced)
+    except Exception:
+        if namespace.fallback is None:
+            raise
+        return []  # it's copied by fallback, see reconstruct_isolated()
+    # reduce is called only once, so values it returned are the ones being reconstructed
+    rv = namespace.reduced[id(x)] = (
+        func,
+        args,
+        kwargs,
+        state,
+        None if listiter is None else list(listiter),
+        None if dictiter is None else list(dictiter),
+    )
+    namespace.alive.append(rv)
+    found = [*args, *kwargs.values()]
+    if state is not None:
+        found.append(state)
+    found += rv[4] or ()
+    if rv[5]:
+        found += [key for key, _ in rv[5]] + [value for _, value in rv[5]]
+    return found
+
+
+def shellable(x: Any) -> bool:
+    """
+    Whether x can be created empty, before its contents are reconstructed
+    """
+    if (cls := type(x)) in SHELLS:
+        return True
+    return (
+        cls not in optimized_constructors
+        and get_plan(cls) is not REDUCE
+        and cls not in copyreg.dispatch_table
+    )
+
+
+def split_deep(x: Any, namespace: Namespace) -> tuple[list[Any], dict[int, Any], set[int]]:
+    """
+    Finds objects that are reconstructed by separate statements, so no expression is nested
+    deeper than SPLIT_DEPTH levels, and returns them in the order they must be reconstructed
+
+    Objects are traversed with an explicit stack, so there's no recursion.
+    Also returns objects that must be created empty in advance, because they're referenced
+    by their own items from the statements before, and ids of tuples and frozensets
+    that contain only immutable objects, these are not reconstructed and used as is.
+    """
+    hoisted: list[Any] = []
+    shells: dict[int, Any] = {}
+    heights: dict[int, int] = {}  # of subtrees that are not hoisted
+    # nesting of tuples and frozensets that are constant, these are nested as a whole
+    constants: dict[int, int] = {}
+    done: set[int] = set()
+    in_progress: set[int] = {id(x)}
+    # object, its children that are yet to be visited, height of the highest visited one
+    # and nesting of constant children, if all of them are constant so far, or None
+    stack: list[list[Any]] = [[x, iter(children(x, namespace)), 0, constant_nesting(x)]]
+    while stack:
+        frame = stack[-1]
+        for child in frame[1]:
+            if type(child) in IMMUTABLE_NON_COLLECTIONS or isinstance(child, type):
+                continue
+            if (vid := id(child)) in in_progress:
+                frame[3] = None
+                if shellable(child):
+                    shells[vid] = child
+                continue
+            if vid not in done:
+                in_progress.add(vid)
+                stack.append([child, iter(children(child, namespace)), 0, constant_nesting(child)])
+                break
+            if frame[3] is not None:
+                frame[3] = max(frame[3], constants[vid]) if vid in constants else None
+            if vid in heights:
+                # referenced again, reconstructing it before anything else that refers to it
+                # keeps the nesting of the expression it was first seen in as it was measured
+                hoisted.append(child)
+                del heights[vid]
+        else:
+            stack.pop()
+            obj, _, height, nesting = frame
+            in_progress.discard(vid := id(obj))
+            done.add(vid)
+            if nesting is not None:
+                constants[vid] = height = nesting + 1
+                hoist = height >= SPLIT_DEPTH
+            else:
+                height += 1
+                hoist = vid in shells or height >= SPLIT_DEPTH
+            if hoist:
+                hoisted.append(obj)
+                height = 0
+            else:
+                heights[vid] = height
+            if stack:
+                parent = stack[-1]
+                parent[2] = max(parent[2], height)
+                if parent[3] is not None:
+                    parent[3] = max(parent[3], constants[vid]) if vid in constants else None
+    return hoisted, shells, set(constants)
+
+
+def constant_nesting(x: Any) -> int | None:
+    return 0 if type(x) is tuple or type(x) is frozenset else None
+
+
+def reconstruct_deep(x: Any, namespace: Namespace) -> expr:
+    """
+    Reconstructs object that is nested too deep to be reconstructed by a single expression
+
+    Parts of the object are assigned to local variables by statements that precede the expression:
+
+    list1 = [[[...]]]
+    list2 = [[[list1]]]
+    return [[[list2]]]
 
-    rv = get_reduce(x, cls)
-    if isinstance(rv, str):  # global name
-        return namespace.unlock_references(x, reconstruct_const(x, namespace))
-    rv = debunk_reduce(*rv)
+    Containers that are referenced by their own items are created empty first,
+    and filled after their items are reconstructed:
+
+    node = new(Node)
+    list1 = [[[node]]]
+    setattr(node, "__dict__", {"children": list1})
+    """
+    hoisted, shells, constants = split_deep(x, namespace)
+    for vid, value in shells.items():
+        name = namespace.hoisted[vid] = namespace.get_name(value)
+        namespace.alive.append(value)
+        if (cls := type(value)) in SHELLS:
+            shell = SHELLS[cls](namespace)
+        else:
+            shell = reconstruct_new(value, namespace)
+        namespace.prelude.append(Assign(targets=[Name(name, ctx=STORE)], value=shell))
+    for value in hoisted:
+        if (vid := id(value)) in constants:
+            # nested constant is too deep for compile(), so it's stored in namespace instead
+            namespace.hoisted[vid] = namespace.store(value).id
+        elif vid in shells:
+            if (fill_statement := fill_contents(value, namespace)) is not None:
+                namespace.prelude.append(Expr(fill_statement))
+        elif vid not in namespace.reconstructed:  # otherwise it's reconstructed already
+            expression = reconstruct_expression(value, namespace)
+            name = namespace.get_name(value)
+            namespace.prelude.append(Assign(targets=[Name(name, ctx=STORE)], value=expression))
+            namespace.hoisted[vid] = name
+    return reconstruct_expression(x, namespace)
+
+
+def fill_contents(x: Any, namespace: Namespace) -> Call | None:
+    """
+    Fills object created empty in advance, see reconstruct_deep()
+    """
+    shell = Name(namespace.hoisted[id(x)])
+    if (cls := type(x)) in SHELLS:
+        contents = optimized_constructors[cls](x, namespace)
+        if isinstance(contents, NamedExpr):  # container was named to be patched
+            contents = contents.value
+        return Call(func=namespace.store(fill), args=[shell, contents], keywords=[])
+    if get_plan(cls) is PLAIN:
+        return set_plain_state(x, namespace, shell) if x.__dict__ else None
+    if not get_slots(x) and not getattr(x, "__dict__", None):
+        return None
+    return set_slots_state(x, namespace, shell)
 
-    return namespace.unlock_references(x, reconstruct_from_reduce(x, namespace, *rv))
+
+# whether cyclic garbage collector is paused while objects are reconstructed, see reconstruct()
+pause_gc: bool = False
+
+
+def reconstruct(
+    x: Any, batch: bool = False, shared: Namespace | None = None, memo: bool = False
+) -> tuple[expr, Namespace]:
+    """
+    Reconstructs x with a single expression, unless it's nested too deep
+
+    With pause_gc set, cyclic garbage collector is paused meanwhile: large objects produce
+    millions of AST nodes, and each collection would traverse all of them, while none of them
+    are in cycles. Collector is paused for the whole process, including other threads and
+    factories built in background, and is enabled again afterwards, even if other code
+    disabled it meanwhile. So it's opt-in, for programs that build large factories up front.
+    """
+    if not pause_gc or not gc.isenabled():
+        return reconstruct_root(x, batch, shared, memo)
+    gc.disable()
+    try:
+        return reconstruct_root(x, batch, shared, memo)
+    finally:
+        gc.enable()
+
+
+def reconstruct_root(
+    x: Any, batch: bool, shared: Namespace | None, memo: bool
+) -> tuple[expr, Namespace]:
+    try:
+        expression = reconstruct_expression(x, namespace := Namespace(batch, shared, memo))
+    except TooDeep:
+        try:
+            expression = reconstruct_deep(x, namespace := Namespace(batch, shared, memo))
+        except TooDeep as e:
+            raise NotImplementedError(
+                "Can't split reconstruction of deeply nested object, "
+                "it must be referencing a tuple or object with custom reduce from within itself"
+            ) from e
+    if namespace.failed:
+        resolve_failed(x, namespace)
+    return expression, namespace
 
 
 def ast_factory(x: T) -> Callable[[], T]:
-    return_value_ast = reconstruct_expression(x, namespace := Namespace())
+    with metrics.phase("analysis"):
+        return_value_ast, namespace = reconstruct(x)
+    if namespace.delegated:
+        # copies made by __deepcopy__() must be shared with the rest of x through memo
+        return ast_memo_factory(x)
+    with metrics.phase("ast"):
+        body = namespace.statements(return_value_ast, Return)
+    return compile_function(f"produce_{type(x).__name__}", body, namespace)
+
+
+def ast_batch_factory(x: T) -> Callable[[int], list[T]]:
+    """
+    Compiles a function that produces n copies of x in one loop:
+
+    def produce_batch(n):
+        batch = []
+        append = batch.append
+        <setup>
+        for i in range(n):
+            append(<reconstruct x>)
+        return batch
+    """
+    with metrics.phase("analysis"):
+        return_value_ast, namespace = reconstruct(x, batch=True)
+    if namespace.delegated:
+        return partial(produce_batch, ast_memo_factory(x))
+    n, index = cast("tuple[str, str]", namespace.batch)
+    batch, append = (namespace.local_name(name) for name in ("batch", "append"))
     return compile_function(
-        f"produce_{type(x).__name__}",
-        [Return(value=return_value_ast)],
+        f"produce_{type(x).__name__}_batch",
+        [
+            Assign(targets=[Name(batch, ctx=STORE)], value=List([])),
+            Assign(
+                targets=[Name(append, ctx=STORE)],
+                value=Attribute(value=Name(batch), attr="append"),
+            ),
+            *namespace.setup,
+            For(
+                target=Name(index, ctx=STORE),
+                iter=Call(func=namespace.store(range), args=[Name(n)], keywords=[]),
+                body=namespace.statements(
+                    return_value_ast,
+                    lambda value: Expr(Call(func=Name(append), args=[value], keywords=[])),
+                ),
+            ),
+            Return(value=Name(batch)),
+        ],
         namespace,
+        args=[n],
     )
 
 
+def ast_memo_factory(x: T) -> Callable[..., T]:
+    """
+    Compiles a function that copies x the same way copy.deepcopy(x, memo) does:
+
+    def produce_memo(memo):
+        return memoize(memo, <reconstruct x, naming each copy>, (list1, dict1, ...))
+
+    Copies are recorded in memo, so they're shared with later deepcopy() calls that use it,
+    and objects with __deepcopy__ are given the same memo.
+    Returned function takes memo as an optional argument,
+    if memo has copies of any objects of x already, x is copied with copy.deepcopy instead.
+    """
+    with metrics.phase("analysis"):
+        return_value_ast, namespace = reconstruct(x, memo=True)
+    with metrics.phase("ast"):
+        originals, names = name_copies(namespace)
+        ids = tuple(map(id, originals))
+        record = namespace.store(partial(memoize, x, ids, originals, namespace.delegated))
+        copies = Tuple([Name(name) for name in names])
+        memo = cast(str, namespace.memo)
+        body = namespace.statements(
+            return_value_ast,
+            lambda value: Return(Call(func=record, args=[Name(memo), value, copies], keywords=[])),
+        )
+    produce = compile_function(f"produce_{type(x).__name__}_memo", body, namespace, args=[memo])
+    return partial(copy_with_memo, produce, x, ids)
+
+
+def name_copies(namespace: Namespace) -> tuple[tuple[Any, ...], list[str]]:
+    """
+    Objects that are copied, rather than shared as is, and names their copies are assigned to
+    """
+    originals: dict[int, Any] = {}
+    names = []
+    for value in namespace.alive:
+        if (vid := id(value)) in originals or type(value) in IMMUTABLE_NON_COLLECTIONS:
+            continue
+        if vid not in namespace.hoisted:
+            expression = namespace.reconstructed.get(vid)
+            if expression is None or type(expression) in CONSTANT_AST_TYPES:
+                continue
+        name = cast(Name, namespace.check_references(value)).id
+        if namespace.names.get(name) is value:
+            continue  # nested constant, see reconstruct_deep()
+        originals[vid] = value
+        names.append(name)
+    return tuple(originals.values()), names
+
+
+def ast_many_factory(objects: Iterable[T]) -> list[Callable[[], T]]:
+    """
+    Same as ast_factory() for each object, but functions are compiled together in one module
+    """
+    shared = Namespace()
+    definitions = []
+    # objects that call __deepcopy__() are compiled separately, see ast_factory()
+    delegated: dict[int, Callable[[], T]] = {}
+    for index, x in enumerate(objects):
+        with metrics.phase("analysis"):
+            return_value_ast, namespace = reconstruct(x, shared=shared)
+        if namespace.delegated:
+            delegated[index] = ast_memo_factory(x)
+            continue
+        with metrics.phase("ast"):
+            body = namespace.statements(return_value_ast, Return)
+        definitions.append((f"produce_{type(x).__name__}", body, namespace))
+    compiled = iter(cast("list[Callable[[], T]]", compile_functions(definitions, shared)))
+    return [
+        delegated[index] if index in delegated else next(compiled)
+        for index in range(len(definitions) + len(delegated))
+    ]
+
+
+# empty containers that are created before their items, when items reference them
+SHELLS: Final[dict[type[Any], Callable[[Namespace], expr]]] = {
+    list: lambda namespace: List([]),
+    dict: lambda namespace: Dict(keys=[], values=[]),
+    set: lambda namespace: Call(func=namespace.store(set), args=[], keywords=[]),
+}
+
 optimized_constructors: dict[type[Any], Callable[[Any, Namespace], expr]] = {
     dict: reconstruct_dict,
     list: reconstruct_list,
@@ -324,8 +1344,15 @@ optimized_constructors: dict[type[Any], Callable[[Any, Namespace], expr]] = {
     frozenset: reconstruct_tuple,
     types.ModuleType: reconstruct_const,
     types.MethodType: reconstruct_method,
+    bytearray: reconstruct_bytearray,
+    array.array: reconstruct_array,
+    memoryview: reconstruct_memoryview,
+    PickleBuffer: reconstruct_pickle_buffer,
     **{t: reconstruct_const for t in IMMUTABLE_NON_COLLECTIONS},
 }
+if numpy is not None:
+    optimized_constructors[numpy.ndarray] = reconstruct_ndarray
+NO_ARGUMENTS: Final = arguments()
 FUNCTION: Final = FunctionDef(
     name="FN",
     body=[],
@@ -335,23 +1362,26 @@ MODULE: Final = Module(
 )
 
 with_source: bool = False
+# FUNCTION and MODULE are shared, held from setting their fields until they're compiled
+compiling: Final = Lock()
 
 
-def compile_function(name: str, body: list[stmt], namespace: Namespace) -> FunctionType:
-    global MODULE, FUNCTION
-    with Lock():
-        # changing variables on predefined AST is much faster
-        # than constructing AST from scratch
-        # locking just in case this is used in different threads
+def compile_function(
+    name: str, body: list[stmt], namespace: Namespace, args: Iterable[str] = ()
+) -> FunctionType:
+    # function is defined in the same namespace, so it must not shadow any names from it
+    name = namespace.local_name(name)
+    # changing variables on predefined AST is much faster than constructing AST from scratch
+    with metrics.phase("compile"), compiling:
         FUNCTION.name = name
         FUNCTION.body = body
-        if with_source:
+        FUNCTION.args = arguments([arg(a) for a in args]) if args else NO_ARGUMENTS
+        if with_source and len(body) == 1:
             # this is most useful for debugging
             # it visualizes the AST it generated back into python syntax
             # it's also slow, so should be disabled, unless utilized
             #
             # TODO: generate this on demand (when source lines are retrieved)
-            assert len(body) == 1, "Initial implementation always contained 1 line of code"
             assert isinstance(body[0], Return)
             assert body[0].value is not None
 
@@ -360,13 +1390,62 @@ def compile_function(name: str, body: list[stmt], namespace: Namespace) -> Funct
             FUNCTION.name = name
             file = f"<duper {hash(return_value)}>"
             linecache.cache[file] = (0, None, source, "")
+        elif with_source:
+            function_source = ast.unparse(FUNCTION)  # type: ignore[arg-type]
+            file = f"<duper {hash(function_source)}>"
+            linecache.cache[file] = (0, None, function_source.splitlines(keepends=True), "")
         else:
             file = "<duper factory (enable introspection to see source code)>"
+        code = compile(cast(ast.Module, MODULE), file, "exec")
 
-        code = compile(MODULE, file, "exec")  # type: ignore[arg-type]
-
-    full_ns = {**globals(), **namespace.names}
-    exec(code, full_ns)
+    with metrics.phase("exec"):
+        full_ns = {**globals(), **namespace.names}
+        exec(code, full_ns)
     function: FunctionType = full_ns[name]
     function.__module__ = __name__
     return function
+
+
+def load_function(code: CodeType, names: dict[str, Any]) -> FunctionType:
+    """
+    Creates a function from code that was compiled by compile_function() before
+    """
+    function = FunctionType(code, {**globals(), **names})
+    function.__module__ = __name__
+    return function
+
+
+def compile_functions(
+    definitions: list[tuple[str, list[stmt], Namespace]], shared: Namespace
+) -> list[FunctionType]:
+    """
+    Compiles functions that store their objects in shared namespace with one compile() and exec()
+    """
+    body: list[FunctionDef] = []
+    for index, (name, function_body, _) in enumerate(definitions):
+        # functions are defined in shared namespace, so their names must be unique there
+        function = FunctionDef(name=shared.local_name(f"{name}_{index}"), body=function_body)
+        function.args = NO_ARGUMENTS
+        body.append(function)
+    module = Module(body=body)
+
+    if with_source:
+        module_source = ast.unparse(module)  # type: ignore[arg-type]
+        file = f"<duper {hash(module_source)}>"
+        linecache.cache[file] = (0, None, module_source.splitlines(keepends=True), "")
+        # functions in generated AST are all on the first line, parsed ones match the source
+        with metrics.phase("compile"):
+            code = compile(module_source, file, "exec")
+    else:
+        file = "<duper factories (enable introspection to see source code)>"
+        with metrics.phase("compile"):
+            code = compile(module, file, "exec")  # type: ignore[call-overload]
+
+    with metrics.phase("exec"):
+        full_ns = {**globals(), **shared.names}
+        exec(code, full_ns)
+    functions: list[FunctionType] = []
+    for function in body:
+        functions.append(produce := full_ns[function.name])
+        produce.__module__ = __name__
+    return functions
@@ -0,0 +1,33 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+bytearray, array.array, memoryview and pickle.PickleBuffer support
+
+Contents of a buffer are captured once as bytes, and every copy is created from them
+with a single constructor call, that copies memory without any intermediate objects.
+"""
+from __future__ import annotations
+
+from copy import Error
+
+
+def spans_whole(x: memoryview) -> bool:
+    """
+    Whether view covers all memory of the object it was taken from
+    """
+    return x.c_contiguous and x.nbytes == memoryview(x.obj).nbytes
+
+
+def layout(x: memoryview, source: memoryview) -> tuple[str, tuple[int, ...]] | None:
+    """
+    Format and shape view must be cast to, if they differ from ones of view over its source
+    """
+    if (x.format, x.shape) == (source.format, source.shape):
+        return None
+    try:
+        source.cast("B").cast(x.format, x.shape or ())  # type: ignore[call-overload]
+    except (TypeError, ValueError) as e:
+        raise Error(f"can't copy memoryview with format {x.format!r}") from e
+    return x.format, x.shape or ()
@@ -0,0 +1,670 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Emit bytecode that creates a deep copy of a given object
+
+This is the same reconstruction as in duper.factories.ast, but instructions are written
+straight into a code object while object is being traversed, so there's no AST to build
+and no compile() to run. All objects the factory needs are stored in co_consts.
+"""
+from __future__ import annotations
+
+import array
+import copyreg
+import sys
+import types
+from collections.abc import Callable
+from collections.abc import Iterable
+from opcode import opmap
+from pickle import PickleBuffer
+from types import FunctionType
+from typing import Any
+from typing import Final
+from typing import TypeVar
+from typing import cast
+
+from duper import metrics
+from duper.constants import IMMUTABLE_NON_COLLECTIONS
+from duper.factories.ast import MAX_DEPTH
+from duper.factories.ast import TooDeep
+from duper.factories.ast import ast_factory
+from duper.factories.ast import ast_memo_factory
+from duper.factories.ast import slots_setter
+from duper.factories.buffers import layout
+from duper.factories.buffers import spans_whole
+from duper.factories.ndarray import numpy
+from duper.factories.ndarray import shareable
+from duper.factories.ndarray import template
+from duper.factories.registry import emitters
+from duper.factories.registry import get_emission
+from duper.factories.runtime import PLAIN
+from duper.factories.runtime import REDUCE
+from duper.factories.runtime import debunk_reduce
+from duper.factories.runtime import get_plan
+from duper.factories.runtime import get_reduce
+from duper.factories.runtime import get_slots
+from duper.factories.runtime import inline_tail
+from duper.factories.runtime import reconstruct_state
+
+
+T = TypeVar("T")
+
+PY: Final = sys.version_info[:2]
+SUPPORTED_VERSIONS: Final = frozenset({(3, 9), (3, 10), (3, 11), (3, 12), (3, 13)})
+
+try:
+    from opcode import _inline_cache_entries  # type: ignore[attr-defined]
+except ImportError:  # Python < 3.11 doesn't have inline caches
+    _inline_cache_entries = {}
+
+# CACHE code units that must follow each instruction
+CACHES: Final[dict[int, bytes]] = (
+    {opmap[name]: bytes(2 * n) for name, n in _inline_cache_entries.items() if n and name in opmap}
+    if isinstance(_inline_cache_entries, dict)
+    else {op: bytes(2 * n) for op, n in enumerate(_inline_cache_entries) if n}
+)
+
+LOAD_CONST: Final = opmap["LOAD_CONST"]
+LOAD_FAST: Final = opmap["LOAD_FAST"]
+STORE_FAST: Final = opmap["STORE_FAST"]
+BUILD_LIST: Final = opmap["BUILD_LIST"]
+BUILD_SET: Final = opmap["BUILD_SET"]
+BUILD_MAP: Final = opmap["BUILD_MAP"]
+BUILD_TUPLE: Final = opmap["BUILD_TUPLE"]
+LIST_APPEND: Final = opmap["LIST_APPEND"]
+LIST_EXTEND: Final = opmap["LIST_EXTEND"]
+SET_ADD: Final = opmap["SET_ADD"]
+SET_UPDATE: Final = opmap["SET_UPDATE"]
+MAP_ADD: Final = opmap["MAP_ADD"]
+RETURN_VALUE: Final = opmap["RETURN_VALUE"]
+EXTENDED_ARG: Final = opmap["EXTENDED_ARG"]
+# these differ between versions, see Assembler.begin_call() and Assembler.end_call()
+RESUME: Final = opmap.get("RESUME")
+PUSH_NULL: Final = opmap.get("PUSH_NULL")
+PRECALL: Final = opmap.get("PRECALL")
+KW_NAMES: Final = opmap.get("KW_NAMES")
+CALL: Final = opmap.get("CALL", opmap.get("CALL_FUNCTION"))
+CALL_KW: Final = opmap.get("CALL_KW", opmap.get("CALL_FUNCTION_KW"))
+STORE_ATTR: Final = opmap["STORE_ATTR"]
+LOAD_ATTR: Final = opmap["LOAD_ATTR"]
+POP_TOP: Final = opmap["POP_TOP"]
+# instructions that duplicate and swap two items on top of the stack
+DUPLICATE_TOP: Final = bytes((opmap["COPY"], 1) if "COPY" in opmap else (opmap["DUP_TOP"], 0))
+SWAP_TOP: Final = bytes((opmap["SWAP"], 2) if "SWAP" in opmap else (opmap["ROT_TWO"], 0))
+
+# same as in CPython compiler: bigger collections are built incrementally
+STACK_USE_GUIDELINE: Final = 30
+# location table entry with no column info and line delta of 0, see Objects/locations.md
+NO_COLUMNS_ENTRY: Final = 13
+
+TEMPLATE: Final = (lambda: None).__code__
+
+
+def extended_arg(arg: int) -> bytes:
+    """
+    EXTENDED_ARG prefixes for arguments that don't fit in one byte
+    """
+    return bytes(
+        byte
+        for shift in (24, 16, 8)
+        if arg >> shift
+        for byte in (EXTENDED_ARG, (arg >> shift) & 0xFF)
+    )
+
+
+class Local:
+    """
+    Placeholder for `COPY 1; STORE_FAST index` right after object was created
+
+    Index is assigned only when object is referenced again, otherwise nothing is emitted
+    """
+
+    __slots__ = ("index", "depth")
+
+    def __init__(self, depth: int) -> None:
+        self.index: int | None = None
+        self.depth = depth
+
+
+CONSTANT: Final = Local(0)  # marks objects that are loaded with LOAD_CONST
+
+
+class Assembler:
+    def __init__(self) -> None:
+        self.code = bytearray()
+        # offsets in code where objects that might be referenced again were created
+        self.locals: list[tuple[int, Local]] = []
+        # first constant is reserved: a str in there would become function's docstring
+        self.consts: list[Any] = [None]
+        self.const_indexes: dict[int, int] = {}
+        self.varnames: list[str] = []
+        self.names: list[str] = []
+        self.depth = 0
+        self.max_depth = 0
+        self.nesting = 0  # of objects being emitted
+        # id -> (object, Local or CONSTANT when it's done, None when it's being emitted)
+        # keeping object itself here makes sure its id won't be reused while emitting
+        self.memo: dict[int, tuple[Any, Local | None]] = {}
+        # whether any __deepcopy__() is called while copying, see duper.factories.ast.delegate()
+        self.delegated = False
+        if RESUME is not None:
+            self.emit(RESUME, 0, 0)
+
+    def emit(self, op: int, arg: int, effect: int) -> None:
+        code = self.code
+        if arg > 0xFF:
+            code += extended_arg(arg)
+        code.append(op)
+        code.append(arg & 0xFF)
+        if (caches := CACHES.get(op)) is not None:
+            code += caches
+        self.depth += effect
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+    def mark(self) -> tuple[int, int, int]:
+        return len(self.code), len(self.locals), self.depth
+
+    def rewind(self, mark: tuple[int, int, int]) -> None:
+        offset, locals_count, self.depth = mark
+        del self.code[offset:]
+        del self.locals[locals_count:]
+
+    def const_index(self, value: Any) -> int:
+        if (index := self.const_indexes.get(id(value))) is None:
+            index = self.const_indexes[id(value)] = len(self.consts)
+            self.consts.append(value)
+        return index
+
+    def name_index(self, name: str) -> int:
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def load_attr(self, name: str) -> None:
+        # since 3.12 lowest bit of the argument tells whether to load a method instead
+        index = self.name_index(name)
+        self.emit(LOAD_ATTR, index << 1 if PY >= (3, 12) else index, 0)
+
+    def load_const(self, value: Any) -> bool:
+        self.emit(LOAD_CONST, self.const_index(value), 1)
+        return True
+
+    def check_references(self, value: Any) -> bool | None:
+        """
+        Loads already emitted object and returns True if it was loaded as a constant
+        """
+        if (seen := self.memo.get(vid := id(value))) is None:
+            self.memo[vid] = (value, None)
+            return None
+
+        local = seen[1]
+        if local is None:
+            raise NotImplementedError(
+                f"Already seen {type(value)=}, {id(value)=} self-reflexive types are not supported yet"
+            )
+        if local is CONSTANT:
+            return self.load_const(value)
+        if local.index is None:
+            local.index = len(self.varnames)
+            self.varnames.append(f"{type(value).__name__.lower()}{local.index}")
+            self.max_depth = max(self.max_depth, local.depth + 1)
+        self.emit(LOAD_FAST, local.index, 1)
+        return False
+
+    def remember(self, value: Any) -> None:
+        """
+        Makes object on top of the stack available for later references
+        """
+        self.locals.append((len(self.code), local := Local(self.depth)))
+        self.memo[id(value)] = (value, local)
+
+    def unlock_references(self, value: Any, constant: bool) -> bool:
+        if constant:
+            self.memo[id(value)] = (value, CONSTANT)
+        elif self.memo[id(value)][1] is None:
+            self.remember(value)
+        return constant
+
+    def begin_call(self, func: Any) -> None:
+        if PY >= (3, 13):
+            self.load_const(func)
+            self.emit(cast(int, PUSH_NULL), 0, 1)
+        elif PY >= (3, 11):
+            self.emit(cast(int, PUSH_NULL), 0, 1)
+            self.load_const(func)
+        else:
+            self.load_const(func)
+
+    def end_call(self, argc: int, kwnames: tuple[str, ...] = ()) -> None:
+        # callable and NULL (if any) are replaced with the result
+        effect = -argc - (0 if PY < (3, 11) else 1)
+        if PY >= (3, 13) or PY < (3, 11):
+            if kwnames:
+                self.load_const(kwnames)
+                self.emit(cast(int, CALL_KW), argc, effect - 1)
+            else:
+                self.emit(cast(int, CALL), argc, effect)
+            return
+
+        if kwnames:
+            self.emit(cast(int, KW_NAMES), self.const_index(kwnames), 0)
+        if PY == (3, 11):
+            self.emit(cast(int, PRECALL), argc, 0)
+        self.emit(cast(int, CALL), argc, effect)
+
+    def assemble(self) -> bytes:
+        """
+        Inserts `COPY 1; STORE_FAST index` for objects that were referenced again
+        """
+        self.emit(RETURN_VALUE, 0, -1)
+        if not self.varnames:
+            return bytes(self.code)
+
+        code = bytearray()
+        start = 0
+        for offset, local in self.locals:
+            if local.index is None:
+                continue
+            code += self.code[start:offset]
+            code += DUPLICATE_TOP
+            code += extended_arg(local.index)
+            code.append(STORE_FAST)
+            code.append(local.index & 0xFF)
+            start = offset
+        code += self.code[start:]
+        return bytes(code)
+
+    def build_function(self, name: str) -> FunctionType:
+        code = self.assemble()
+        if PY >= (3, 11):
+            # each code unit is located on the first line of the factory
+            units = len(code) // 2
+            linetable = bytearray()
+            while units > 0:
+                linetable += bytes((0x80 | NO_COLUMNS_ENTRY << 3 | min(units, 8) - 1, 0))
+                units -= 8
+            location: dict[str, Any] = dict(
+                co_linetable=bytes(linetable), co_exceptiontable=b"", co_qualname=name
+            )
+        elif PY == (3, 10):
+            location = dict(co_linetable=b"")
+        else:
+            location = dict(co_lnotab=b"")
+
+        code_object = TEMPLATE.replace(
+            co_code=code,
+            co_consts=tuple(self.consts),
+            co_names=tuple(self.names),
+            co_varnames=tuple(self.varnames),
+            co_nlocals=len(self.varnames),
+            co_stacksize=self.max_depth,
+            co_name=name,
+            co_filename="<duper bytecode factory>",
+            co_firstlineno=1,
+            **location,
+        )
+        return FunctionType(code_object, globals(), name)
+
+
+def emit_items(
+    x: Iterable[Any],
+    size: int,
+    asm: Assembler,
+    build: int,
+    add: int,
+    update: int,
+) -> bool:
+    """
+    Emits list or set literal, returns True if all of its items are constants
+    """
+    mark = asm.mark()
+    constant = True
+    if size > STACK_USE_GUIDELINE:
+        asm.emit(build, 0, 1)
+        for item in x:
+            constant &= emit_expression(item, asm)
+            asm.emit(add, 1, -1)
+    else:
+        for item in x:
+            constant &= emit_expression(item, asm)
+        asm.emit(build, size, 1 - size)
+
+    if constant and size > 2:
+        # same as CPython compiler does, [1, 2, 3] -> BUILD_LIST 0; LOAD_CONST (1, 2, 3); LIST_EXTEND 1
+        asm.rewind(mark)
+        asm.emit(build, 0, 1)
+        asm.load_const(tuple(x))
+        asm.emit(update, 1, -1)
+    return constant
+
+
+def emit_const(x: Any, asm: Assembler) -> bool:
+    return asm.load_const(x)
+
+
+def emit_list(x: list[Any], asm: Assembler) -> bool:
+    emit_items(x, len(x), asm, BUILD_LIST, LIST_APPEND, LIST_EXTEND)
+    return False
+
+
+def emit_set(x: set[Any], asm: Assembler) -> bool:
+    emit_items(x, len(x), asm, BUILD_SET, SET_ADD, SET_UPDATE)
+    return False
+
+
+def emit_dict(x: dict[Any, Any], asm: Assembler) -> bool:
+    if (size := len(x)) > STACK_USE_GUIDELINE:
+        asm.emit(BUILD_MAP, 0, 1)
+        for key, value in x.items():
+            emit_expression(key, asm)
+            emit_expression(value, asm)
+            asm.emit(MAP_ADD, 1, -2)
+    else:
+        for key, value in x.items():
+            emit_expression(key, asm)
+            emit_expression(value, asm)
+        asm.emit(BUILD_MAP, size, 1 - 2 * size)
+    return False
+
+
+def emit_tuple(x: tuple[Any, ...], asm: Assembler) -> bool:
+    mark = asm.mark()
+    constant = True
+    for item in x:
+        constant &= emit_expression(item, asm)
+    if constant:
+        asm.rewind(mark)
+        return asm.load_const(x)
+    asm.emit(BUILD_TUPLE, len(x), 1 - len(x))
+    return False
+
+
+def emit_frozenset(x: frozenset[Any], asm: Assembler) -> bool:
+    mark = asm.mark()
+    asm.begin_call(frozenset)
+    if emit_items(x, len(x), asm, BUILD_SET, SET_ADD, SET_UPDATE):
+        asm.rewind(mark)
+        return asm.load_const(x)
+    asm.end_call(1)
+    return False
+
+
+def emit_method(x: types.MethodType, asm: Assembler) -> bool:
+    asm.begin_call(types.MethodType)
+    asm.load_const(x.__func__)
+    emit_expression(x.__self__, asm)
+    asm.end_call(2)
+    return False
+
+
+def emit_buffer(contents: bytes, readonly: bool, asm: Assembler) -> bool:
+    if readonly:
+        return asm.load_const(contents)
+    asm.begin_call(bytearray)
+    asm.load_const(contents)
+    asm.end_call(1)
+    return False
+
+
+def emit_bytearray(x: bytearray, asm: Assembler) -> bool:
+    return emit_buffer(bytes(x), False, asm)
+
+
+def emit_array(x: array.array[Any], asm: Assembler) -> bool:
+    asm.begin_call(array.array)
+    asm.load_const(x.typecode)
+    asm.load_const(x.tobytes())
+    asm.end_call(2)
+    return False
+
+
+def emit_memoryview(x: memoryview, asm: Assembler) -> bool:
+    """
+    Based on duper.factories.ast.reconstruct_memoryview
+    """
+    if x.readonly and type(x.obj) is bytes:
+        return asm.load_const(x)
+    whole = spans_whole(x)
+    source = memoryview(x.obj) if whole else memoryview(contents := x.tobytes())
+    cast_to = layout(x, source)
+    if readonly := x.readonly and not source.readonly:
+        asm.begin_call(memoryview.toreadonly)
+    if cast_to is not None:
+        asm.begin_call(memoryview.cast)
+        asm.begin_call(memoryview.cast)
+    asm.begin_call(memoryview)
+    if whole:
+        emit_expression(x.obj, asm)
+    else:
+        emit_buffer(contents, x.readonly, asm)
+    asm.end_call(1)
+    if cast_to is not None:
+        asm.load_const("B")
+        asm.end_call(2)
+        asm.load_const(cast_to[0])
+        asm.load_const(cast_to[1])
+        asm.end_call(3)
+    if readonly:
+        asm.end_call(1)
+    return False
+
+
+def emit_pickle_buffer(x: PickleBuffer, asm: Assembler) -> bool:
+    view = memoryview(x)
+    asm.begin_call(PickleBuffer)
+    emit_buffer(view.tobytes(), view.readonly, asm)
+    asm.end_call(1)
+    return False
+
+
+def emit_ndarray(x: Any, asm: Assembler) -> bool:
+    """
+    Based on duper.factories.ast.reconstruct_ndarray
+    """
+    if x.dtype.hasobject:
+        asm.delegated = True
+        return emit_from_reduce(x, asm, x.__deepcopy__, ({},), {})
+    if shareable(x):
+        return asm.load_const(x)
+    asm.begin_call(numpy.ndarray.copy)
+    asm.load_const(template(x))
+    asm.load_const("K")
+    asm.end_call(2)
+    return False
+
+
+def emit_call(
+    func: Callable[..., Any], args: Iterable[Any], kwargs: dict[str, Any], asm: Assembler
+) -> None:
+    asm.begin_call(func)
+    argc = 0
+    for argc, item in enumerate(args, 1):
+        emit_expression(item, asm)
+    for item in kwargs.values():
+        emit_expression(item, asm)
+    asm.end_call(argc + len(kwargs), tuple(kwargs))
+
+
+def emit_from_reduce(
+    x: Any,
+    asm: Assembler,
+    func: Callable[..., Any],
+    args: Any,
+    kwargs: Any,
+    state: Any = None,
+    listiter: Iterable[Any] | None = None,
+    dictiter: Iterable[tuple[Any, Any]] | None = None,
+) -> bool:
+    if state is None and listiter is None and dictiter is None:
+        emit_call(func, args, kwargs, asm)
+        return False
+
+    if inline_tail(cls := type(x), state, listiter is not None, dictiter is not None):
+        # func(...), then cls.__setstate__(obj, ...), cls.extend(obj, [...]), cls.update(obj, {...})
+        emit_call(func, args, kwargs, asm)
+        # newly created instance will be referenced during reconstruction
+        asm.remember(x)
+        if state is not None:
+            if getattr(x, "__setstate__", None) is not None:
+                asm.begin_call(cls.__setstate__)
+                asm.check_references(x)
+            else:
+                asm.begin_call(dict.update)
+                asm.check_references(x)
+                asm.load_attr("__dict__")
+            emit_expression(state, asm)
+            asm.end_call(2)
+            asm.emit(POP_TOP, 0, -1)
+        if listiter is not None:
+            asm.begin_call(list.extend)
+            asm.check_references(x)
+            emit_list(list(listiter), asm)
+            asm.end_call(2)
+            asm.emit(POP_TOP, 0, -1)
+        if dictiter is not None:
+            asm.begin_call(cls.update)
+            asm.check_references(x)
+            emit_dict(dict(dictiter), asm)
+            asm.end_call(2)
+            asm.emit(POP_TOP, 0, -1)
+        return False
+
+    asm.begin_call(reconstruct_state)
+    emit_call(func, args, kwargs, asm)
+    # newly created instance will be referenced during reconstruction
+    asm.remember(x)
+    emit_expression(state, asm)
+    asm.begin_call(iter)
+    emit_list(list(listiter) if listiter else [], asm)
+    asm.end_call(1)
+    asm.begin_call(dict.items)
+    emit_dict(dict(dictiter) if dictiter else {}, asm)
+    asm.end_call(1)
+    asm.end_call(4)
+    return False
+
+
+def emit_plain(x: Any, asm: Assembler) -> bool:
+    """
+    Instance that is reconstructed from its __dict__ alone: new(cls), then STORE_ATTR __dict__
+    """
+    cls = type(x)
+    if getattr(cls, "__setattr__") is not object.__setattr__:  # STORE_ATTR would call it
+        return emit_from_reduce(x, asm, cls.__new__, (cls,), {}, x.__dict__ or None)
+    emit_call(cls.__new__, (cls,), {}, asm)
+    if not x.__dict__:
+        return False
+    # newly created instance will be referenced during reconstruction
+    asm.remember(x)
+    asm.emit(DUPLICATE_TOP[0], DUPLICATE_TOP[1], 1)
+    emit_dict(x.__dict__, asm)
+    asm.emit(SWAP_TOP[0], SWAP_TOP[1], 0)
+    asm.emit(STORE_ATTR, asm.name_index("__dict__"), -2)
+    return False
+
+
+def emit_slots(x: Any, asm: Assembler) -> bool:
+    """
+    Instance that is reconstructed from its __slots__ and __dict__ (if any), see slots_setter()
+    """
+    cls = type(x)
+    state = getattr(x, "__dict__", None) or None
+    if not (slots := get_slots(x)) and state is None:
+        emit_call(cls.__new__, (cls,), {}, asm)
+        return False
+    asm.begin_call(slots_setter(cls, tuple(slots), state is not None))
+    emit_call(cls.__new__, (cls,), {}, asm)
+    # newly created instance will be referenced during reconstruction
+    asm.remember(x)
+    if state is not None:
+        emit_dict(state, asm)
+    for value in slots.values():
+        emit_expression(value, asm)
+    asm.end_call(1 + (state is not None) + len(slots))
+    return False
+
+
+def emit_expression(x: Any, asm: Assembler) -> bool:
+    """
+    Based on duper.factories.ast.reconstruct_expression
+
+    Leaves an instruction sequence that puts reconstructed object on top of the stack
+    Returns True if object was loaded as is with LOAD_CONST
+    """
+    cls = type(x)
+    if cls in IMMUTABLE_NON_COLLECTIONS:
+        return asm.load_const(x)
+
+    existing = asm.check_references(x)
+    if existing is not None:
+        return existing
+
+    if asm.nesting == MAX_DEPTH:
+        raise TooDeep(f"{cls} is nested deeper than {MAX_DEPTH} levels")
+    asm.nesting += 1
+    constant = asm.unlock_references(x, emit_object(x, cls, asm))
+    asm.nesting -= 1
+    return constant
+
+
+def emit_object(x: Any, cls: type[Any], asm: Assembler) -> bool:
+    emitter: Callable[[Any, Assembler], bool] | None = optimized_emitters.get(cls)
+
+    if emitter is not None:
+        return emitter(x, asm)
+
+    if (plan := get_plan(cls)) is not REDUCE and cls not in copyreg.dispatch_table:
+        return emit_plain(x, asm) if plan is PLAIN else emit_slots(x, asm)
+
+    if (registered := emitters.get(cls)) is not None:
+        if (emission := get_emission(x, registered)) is None:
+            return asm.load_const(x)
+        return emit_from_reduce(x, asm, *emission)
+
+    if (custom_copier := getattr(x, "__deepcopy__", None)) is not None:
+        asm.delegated = True
+        return emit_from_reduce(x, asm, custom_copier, ({},), {})
+
+    rv = get_reduce(x, cls)
+    if isinstance(rv, str):  # global name
+        return asm.load_const(x)
+
+    return emit_from_reduce(x, asm, *debunk_reduce(*rv))
+
+
+def bytecode_factory(x: T) -> Callable[[], T]:
+    if PY not in SUPPORTED_VERSIONS:
+        raise NotImplementedError(
+            f"Bytecode factory doesn't support Python {'.'.join(map(str, PY))} yet"
+        )
+    try:
+        with metrics.phase("analysis"):
+            emit_expression(x, asm := Assembler())
+    except TooDeep:
+        # reconstruction of deeply nested objects is split into statements, see reconstruct_deep()
+        return ast_factory(x)
+    if asm.delegated:
+        return ast_memo_factory(x)
+    with metrics.phase("assemble"):
+        return asm.build_function(f"produce_{type(x).__name__}")
+
+
+optimized_emitters: dict[type[Any], Callable[[Any, Assembler], bool]] = {
+    dict: emit_dict,
+    list: emit_list,
+    set: emit_set,
+    tuple: emit_tuple,
+    frozenset: emit_frozenset,
+    types.ModuleType: emit_const,
+    types.MethodType: emit_method,
+    bytearray: emit_bytearray,
+    array.array: emit_array,
+    memoryview: emit_memoryview,
+    PickleBuffer: emit_pickle_buffer,
+    **{t: emit_const for t in IMMUTABLE_NON_COLLECTIONS},
+}
+if numpy is not None:
+    optimized_emitters[numpy.ndarray] = emit_ndarray
@@ -0,0 +1,187 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+On-disk cache of compiled factories
+
+Code of a factory is marshalled to a file, named after a fingerprint of the object,
+Python magic number and duper version. Objects from factory namespace are saved by their
+qualified names and imported again on load, immutable values are marshalled along with the code.
+Factories that reference anything else are compiled as usual and are never cached.
+
+Fingerprint is a hash of the pickled object and of emitters registered with duper.register(),
+since they change how objects are reconstructed. Objects that can't be pickled are never cached,
+and sets of strings may miss the cache between processes with different hash seeds.
+Emitters are identified by their qualified names, or by their code if they can't be imported,
+like lambdas, so values captured by their closures are not part of the fingerprint.
+
+Like .pyc files, cache files are executed on load, so the directory must be trusted.
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib
+import marshal
+import os
+import pickle
+import tempfile
+import types
+from collections.abc import Callable
+from importlib.util import MAGIC_NUMBER
+from typing import Any
+from typing import Final
+from typing import TypeVar
+
+from duper.__about__ import __version__
+from duper.factories.ast import compile_function
+from duper.factories.ast import load_function
+from duper.factories.ast import reconstruct
+from duper.factories.registry import emitters
+from duper.fastast import Return
+
+
+T = TypeVar("T")
+
+MARSHALLED_TYPES: Final = frozenset(
+    {type(None), type(...), bool, int, float, complex, str, bytes, tuple, frozenset}
+)
+
+
+def registered() -> bytes | None:
+    """
+    Registered classes with their emitters, None if some emitter can't be told apart from others
+    """
+    entries = []
+    for cls, emitter in emitters.items():
+        entry: Any = describe(emitter)
+        if entry is None or len(entry) != 2:
+            if type(code := getattr(emitter, "__code__", None)) is not types.CodeType:
+                return None
+            entry = marshal.dumps(code)
+        entries.append(repr((cls.__module__, cls.__qualname__, entry)))
+    return "\n".join(sorted(entries)).encode()
+
+
+def fingerprint(x: Any) -> str | None:
+    """
+    Hash that changes whenever structure or values of x, or registered emitters change,
+    None if x can't be pickled
+    """
+    if (registry := registered()) is None:
+        return None
+    try:
+        data = pickle.dumps(x, protocol=5)
+    except Exception:
+        return None
+    digest = hashlib.blake2b(MAGIC_NUMBER, digest_size=20)
+    digest.update(__version__.encode())
+    digest.update(registry)
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def resolve(module: str, qualname: str) -> Any:
+    value: Any = importlib.import_module(module)
+    for attr in qualname.split(".") if qualname else ():
+        value = getattr(value, attr)
+    return value
+
+
+def marshalled(value: Any) -> bool:
+    """
+    Whether value is immutable and comes back from marshal as an equal object
+    """
+    if type(value) not in MARSHALLED_TYPES:
+        return False
+    return type(value) not in (tuple, frozenset) or all(map(marshalled, value))
+
+
+def describe_template(value: Any) -> tuple[Any] | None:
+    """
+    (template,) to marshal it, None if it holds values that can't be marshalled, see emission
+    """
+    items = [*value, *value.values()] if type(value) is dict else value
+    return (value,) if all(map(marshalled, items)) else None
+
+
+def describe(value: Any) -> tuple[str, str] | tuple[Any] | None:
+    """
+    (module, qualname) to import value on load, (value,) to marshal it, None if it's neither
+    """
+    if isinstance(value, types.ModuleType):
+        return value.__name__, ""
+    if (module := getattr(value, "__module__", None)) is None:
+        # methods of builtin types, like dict.update or object.__new__
+        owner = getattr(value, "__objclass__", None) or getattr(value, "__self__", None)
+        module = getattr(owner, "__module__", None) if isinstance(owner, type) else None
+    qualname = getattr(value, "__qualname__", None)
+    if type(module) is str and type(qualname) is str and "<" not in qualname:
+        try:
+            if resolve(module, qualname) is value:
+                return module, qualname
+        except (ImportError, AttributeError):
+            pass
+    if marshalled(value):
+        return (value,)
+    return None
+
+
+class DiskCache:
+    """
+    Compiles factories like ast_factory(), but keeps their code in directory between processes
+
+    >>> produce = duper.deepdups(template, factory=DiskCache("~/.cache/duper"))  # doctest: +SKIP
+    """
+
+    def __init__(self, directory: str | os.PathLike[str]) -> None:
+        self.directory = os.path.expanduser(directory)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.directory!r})"
+
+    def __call__(self, x: T) -> Callable[[], T]:
+        key = fingerprint(x)
+        if key is not None and (function := self.load(key)) is not None:
+            return function
+        return_value_ast, namespace = reconstruct(x)
+        function = compile_function(
+            f"produce_{type(x).__name__}",
+            namespace.statements(return_value_ast, Return),
+            namespace,
+        )
+        if key is not None:
+            self.dump(key, function, namespace.names, namespace.templates)
+        return function
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.marshal")
+
+    def load(self, key: str) -> Callable[[], Any] | None:
+        try:
+            with open(self.path(key), "rb") as file:
+                code, entries = marshal.load(file)
+            names = {
+                name: entry[0] if len(entry) == 1 else resolve(*entry)
+                for name, entry in entries.items()
+            }
+        except (OSError, EOFError, ValueError, TypeError, ImportError, AttributeError):
+            return None  # missing, corrupted, or its objects can't be imported anymore
+        return load_function(code, names)
+
+    def dump(
+        self, key: str, function: types.FunctionType, names: dict[str, Any], templates: set[int]
+    ) -> None:
+        entries = {}
+        for name, value in names.items():
+            entry = describe_template(value) if id(value) in templates else describe(value)
+            if entry is None:
+                return
+            entries[name] = entry
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile("wb", dir=self.directory, delete=False) as file:
+                marshal.dump((function.__code__, entries), file)
+            os.replace(file.name, self.path(key))
+        except OSError:
+            pass  # cache is best effort, factory is already compiled
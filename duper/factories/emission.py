@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Cost model that picks how lists, sets and dicts that hold only constants are reconstructed
+
+There are a few ways to emit such container:
+- LITERAL: [1, 2], {1, 2}, {"a": 1}. CPython compiles constant list and set literals to
+  list.extend(tuple) and set.update(frozenset) already, dict literal inserts items one by one
+- COPY: template.copy(), where template is a snapshot of the container stored in namespace,
+  dict.copy() clones hash table of the template, without hashing and inserting each item
+- CONSTRUCTOR: list(tuple) or set(frozenset), from a constant
+
+Which one is the cheapest depends on type and size of the container, on whether hashes of its items
+are cached (str) or computed on each insert (tuple), and on the interpreter.
+So costs are measured once per process, when the first container of constants is reconstructed,
+by timing each strategy on containers of a few sizes. It takes about 20ms.
+"""
+from __future__ import annotations
+
+import threading
+import timeit
+from bisect import bisect_right
+from collections.abc import Callable
+from collections.abc import Iterable
+from threading import Lock
+from typing import Any
+from typing import Final
+
+
+LITERAL: Final = "literal"
+COPY: Final = "copy"
+CONSTRUCTOR: Final = "constructor"
+
+STRATEGIES: Final[dict[type[Any], tuple[str, ...]]] = {
+    list: (LITERAL, COPY, CONSTRUCTOR),
+    set: (LITERAL, COPY, CONSTRUCTOR),
+    dict: (LITERAL, COPY),
+}
+# containers of these sizes are timed, others get the strategy of the nearest smaller size
+SIZES: Final = (1, 4, 16, 64, 256)
+# literals are kept unless other strategy is faster by this much,
+# they don't store anything in namespace and their source is easier to read
+MARGIN: Final = 0.9
+# items of each timed container are touched about this many times per timing
+ITEMS_PER_TIMING: Final = 4096
+
+# cheapest strategy for (type, whether item hashes are computed, size), see calibrate()
+choices: dict[tuple[type[Any], bool, int], str] = {}
+lock = Lock()
+
+# factories built in current thread emit literals only while it's set, see literals()
+local = threading.local()
+
+
+def literals(enabled: bool) -> bool:
+    """
+    Makes factories built in current thread emit literals regardless of costs, returns previous
+
+    Used when constants must stay in code of a factory, see ShapeCache
+    """
+    previous: bool = getattr(local, "literals", False)
+    local.literals = enabled
+    return previous
+
+
+def computes_hashes(items: Iterable[Any]) -> bool:
+    """
+    Whether hashes of items are computed each time they're inserted, instead of being cached
+    """
+    return any(type(item) is tuple for item in items)
+
+
+def sample(cls: type[Any], computed_hashes: bool, size: int) -> Any:
+    items = [(i, i) if computed_hashes else f"k{i}" for i in range(size)]
+    if cls is dict:
+        return dict.fromkeys(items, 0)
+    return cls(items)
+
+
+def source(strategy: str, x: Any) -> str:
+    if strategy is COPY:
+        return "template.copy()"
+    if strategy is CONSTRUCTOR:
+        return f"{type(x).__name__}(constant)"
+    return repr(x)
+
+
+def measure(strategy: str, x: Any) -> float:
+    """
+    Best time of producing x with strategy
+    """
+    names = {
+        "template": x.copy(),
+        "constant": tuple(x) if type(x) is list else frozenset(x),
+    }
+    exec(f"def produce():\n    return {source(strategy, x)}", names)
+    produce: Callable[[], Any] = names["produce"]
+    number = max(ITEMS_PER_TIMING // len(x), 1)
+    return min(timeit.repeat(produce, number=number, repeat=3))
+
+
+def calibrate() -> dict[tuple[type[Any], bool, int], str]:
+    """
+    Measures costs of every strategy on this interpreter, and remembers the cheapest ones
+    """
+    measured = {}
+    for cls, strategies in STRATEGIES.items():
+        # items of a list are never hashed
+        for computed_hashes in (False, True) if cls is not list else (False,):
+            for size in SIZES:
+                x = sample(cls, computed_hashes, size)
+                costs = {strategy: measure(strategy, x) for strategy in strategies}
+                costs[LITERAL] *= MARGIN
+                measured[cls, computed_hashes, size] = min(costs, key=costs.__getitem__)
+    choices.update(measured)
+    return measured
+
+
+def choose(cls: type[Any], size: int, computed_hashes: bool) -> str:
+    """
+    Cheapest strategy to emit container of cls with size constants, measured once per process
+    """
+    if getattr(local, "literals", False):
+        return LITERAL
+    if not choices:
+        with lock:  # factories may be built in many threads, costs are measured only in one
+            if not choices:
+                calibrate()
+    bucket = SIZES[max(bisect_right(SIZES, size) - 1, 0)]
+    return choices[cls, computed_hashes and cls is not list, bucket]
@@ -0,0 +1,258 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Factory that can be refreshed after the source object is mutated
+
+Top levels of dicts and lists are split into subtrees, each compiled into its own sub-factory.
+Factory of a split container only calls sub-factories of its items, so it's cheap to compile.
+On refresh, subtrees are compared against snapshots from the last build,
+and only the ones that changed are compiled again.
+"""
+from __future__ import annotations
+
+import copyreg
+from collections.abc import Callable
+from typing import Any
+from typing import Final
+from typing import Generic
+from typing import TypeVar
+from typing import Union
+from typing import cast
+
+from duper.constants import IMMUTABLE_NON_COLLECTIONS
+from duper.factories.ast import Namespace
+from duper.factories.ast import ast_factory
+from duper.factories.ast import compile_function
+from duper.factories.ast import reconstruct_expression
+from duper.factories.runtime import PLAIN
+from duper.factories.runtime import REDUCE
+from duper.factories.runtime import SLOTS
+from duper.factories.runtime import get_plan
+from duper.factories.runtime import get_slots
+from duper.fastast import Call
+from duper.fastast import Dict
+from duper.fastast import List
+from duper.fastast import Return
+from duper.fastast import expr
+
+
+T = TypeVar("T")
+
+SPLIT_TYPES: Final = frozenset({dict, list})
+
+
+class Shared(Exception):
+    """Same mutable object is reachable from more than one subtree"""
+
+
+class Unit:
+    """
+    Subtree that is compiled as a whole
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self.factory = factory
+        # copy of the subtree as it was at the build time
+        self.snapshot = factory()
+
+
+class Branch:
+    """
+    Dict or list which items are compiled separately
+    """
+
+    def __init__(self, cls: type[Any], keys: list[Any], children: list[Node]) -> None:
+        self.cls = cls
+        self.keys = keys
+        self.children = children
+        self.factory = compile_branch(self)
+
+
+Node = Union[Unit, Branch]
+
+
+def compile_branch(branch: Branch) -> Callable[[], Any]:
+    namespace = Namespace()
+    calls: list[expr] = [
+        Call(func=namespace.store(child.factory), args=[], keywords=[])
+        for child in branch.children
+    ]
+    expression: expr
+    if branch.cls is dict:
+        expression = Dict(
+            keys=[reconstruct_expression(key, namespace) for key in branch.keys], values=calls
+        )
+    else:
+        expression = List(calls)
+    return compile_function(f"produce_{branch.cls.__name__}", [Return(expression)], namespace)
+
+
+def exact(value: Any) -> Any:
+    """
+    Value to compare, floats that are equal but differ in sign of zero are told apart
+    """
+    if type(value) is float:
+        return value.hex()
+    if type(value) is complex:
+        return value.real.hex(), value.imag.hex()
+    return value
+
+
+def same(x: Any, snapshot: Any) -> bool:
+    """
+    Whether x is still equal to its snapshot, types are compared strictly, e.g. 1 is not True
+    """
+    # pairs are compared from an explicit stack, so deeply nested objects don't exhaust it
+    stack = [(x, snapshot)]
+    seen: set[tuple[int, int]] = set()
+    while stack:
+        x, snapshot = stack.pop()
+        if (cls := type(x)) is not type(snapshot):
+            return False
+        if cls in IMMUTABLE_NON_COLLECTIONS:
+            if not (x is snapshot or exact(x) == exact(snapshot)):
+                return False
+            continue
+        if (id(x), id(snapshot)) in seen:
+            continue  # compared already, or being compared, if it references itself
+        seen.add((id(x), id(snapshot)))
+        if cls is list or cls is tuple:
+            if len(x) != len(snapshot):
+                return False
+            stack += zip(x, snapshot)
+        elif cls is dict:
+            if len(x) != len(snapshot):
+                return False
+            stack += zip(x, snapshot)
+            stack += zip(x.values(), snapshot.values())
+        elif cls is set or cls is frozenset:
+            if not all(type(item) in IMMUTABLE_NON_COLLECTIONS for item in x) or {
+                (type(item), exact(item)) for item in x
+            } != {(type(item), exact(item)) for item in snapshot}:
+                return False
+        elif getattr(cls, "__eq__") is not object.__eq__:
+            if not x == snapshot:
+                return False
+        elif get_plan(cls) is not PLAIN or cls in copyreg.dispatch_table:
+            return False  # no reliable way of telling whether it was changed
+        else:
+            stack.append((x.__dict__, snapshot.__dict__))
+    return True
+
+
+def collect(x: Any, owner: int, owners: dict[int, int]) -> None:
+    """
+    Marks mutable objects reachable from x as owned by a subtree
+
+    Raises Shared for objects which references can't be enumerated, e.g. ones that are reduced,
+    since they may share objects with other subtrees.
+    """
+    stack = [x]
+    while stack:
+        x = stack.pop()
+        if (cls := type(x)) in IMMUTABLE_NON_COLLECTIONS or isinstance(x, type):
+            continue
+        if (seen := owners.get(id(x))) is not None:
+            if seen != owner:
+                raise Shared(f"{cls} is referenced from more than one subtree")
+            continue  # already visited within this subtree
+        owners[id(x)] = owner
+        if cls is dict:
+            stack += x.keys()
+            stack += x.values()
+        elif cls is list or cls is tuple or cls is set or cls is frozenset:
+            stack += x
+        elif (plan := get_plan(cls)) is REDUCE or cls in copyreg.dispatch_table:
+            raise Shared(f"Objects referenced by {cls} can't be enumerated")
+        else:
+            if (state := getattr(x, "__dict__", None)) is not None:
+                stack.append(state)
+            if plan is SLOTS:
+                stack += get_slots(x).values()
+
+
+class RefreshableFactory(Generic[T]):
+    """
+    Deep copy factory that recompiles only changed parts of the object on refresh
+
+    Objects that are shared between subtrees are not split, and compiled as a whole.
+
+    >>> config = {"db": {"host": "localhost"}, "debug": False}
+    >>> factory = RefreshableFactory(config)
+    >>> config["debug"] = True
+    >>> factory.refresh(config)  # "debug" item and the top level dict
+    2
+    >>> factory()
+    {'db': {'host': 'localhost'}, 'debug': True}
+    """
+
+    def __init__(
+        self,
+        obj: T,
+        factory: Callable[[Any], Callable[[], Any]] = ast_factory,
+        depth: int = 2,
+    ) -> None:
+        self.factory = factory
+        self.depth = depth
+        self.compiled = 0
+        self.root = self.build(obj)
+
+    def __call__(self) -> T:
+        return cast(T, self.root.factory())
+
+    def refresh(self, obj: T) -> int:
+        """
+        Updates factory to produce copies of obj, returns the number of recompiled functions
+        """
+        compiled = self.compiled
+        self.root = self.build(obj, self.root)
+        return self.compiled - compiled
+
+    def build(self, obj: Any, previous: Node | None = None) -> Node:
+        try:
+            collect_split(obj, self.depth, {})
+        except Shared:
+            return self.visit(obj, previous, 0)
+        return self.visit(obj, previous, self.depth)
+
+    def visit(self, x: Any, previous: Node | None, depth: int) -> Node:
+        cls = type(x)
+        if not depth or cls not in SPLIT_TYPES or not x:
+            if type(previous) is Unit and same(x, previous.snapshot):
+                return previous
+            self.compiled += 1
+            return Unit(self.factory(x))
+
+        keys = list(x) if cls is dict else list(range(len(x)))
+        old: dict[Any, Node] = {}
+        if type(previous) is Branch and previous.cls is cls:
+            old = dict(zip(previous.keys, previous.children))
+        children = [self.visit(x[key], old.get(key), depth - 1) for key in keys]
+        if (
+            type(previous) is Branch
+            and previous.cls is cls
+            and len(previous.keys) == len(keys)
+            and all(map(same, keys, previous.keys))
+            and all(child is node for child, node in zip(children, previous.children))
+        ):
+            return previous
+        self.compiled += 1
+        return Branch(cls, keys, children)
+
+
+def collect_split(x: Any, depth: int, owners: dict[int, int]) -> None:
+    """
+    Raises Shared if any object is reachable from more than one of the subtrees
+    """
+    stack = [(x, depth)]
+    while stack:
+        x, depth = stack.pop()
+        if not depth or type(x) not in SPLIT_TYPES:
+            collect(x, id(x), owners)
+            continue
+        if id(x) in owners:
+            raise Shared(f"{type(x)} is referenced more than once")
+        owners[id(x)] = id(x)
+        stack += [(value, depth - 1) for value in (x.values() if type(x) is dict else x)]
@@ -0,0 +1,232 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Copy-on-access copies of dicts and lists
+
+Copy of a dict or a list is created with its immutable items in place,
+and with placeholders instead of nested objects. Nested object is built by its compiled
+factory only when it's accessed for the first time, so copying a large template,
+and reading a few items from it costs as much as copying these items alone.
+
+Lazy containers are dict and list subclasses, any method that exposes items builds them first.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from collections.abc import Iterator
+from typing import Any
+from typing import Final
+from typing import SupportsIndex
+from typing import cast
+
+from duper.constants import IMMUTABLE_NON_COLLECTIONS
+
+
+# methods that read all items at once, these build all pending items first
+DICT_READERS: Final = (
+    "__eq__",
+    "__ne__",
+    "__repr__",
+    "__or__",
+    "__ror__",
+    "__reduce_ex__",
+    "copy",
+)
+LIST_READERS: Final = (
+    "__contains__",
+    "__eq__",
+    "__ne__",
+    "__lt__",
+    "__le__",
+    "__gt__",
+    "__ge__",
+    "__repr__",
+    "__add__",
+    "__mul__",
+    "__rmul__",
+    "__imul__",
+    "__reduce_ex__",
+    "copy",
+    "count",
+    "index",
+    "remove",
+    "sort",
+)
+
+
+class Unbuilt:
+    """
+    Placeholder for an item that will be built on first access
+    """
+
+    __slots__ = ("produce",)
+
+    def __init__(self, produce: Callable[[], Any]) -> None:
+        self.produce = produce
+
+    def __repr__(self) -> str:
+        return f"<unbuilt {self.produce!r}>"
+
+
+def build_all(container: dict[Any, Any] | list[Any]) -> None:
+    if type(container) is LazyDict:
+        for key, value in dict.items(container):
+            if type(value) is Unbuilt:
+                dict.__setitem__(container, key, value.produce())
+    else:
+        for index, value in enumerate(list.__iter__(cast(list[Any], container))):
+            if type(value) is Unbuilt:
+                list.__setitem__(cast(list[Any], container), index, value.produce())
+
+
+def reading_all(name: str, base: type[Any]) -> Callable[..., Any]:
+    method = getattr(base, name)
+
+    def read_all(self: Any, *args: Any) -> Any:
+        build_all(self)
+        for arg in args:  # comparing to another lazy container reads its items too
+            if type(arg) is LazyDict or type(arg) is LazyList:
+                build_all(arg)
+        return method(self, *args)
+
+    read_all.__name__ = read_all.__qualname__ = name
+    return read_all
+
+
+class LazyDict(dict[Any, Any]):
+    """
+    Dict which nested values are built on first access
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: Any) -> Any:
+        if type(value := dict.__getitem__(self, key)) is Unbuilt:
+            value = value.produce()
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if type(value := dict.pop(self, key, *default)) is Unbuilt:
+            value = value.produce()
+        return value
+
+    def popitem(self) -> tuple[Any, Any]:
+        key, value = dict.popitem(self)
+        if type(value) is Unbuilt:
+            value = value.produce()
+        return key, value
+
+    # overridden __iter__ makes dict(lazy), {**lazy} and .update(lazy) go through __getitem__
+    def __iter__(self) -> Iterator[Any]:
+        return dict.__iter__(self)
+
+    def values(self) -> Any:
+        build_all(self)
+        return dict.values(self)
+
+    def items(self) -> Any:
+        build_all(self)
+        return dict.items(self)
+
+
+class LazyList(list[Any]):
+    """
+    List which nested items are built on first access
+
+    C extensions that read list storage directly won't build items,
+    lazy[:] can be used to get a plain list with all items built.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, index: Any) -> Any:
+        if type(index) is slice:
+            build_all(self)
+            return list.__getitem__(self, index)
+        if type(value := list.__getitem__(self, index)) is Unbuilt:
+            value = value.produce()
+            list.__setitem__(self, index, value)
+        return value
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __reversed__(self) -> Iterator[Any]:
+        for index in range(len(self) - 1, -1, -1):
+            yield self[index]
+
+    def __radd__(self, other: Any) -> Any:
+        if not isinstance(other, list):
+            return NotImplemented
+        build_all(self)
+        return list.__add__(other, self)
+
+    def pop(self, index: SupportsIndex = -1) -> Any:
+        if type(value := list.pop(self, index)) is Unbuilt:
+            value = value.produce()
+        return value
+
+
+for name in DICT_READERS:
+    setattr(LazyDict, name, reading_all(name, dict))
+for name in LIST_READERS:
+    setattr(LazyList, name, reading_all(name, list))
+
+
+class LazyTemplate:
+    """
+    Produces lazy copies of a dict or a list
+
+    Immutable items are copied as is, and the rest are replaced with placeholders,
+    that build them with compiled factories.
+    Nested dicts and lists get templates of their own, which are created from an explicit stack,
+    so deeply nested objects don't exhaust it.
+    """
+
+    cls: type[LazyDict | LazyList]
+    items: dict[Any, Any] | list[Any]
+
+    def __init__(
+        self, obj: dict[Any, Any] | list[Any], compile: Callable[[Any], Callable[[], Any]]
+    ) -> None:
+        pending: list[tuple[LazyTemplate, dict[Any, Any] | list[Any]]] = [(self, obj)]
+        while pending:
+            template, container = pending.pop()
+            if type(container) is dict:
+                template.cls = LazyDict
+                template.items = {
+                    key: template.item(value, compile, pending) for key, value in container.items()
+                }
+            else:
+                template.cls = LazyList
+                template.items = [template.item(value, compile, pending) for value in container]
+
+    @staticmethod
+    def item(
+        value: Any,
+        compile: Callable[[Any], Callable[[], Any]],
+        pending: list[tuple[LazyTemplate, dict[Any, Any] | list[Any]]],
+    ) -> Any:
+        if type(value) in IMMUTABLE_NON_COLLECTIONS or isinstance(value, type):
+            return value
+        if type(value) is dict or type(value) is list:
+            template = LazyTemplate.__new__(LazyTemplate)
+            pending.append((template, value))  # filled by __init__ of the outermost template
+            return Unbuilt(template)
+        return Unbuilt(compile(value))
+
+    def __call__(self) -> LazyDict | LazyList:
+        return self.cls(self.items)
@@ -0,0 +1,54 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+numpy.ndarray support, enabled only when numpy can be imported
+
+Arrays that don't hold Python objects are copied from a private template with a single
+ndarray.copy() call, and arrays that can't be changed by anyone are shared between copies.
+Batches take their copies from one block that is allocated for the whole batch.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+
+try:
+    import numpy as numpy  # type: ignore[import-not-found, unused-ignore]  # re-exported
+except ImportError:  # arrays are reconstructed like any other object
+    numpy = None  # type: ignore[assignment, unused-ignore]
+
+
+def shareable(x: Any) -> bool:
+    """
+    Whether array and every array it views are read-only, and don't view a mutable buffer
+    """
+    while isinstance(x, numpy.ndarray):
+        if x.flags.writeable:
+            return False
+        x = x.base
+    return x is None or type(x) is bytes
+
+
+def template(x: Any) -> Any:
+    """
+    Snapshot of array that copies are made from, keeps its memory layout
+    """
+    return x.copy("K")
+
+
+def batchable(x: Any) -> bool:
+    """
+    Whether copies of array can be slices of a block, see allocate()
+    """
+    return bool(x.ndim) and x.flags.c_contiguous
+
+
+def allocate(template: Any, n: int) -> Any:
+    """
+    Block of n copies of template, where block[i] is i-th copy
+    """
+    block = numpy.empty((n, *template.shape), template.dtype)
+    block[...] = template
+    return block
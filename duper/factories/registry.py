@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Emitters that tell how instances of registered classes are reconstructed, see register()
+
+Emitter is called with an instance once, when a factory is built, and returns either:
+- SHARE, then instance is shared by reference between all copies
+- (constructor, args) or (constructor, args, kwargs), then each copy is made by
+  constructor(*args, **kwargs), with deep copies of args and kwargs
+
+Emitters are used by all factories instead of __deepcopy__, copyreg and reduce.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+from typing import Final
+from typing import TypeVar
+from typing import Union
+
+from duper.constants import IMMUTABLE_TYPES
+
+
+T = TypeVar("T")
+
+
+class Share:
+    """
+    Type of SHARE, which emitters return for instances that are shared by reference
+    """
+
+    def __repr__(self) -> str:
+        return "duper.SHARE"
+
+
+SHARE: Final = Share()
+
+Emission = Union[
+    Share,
+    tuple[Callable[..., Any], tuple[Any, ...]],
+    tuple[Callable[..., Any], tuple[Any, ...], dict[str, Any]],
+]
+Emitter = Callable[[Any], Emission]
+
+emitters: dict[type[Any], Emitter] = {}
+
+
+def share(x: Any) -> Emission:
+    """
+    Emitter for instances that are shared by reference between all copies
+    """
+    return SHARE
+
+
+def register(cls: type[T], emitter: Callable[[T], Emission]) -> None:
+    """
+    Tells duper how to reconstruct instances of cls, same as copyreg.pickle() does for pickle
+
+    >>> duper.register(Point, lambda p: (Point, (p.x, p.y)))
+    >>> duper.register(Connection, duper.share)
+
+    Subclasses are not affected, each class must be registered on its own.
+    Should be called before factories for its instances are built.
+    Classes that factories reconstruct on their own, e.g. bytearray, can't be registered.
+    """
+    # deferred, since factories import emitters from here
+    from duper.factories.ast import optimized_constructors
+    from duper.factories.bytecode import optimized_emitters
+    from duper.factories.runtime import plans
+
+    # builtin collections are among optimized constructors too
+    if cls in IMMUTABLE_TYPES or cls in optimized_constructors or cls in optimized_emitters:
+        raise TypeError(f"{cls} is reconstructed by duper itself and can't be registered")
+    if not callable(emitter):
+        raise TypeError(f"Emitter must be callable, got {emitter!r}")
+
+    emitters[cls] = emitter
+    plans.pop(cls, None)
+
+
+def get_emission(
+    x: Any, emitter: Emitter
+) -> tuple[Callable[..., Any], tuple[Any, ...], dict[str, Any]] | None:
+    """
+    Constructor with its args and kwargs returned by emitter, or None if x is shared
+    """
+    emission = emitter(x)
+    if emission is SHARE:
+        return None
+    if type(emission) is tuple and len(emission) in (2, 3) and callable(emission[0]):
+        func, args, *kwargs = emission
+        return func, tuple(args), dict(kwargs[0]) if kwargs else {}
+    raise TypeError(
+        f"Emitter for {type(x)} must return duper.SHARE or (constructor, args[, kwargs]),"
+        f" got {emission!r}"
+    )
@@ -6,21 +6,56 @@
 from __future__ import annotations
 
 import copyreg
+import gc
+from collections import OrderedDict
 from collections.abc import Callable
 from collections.abc import Iterable
 from collections.abc import MutableMapping
 from collections.abc import MutableSequence
 from copy import Error
+from copy import deepcopy
 from copyreg import __newobj__  # type: ignore[attr-defined]
 from copyreg import __newobj_ex__  # type: ignore[attr-defined]
+from keyword import iskeyword
+from operator import is_
+from types import MemberDescriptorType
 from typing import Any
+from typing import Final
 from typing import TypeVar
 from typing import Union
 from typing import cast
+from weakref import WeakKeyDictionary
+
+from duper.factories.registry import emitters
 
 
 T = TypeVar("T")
 
+# how instances of a class are deconstructed, see get_plan()
+PLAIN: Final = "plain"  # from their __dict__ alone, without calling reduce
+SLOTS: Final = "slots"  # from their __slots__ and __dict__ (if any), without calling reduce
+REDUCE: Final = "reduce"  # anything else
+# methods that must not be overridden for instance to be deconstructed from its __dict__
+DEFAULTS: Final = ("__reduce_ex__", "__reduce__", "__getstate__", "__getattribute__")
+# and ones that must not be defined at all
+ABSENT: Final = (
+    "__getnewargs_ex__",
+    "__getnewargs__",
+    "__deepcopy__",
+    "__getattr__",
+    "__setstate__",
+)
+
+plans: WeakKeyDictionary[type[Any], str] = WeakKeyDictionary()
+
+HEAPTYPE: Final = 1 << 9  # Py_TPFLAGS_HEAPTYPE, set for classes defined in Python
+
+# update() methods that are the same as setting items one by one with given __setitem__
+UPDATES: Final[dict[Any, Any]] = {
+    dict.update: dict.__setitem__,
+    OrderedDict.update: OrderedDict.__setitem__,
+}
+
 
 def returns(x: T) -> T:
     return x
@@ -62,6 +97,17 @@ def reconstruct_state(
     return new_obj
 
 
+def fill(shell: T, items: T) -> T:
+    """
+    Fills empty list, dict or set that was created in advance to be referenced by its own items
+    """
+    if type(shell) is list:
+        cast(list[Any], shell).extend(cast(list[Any], items))
+    else:
+        cast(Union[dict[Any, Any], set[Any]], shell).update(cast(Any, items))
+    return shell
+
+
 def reconstruct_copy(
     func: Callable[..., T],
     args: Any,
@@ -77,6 +123,94 @@ def reconstruct_copy(
     return new_obj
 
 
+def inline_tail(cls: type[Any], state: Any, listiter: bool, dictiter: bool) -> bool:
+    """
+    Whether the same as reconstruct_state() can be done with direct method calls:
+    obj.__setstate__(state) or obj.__dict__.update(state), obj.extend(...), obj.update(...)
+    """
+    if state is not None and type(state) is not dict and getattr(cls, "__setstate__", None) is None:
+        return False  # state with slots
+    if listiter and not (
+        getattr(cls, "append", None) is list.append and getattr(cls, "extend", None) is list.extend
+    ):
+        return False
+    if dictiter:
+        update = getattr(cls, "update", None)
+        if update is not MutableMapping.update and (
+            update not in UPDATES or UPDATES[update] is not getattr(cls, "__setitem__", None)
+        ):
+            return False
+    return True
+
+
+def memoize(
+    x: T,
+    ids: tuple[int, ...],
+    originals: tuple[Any, ...],
+    check: bool,
+    memo: dict[int, Any],
+    result: T,
+    copies: tuple[Any, ...],
+) -> T:
+    """
+    Records copies in memo, the same way deepcopy records each object it copies
+
+    When objects with __deepcopy__ were given the memo (check is True), they could copy
+    some of the originals on their own, then copies are not shared, and x is copied with deepcopy
+    """
+    if check and not all(map(is_, map(memo.get, ids, copies), copies)):
+        return deepcopy(x, memo)
+    memo.update(zip(ids, copies))
+    # same as copy._keep_alive(), ids in memo must not be reused by other objects
+    memo.setdefault(id(memo), []).extend(originals)
+    return result
+
+
+def copy_with_memo(
+    produce: Callable[[dict[int, Any]], T],
+    x: T,
+    ids: tuple[int, ...],
+    memo: dict[int, Any] | None = None,
+) -> T:
+    """
+    Copies x with compiled function, unless memo already has copies of any of its objects
+    """
+    if memo is None:
+        return produce({})
+    if memo.keys().isdisjoint(ids):
+        return produce(memo)
+    return deepcopy(x, memo)
+
+
+def produce_batch(constructor: Callable[[], T], n: int) -> list[T]:
+    return [constructor() for _ in range(n)]
+
+
+def without_gc(produce: Callable[[int], list[T]], n: int) -> list[T]:
+    """
+    Produces a batch with cyclic GC paused, so it won't be triggered by allocations of the batch
+    """
+    if not gc.isenabled():
+        return produce(n)
+    gc.disable()
+    try:
+        return produce(n)
+    finally:
+        gc.enable()
+
+
+def protocol(x: Any) -> int:
+    """
+    Pickle protocol x is reduced with: 4, same as in copy.deepcopy,
+    or 5 if x exposes a buffer, so it can be reduced to a PickleBuffer instead of bytes
+    """
+    try:
+        memoryview(x).release()
+    except TypeError:
+        return 4
+    return 5
+
+
 def get_reduce(
     x: Any, cls: type[Any]
 ) -> (
@@ -90,13 +224,58 @@ def get_reduce(
     if custom_reduce := copyreg.dispatch_table.get(cls):
         return custom_reduce(x)
     elif (__reduce_ex__ := getattr(x, "__reduce_ex__", None)) is not None:
-        return cast("tuple[Any, ...] | str", __reduce_ex__(4))
+        return cast("tuple[Any, ...] | str", __reduce_ex__(protocol(x)))
     elif __reduce__ := getattr(x, "__reduce__", None):
         return cast("tuple[Any, ...] | str", __reduce__())
     else:
         raise Error(f"un(deep)copyable object of type {cls}")
 
 
+def get_plan(cls: type[Any]) -> str:
+    """
+    Finds out once per class whether its instances can be deconstructed without calling reduce
+
+    Classes are expected not to change these methods after their first instance was copied
+    """
+    try:
+        return plans[cls]
+    except KeyError:
+        pass
+    if not (
+        all(getattr(cls, name, None) is getattr(object, name, None) for name in DEFAULTS)
+        and all(getattr(cls, name, None) is None for name in ABSENT)
+        # builtin bases may keep state that is not visible in __dict__ and __slots__
+        and all(base.__flags__ & HEAPTYPE for base in cls.__mro__[:-1])
+        and not issubclass(cls, (list, dict))
+        and cls not in emitters
+    ):
+        plan = REDUCE
+    elif not (slots := copyreg._slotnames(cls)):  # type: ignore[attr-defined]
+        plan = PLAIN if cls.__dictoffset__ else SLOTS
+    elif getattr(cls, "__setattr__") is object.__setattr__ and all(
+        type(getattr(cls, name, None)) is MemberDescriptorType and not iskeyword(name)
+        for name in slots
+    ):
+        plan = SLOTS
+    else:
+        plan = REDUCE
+    plans[cls] = plan
+    return plan
+
+
+def get_slots(x: Any) -> dict[str, Any]:
+    """
+    Values of slots that are set, same as in object.__getstate__()
+    """
+    slots = {}
+    for name in copyreg._slotnames(type(x)):  # type: ignore[attr-defined]
+        try:
+            slots[name] = getattr(x, name)
+        except AttributeError:
+            pass
+    return slots
+
+
 def debunk_reduce(
     func: Callable[..., Any],
     args: tuple[Any, ...],
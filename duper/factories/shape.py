@@ -0,0 +1,274 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Reuse compiled factories between objects of the same shape
+
+Objects that have the same types, dict keys, nesting and shared references,
+and differ only in scalar values (leaves), reconstruct with the same instructions.
+Only constants differ, so factory is compiled once per shape from a template object
+with placeholders instead of leaves, and placeholders are swapped in co_consts after.
+"""
+from __future__ import annotations
+
+import copyreg
+import os
+from collections.abc import Callable
+from threading import Lock
+from types import FunctionType
+from typing import Any
+from typing import Final
+from typing import TypeVar
+from typing import cast
+
+from duper.constants import IMMUTABLE_NON_COLLECTIONS
+from duper.factories.ast import ast_factory
+from duper.factories.emission import literals
+from duper.factories.runtime import PLAIN
+from duper.factories.runtime import get_plan
+
+
+T = TypeVar("T")
+
+# values of these types become leaves, the rest of the object is a shape
+LEAF_TYPES: Final = frozenset({int, float, complex, str, bytes})
+
+# tokens that start each node in a shape (aside from leaves, which start with their type)
+CONST: Final = "const"
+REF: Final = "ref"
+LIST: Final = "list"
+TUPLE: Final = "tuple"
+DICT: Final = "dict"
+SET: Final = "set"
+FROZENSET: Final = "frozenset"
+INSTANCE: Final = "instance"
+
+NONCE: Final = os.urandom(8).hex()
+IN_PROGRESS: Final = object()
+MISSING: Final = object()
+
+_placeholders: list[str] = []
+_placeholder_indexes: dict[str, int] = {}
+
+
+def placeholder(index: int) -> str:
+    """
+    Unique str constant that takes place of a leaf in template object
+    """
+    while len(_placeholders) <= index:
+        _placeholders.append(name := f"\0duper leaf {len(_placeholders)} {NONCE}")
+        _placeholder_indexes[name] = len(_placeholder_indexes)
+    return _placeholders[index]
+
+
+def key_token(key: Any) -> Any:
+    """
+    Token of a dict key, keys that are equal but differ in sign of zero get different tokens
+    """
+    if type(key) is float:
+        return key.hex()
+    if type(key) is complex:
+        return key.real.hex(), key.imag.hex()
+    return key
+
+
+class Unsupported(Exception):
+    """Shape of the object doesn't determine instructions to reconstruct it"""
+
+
+class Shape:
+    def __init__(self, build: bool) -> None:
+        self.tokens: list[Any] = []
+        self.leaves: list[Any] = []
+        self.seen: dict[int, int] = {}
+        # template object parts with placeholders instead of leaves, only when building
+        self.build = build
+        self.replicas: list[Any] = []
+
+    def visit(self, x: Any) -> Any:
+        """
+        Appends shape of x to tokens and returns its template if building
+        """
+        cls = type(x)
+        tokens = self.tokens
+        if cls in LEAF_TYPES:
+            tokens.append(cls)
+            self.leaves.append(x)
+            return self.build and placeholder(len(self.leaves) - 1)
+        if cls in IMMUTABLE_NON_COLLECTIONS or isinstance(x, type):
+            tokens += (CONST, x)
+            return x
+
+        if (index := self.seen.get(id(x))) is not None:
+            if self.build and self.replicas[index] is IN_PROGRESS:
+                raise Unsupported(f"Self-reflexive {cls} in immutable container")
+            tokens += (REF, index)
+            return self.build and self.replicas[index]
+        self.seen[id(x)] = index = len(self.seen)
+        self.replicas.append(IN_PROGRESS)
+
+        if cls is list:
+            tokens += (LIST, len(x))
+            replica: Any = []
+            self.replicas[index] = replica
+            for item in x:
+                item = self.visit(item)
+                if self.build:
+                    replica.append(item)
+            return replica
+        if cls is dict:
+            tokens += (DICT, len(x))
+            replica = {}
+            self.replicas[index] = replica
+            for key, value in x.items():
+                if type(key) not in IMMUTABLE_NON_COLLECTIONS:
+                    raise Unsupported(f"Dict key of {type(key)}")
+                tokens += (type(key), key_token(key))
+                value = self.visit(value)
+                if self.build:
+                    replica[key] = value
+            return replica
+        if cls is tuple:
+            tokens += (TUPLE, len(x))
+            replica = tuple([self.visit(item) for item in x])
+        elif cls is set or cls is frozenset:
+            tokens += (SET if cls is set else FROZENSET, len(x))
+            items = []
+            for item in x:
+                if type(item) not in IMMUTABLE_NON_COLLECTIONS:
+                    raise Unsupported(f"{cls} item of {type(item)}")
+                items.append(self.visit(item))
+            replica = cls(items)
+        else:
+            return self.visit_instance(x, cls, index)
+
+        self.replicas[index] = replica
+        return replica
+
+    def visit_instance(self, x: Any, cls: type[Any], index: int) -> Any:
+        """
+        Instances are reconstructed from their __dict__ alone, if they're not customizing it
+        """
+        if get_plan(cls) is not PLAIN or cls in copyreg.dispatch_table:
+            raise Unsupported(f"{cls} isn't reconstructed from its __dict__")
+
+        self.tokens += (INSTANCE, cls)
+        replica = self.build and cast(Any, cls).__new__(cls)
+        self.replicas[index] = replica
+        if not (state := x.__dict__):
+            self.tokens.append(None)
+        else:
+            state = self.visit(state)
+            if self.build:
+                replica.__dict__.update(state)
+        return replica
+
+
+def substitute(value: Any, leaves: list[Any]) -> Any:
+    """
+    Puts leaves in place of placeholders in a constant
+    """
+    cls = type(value)
+    if cls is str:
+        index = _placeholder_indexes.get(value)
+        return value if index is None else leaves[index]
+    if cls is tuple or cls is frozenset:
+        return cls([substitute(item, leaves) for item in value])
+    return value
+
+
+class Template:
+    """
+    Factory compiled for a shape, along with positions of leaves in its constants
+    """
+
+    def __init__(self, function: FunctionType, leaves_count: int) -> None:
+        self.function = function
+        self.consts = function.__code__.co_consts
+        self.substitutions: list[tuple[int, Any]] = []
+        found: set[int] = set()
+        for index, const in enumerate(self.consts):
+            leaves: set[int] = set()
+            collect_leaves(const, leaves)
+            if leaves:
+                self.substitutions.append((index, const))
+                found |= leaves
+        if len(found) != leaves_count:
+            raise Unsupported("Factory doesn't store all leaves in its constants")
+
+    def produce(self, leaves: list[Any]) -> FunctionType:
+        consts = list(self.consts)
+        for index, const in self.substitutions:
+            consts[index] = substitute(const, leaves)
+        function = self.function
+        return FunctionType(
+            function.__code__.replace(co_consts=tuple(consts)),
+            function.__globals__,
+            function.__name__,
+        )
+
+
+def collect_leaves(value: Any, found: set[int]) -> None:
+    if type(value) is str:
+        if (index := _placeholder_indexes.get(value)) is not None:
+            found.add(index)
+    elif type(value) is tuple or type(value) is frozenset:
+        for item in value:
+            collect_leaves(item, found)
+
+
+class ShapeCache:
+    """
+    Factory that compiles objects of the same shape only once
+
+    >>> factory = ShapeCache()
+    >>> first, second = factory({"a": [1]}), factory({"a": [2]})
+    >>> first(), second(), len(factory.templates)
+    ({'a': [1]}, {'a': [2]}, 1)
+    """
+
+    def __init__(
+        self, factory: Callable[[Any], Callable[[], Any]] = ast_factory, maxsize: int = 1024
+    ) -> None:
+        self.factory = factory
+        self.maxsize = maxsize
+        self.templates: dict[tuple[Any, ...], Template | None] = {}
+        self.lock = Lock()
+
+    def __call__(self, x: T) -> Callable[[], T]:
+        shape = Shape(build=False)
+        try:
+            shape.visit(x)
+            key = tuple(shape.tokens)
+            template = self.templates.get(key, MISSING)
+        except (Unsupported, TypeError):  # TypeError is for unhashable constants
+            return self.factory(x)
+
+        if template is MISSING:
+            template = self.compile(x, key, len(shape.leaves))
+        if template is None:  # shape turned out to be unsupported
+            return self.factory(x)
+        return cast(Callable[[], T], cast(Template, template).produce(shape.leaves))
+
+    def compile(self, x: Any, key: tuple[Any, ...], leaves_count: int) -> Template | None:
+        shape = Shape(build=True)
+        # leaves must stay in constants of the factory, not in templates it copies
+        previous = literals(True)
+        try:
+            function = self.factory(shape.visit(x))
+            if not isinstance(function, FunctionType):
+                raise Unsupported(f"{function} is not a compiled function")
+            template = Template(function, leaves_count)
+        except Unsupported:
+            template = None
+        finally:
+            literals(previous)
+        with self.lock:
+            if len(self.templates) >= self.maxsize:
+                del self.templates[next(iter(self.templates))]
+            self.templates[key] = template
+        return template
+
+
+shape_factory: Final = ShapeCache()
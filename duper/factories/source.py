@@ -0,0 +1,161 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Ahead-of-time factories, written as Python modules
+
+Generated module defines the same function ast_factory() would compile, and imports every object
+the function needs from its namespace, so it can be reviewed, imported and cached as .pyc.
+"""
+from __future__ import annotations
+
+import ast
+import builtins
+from copy import Error
+from typing import Any
+
+from duper.factories.ast import Namespace
+from duper.factories.ast import reconstruct
+from duper.factories.ast import setters
+from duper.factories.ast import slots_setter
+from duper.factories.cache import describe
+from duper.fastast import FunctionDef
+from duper.fastast import Name
+from duper.fastast import Return
+
+
+def rename(node: Any, names: dict[str, str]) -> None:
+    """
+    Replaces ids of Name nodes in generated AST
+    """
+    if type(node) is list:
+        for item in node:
+            rename(item, names)
+    elif hasattr(node, "__dict__"):
+        if type(node) is Name and node.id in names:
+            node.id = names[node.id]
+        for value in vars(node).values():
+            rename(value, names)
+
+
+def find_setter(value: Any) -> tuple[type[Any], tuple[str, ...], bool] | None:
+    """
+    Arguments slots_setter() was called with to compile value
+    """
+    for cls, compiled in setters.items():
+        for (slots, with_dict), setter in compiled.items():
+            if setter is value:
+                return cls, slots, with_dict
+    return None
+
+
+def literal(value: Any) -> ast.expr:
+    """
+    Literal of a constant, or of a template that holds only constants, see emission
+    """
+    if type(value) is dict:
+        return ast.Dict([literal(key) for key in value], [literal(v) for v in value.values()])
+    if type(value) is list:
+        return ast.List([literal(item) for item in value], ast.Load())
+    if type(value) is set:
+        return ast.Set([literal(item) for item in value])
+    return ast.Constant(value)
+
+
+class Module:
+    """
+    Top level of generated module: imports, and assignments of objects from namespace
+    """
+
+    def __init__(self, namespace: Namespace) -> None:
+        self.names = namespace.names
+        self.templates = namespace.templates
+        # aliases are reserved the same way names of locals are, see Namespace.local_name()
+        self.local_name = namespace.local_name
+        self.imports: set[str] = set()
+        self.assignments: list[str] = []
+        self.bound: dict[int, str] = {}
+        # (module, name) -> alias it's imported as, for attributes of imported objects
+        self.aliases: dict[tuple[str, str], str] = {}
+
+    def bind(self, target: str, value: Any) -> None:
+        if (source := self.reference(value, target)) != target:
+            self.assignments.append(f"{target} = {source}")
+        self.bound[id(value)] = target
+
+    def reference(self, value: Any, target: str | None = None) -> str:
+        """
+        Expression that evaluates to value at the top level of generated module
+        """
+        if (name := self.bound.get(id(value))) is not None:
+            return name
+        if id(value) in self.templates:
+            return ast.unparse(literal(value))
+        if (setter := find_setter(value)) is not None:
+            cls, slots, with_dict = setter
+            function = self.reference(slots_setter)
+            return f"{function}({self.reference(cls)}, {slots!r}, {with_dict!r})"
+        if (entry := describe(value)) is None and type(value) is tuple:
+            # immutable tuple of objects that can't be literals, like types
+            items = [self.reference(item) for item in value]
+            return f"({', '.join(items)}{',' if len(items) == 1 else ''})"
+        if entry is None:
+            raise Error(f"{value!r} can't be imported by generated module")
+        if len(entry) == 1:
+            return ast.unparse(ast.Constant(entry[0]))
+        module, qualname = entry
+        if not qualname:
+            alias = target or self.local_name(module.replace(".", "_"))
+            self.imports.add(f"import {module}" + (f" as {alias}" if alias != module else ""))
+            return alias
+        top, dot, attributes = qualname.partition(".")
+        if (
+            module == "builtins"
+            and self.names.get(top, builtin := getattr(builtins, top)) is builtin
+        ):
+            return qualname
+        if target is not None and not dot:
+            alias = target
+        elif (imported := self.aliases.get((module, top))) is not None:
+            alias = imported
+        else:
+            alias = self.aliases[module, top] = self.local_name(top)
+        self.imports.add(f"from {module} import {top}" + (f" as {alias}" if alias != top else ""))
+        return f"{alias}.{attributes}" if dot else alias
+
+
+def generate_module(x: Any, name: str = "produce", origin: str | None = None) -> str:
+    """
+    Source of a module with function `name` that produces copies of x
+    """
+    return_value_ast, namespace = reconstruct(x)
+    body = namespace.statements(return_value_ast, Return)
+
+    # names of stored objects are their qualified names, these can't be used in source as is,
+    # and names of instances, like `tuple`, must not shadow builtins that literals rely on
+    renamed = {
+        stored: namespace.local_name(stored.replace(".", "_"))
+        for stored, value in namespace.names.items()
+        if not stored.isidentifier() or getattr(builtins, stored, value) is not value
+    }
+    rename(body, renamed)
+    module = Module(namespace)
+    # objects that are imported as is go first, so others can be built from them
+    for stored, value in sorted(
+        namespace.names.items(), key=lambda item: len(describe(item[1]) or ()) != 2
+    ):
+        module.bind(renamed.get(stored, stored), value)
+
+    if name in namespace.used_names:
+        raise Error(f"Function name {name!r} is already used in generated module")
+    function = FunctionDef(name=name, body=body)
+    function.returns = None  # type: ignore[assignment]
+    header = f"Generated by duper from {origin}" if origin else "Generated by duper"
+    parts = [
+        f'"""\n{header}, do not edit\n"""',
+        "\n".join(sorted(module.imports)),
+        "\n".join(module.assignments),
+        ast.unparse(function),  # type: ignore[arg-type]
+    ]
+    return "\n\n\n".join(part for part in parts if part) + "\n"
@@ -73,6 +73,13 @@ class Store(expr):
     __class__: type[ast.Store] = ast.Store  # type: ignore[assignment]
 
 
+class Or(AST):
+    __class__: type[ast.Or] = ast.Or
+
+
+OR: Final = Or()
+
+
 class Return(stmt, Generic[E]):
     __class__: type[ast.Return] = ast.Return
 
@@ -85,13 +92,17 @@ class arguments(expr):
     """Not used in any way other tnen as required arg ot FunctionDef"""
 
     posonlyargs: Final[list[arg]] = []
-    args: Final[list[arg]] = []
+    args: list[arg] = []
     vararg: Final = None  # real type is arg | None
     kwonlyargs: Final[list[arg]] = []
     kw_defaults: Final[list[arg]] = []
     kwarg: Final = None  # real type is arg | None
     defaults: Final[list[arg]] = []
 
+    def __init__(self, args: list[arg] | None = None) -> None:
+        if args is not None:
+            self.args = args
+
 
 class keyword(stmt, Generic[E]):
     __class__: type[ast.keyword] = ast.keyword  # type: ignore[assignment]
@@ -117,6 +128,32 @@ class Constant(expr, Generic[T]):
         self.value = value
 
 
+class Attribute(expr, Generic[E]):
+    __class__: type[ast.Attribute] = ast.Attribute
+
+    def __init__(self, value: E, attr: str, ctx: Load | Store = LOAD) -> None:
+        self.value = value
+        self.attr = attr
+        self.ctx = ctx
+
+
+class Subscript(expr, Generic[E]):
+    __class__: type[ast.Subscript] = ast.Subscript
+
+    def __init__(self, value: E, slice: expr, ctx: Load | Store = LOAD) -> None:
+        self.value = value
+        self.slice = slice
+        self.ctx = ctx
+
+
+class BoolOp(expr):
+    __class__: type[ast.BoolOp] = ast.BoolOp
+
+    def __init__(self, op: Or, values: list[expr]) -> None:
+        self.op = op
+        self.values = values
+
+
 class NamedExpr(expr, Generic[E]):
     __class__: type[ast.NamedExpr] = ast.NamedExpr
 
@@ -166,18 +203,48 @@ class Call(expr):
     __class__: type[ast.Call] = ast.Call
 
     def __init__(
-        self, func: Name | Constant[Any], args: list[expr], keywords: list[keyword[Any]]
+        self,
+        func: Name | Constant[Any] | Attribute[Any],
+        args: list[expr],
+        keywords: list[keyword[Any]],
     ) -> None:
         self.func = func
         self.args: list[expr] = args
         self.keywords = keywords
 
 
+class Expr(stmt, Generic[E]):
+    __class__: type[ast.Expr] = ast.Expr
+
+    def __init__(self, value: E) -> None:
+        self.value = value
+
+
+class Assign(stmt, Generic[E]):
+    __class__: type[ast.Assign] = ast.Assign
+    type_comment: Final = None
+
+    def __init__(self, targets: list[Name | Subscript[Any] | Attribute[Any]], value: E) -> None:
+        self.targets = targets
+        self.value = value
+
+
+class For(stmt):
+    __class__: type[ast.For] = ast.For
+    orelse: Final[list[stmt]] = []
+    type_comment: Final = None
+
+    def __init__(self, target: Name, iter: expr, body: list[stmt]) -> None:
+        self.target = target
+        self.iter = iter
+        self.body = body
+
+
 class FunctionDef(stmt):
     __class__: type[ast.FunctionDef] = ast.FunctionDef
     """Just a blank value"""
 
-    args: Final = arguments()
+    args: arguments = arguments()
     decorator_list: Final[list[expr]] = []
     returns: Constant[str] = Constant("Any")
     type_comment: Final = None
@@ -0,0 +1,259 @@
+# SPDX-FileCopyrightText: 2023 Bobronium <appkiller16@gmail.com>
+#
+# SPDX-License-Identifier: MPL-2.0
+
+"""
+Opt-in counters and timings of factories
+
+Disabled by default, enable() or DUPER_STATS=1 environment variable turns them on.
+While enabled, time of each build phase is recorded per type of copied object,
+along with fallbacks, and factories count copies they produce.
+Fallbacks are counted once for a build that failed, or once for each part of an object
+that was copied by fallback while the rest of it was compiled.
+Factories built before metrics were enabled are not counted.
+
+Read with duper.stats(), or duper.stats("prometheus") for Prometheus text format.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import weakref
+from collections.abc import Callable
+from time import perf_counter
+from types import TracebackType
+from typing import Any
+from typing import Final
+
+
+enabled: bool = os.environ.get("DUPER_STATS", "") not in ("", "0")
+
+PHASES: Final = ("analysis", "ast", "compile", "exec", "assemble", "check")
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def type_name(cls: type[Any] | Callable[..., Any]) -> str:
+    if cls.__module__ == "builtins":
+        return cls.__qualname__
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class TypeStats:
+    __slots__ = ("builds", "seconds", "fallbacks", "copies", "fallback_copies")
+
+    def __init__(self) -> None:
+        self.builds = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.fallbacks = 0
+        # copies of factories that are already garbage collected
+        self.copies = 0
+        self.fallback_copies = 0
+
+
+class Build:
+    """
+    Timings of one factory
+    """
+
+    __slots__ = ("type", "seconds", "fallback", "fallback_parts", "copies")
+
+    def __init__(self, cls: type[Any] | Callable[..., Any]) -> None:
+        self.type = type_name(cls)
+        self.seconds: dict[str, float] = {}
+        self.fallback = False
+        # parts of the object copied by fallback, while the rest of it is compiled
+        self.fallback_parts = 0
+        self.copies = 0
+
+
+types: dict[str, TypeStats] = {}
+# factories that are still alive, see Counted
+factories: weakref.WeakSet[Counted] = weakref.WeakSet()
+local = threading.local()
+
+
+class Phase:
+    __slots__ = ("build", "name", "start")
+
+    def __init__(self, build: Build, name: str) -> None:
+        self.build = build
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(
+        self, cls: type[BaseException] | None, e: BaseException | None, tb: TracebackType | None
+    ) -> None:
+        seconds = self.build.seconds
+        seconds[self.name] = seconds.get(self.name, 0.0) + perf_counter() - self.start
+
+
+class Nothing:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+NOTHING: Final = Nothing()
+
+
+def begin(cls: type[Any] | Callable[..., Any]) -> Build | None:
+    """
+    Starts recording a build in current thread, unless metrics are off or it's already recorded
+
+    Builds are recorded per type of copied object, or per function that builds many of them
+    """
+    if not enabled or getattr(local, "build", None) is not None:
+        return None
+    local.build = build = Build(cls)
+    return build
+
+
+def end(build: Build | None) -> None:
+    if build is None:
+        return
+    local.build = None
+    stats = types.setdefault(build.type, TypeStats())
+    stats.builds += 1
+    stats.fallbacks += 1 if build.fallback else build.fallback_parts
+    for name, seconds in build.seconds.items():
+        stats.seconds[name] += seconds
+
+
+def phase(name: str) -> Phase | Nothing:
+    """
+    Times a phase of the build that is being recorded in current thread
+    """
+    if (build := getattr(local, "build", None)) is None:
+        return NOTHING
+    return Phase(build, name)
+
+
+def fallback_part() -> None:
+    """
+    Records a part of the object that is copied by fallback in the build of current thread
+    """
+    if (build := getattr(local, "build", None)) is not None:
+        build.fallback_parts += 1
+
+
+def retire(build: Build) -> None:
+    stats = types.setdefault(build.type, TypeStats())
+    if build.fallback:
+        stats.fallback_copies += build.copies
+    else:
+        stats.copies += build.copies
+
+
+class Counted:
+    """
+    Factory that counts copies it produced
+    """
+
+    __slots__ = ("produce", "build", "__weakref__")
+
+    def __init__(self, produce: Callable[..., Any], build: Build) -> None:
+        self.produce = produce
+        self.build = build
+        factories.add(self)
+        weakref.finalize(self, retire, build)
+
+    def __call__(self) -> Any:
+        self.build.copies += 1
+        return self.produce()
+
+    def __repr__(self) -> str:
+        return f"<counted {self.produce!r}>"
+
+
+class CountedBatch(Counted):
+    __slots__ = ()
+
+    def __call__(self, n: int) -> Any:  # type: ignore[override]
+        self.build.copies += n
+        return self.produce(n)
+
+
+def counted(produce: Callable[..., Any], build: Build | None, batch: bool = False) -> Any:
+    if build is None:
+        return produce
+    return (CountedBatch if batch else Counted)(produce, build)
+
+
+def reset() -> None:
+    types.clear()
+    for factory in list(factories):
+        factory.build.copies = 0
+
+
+def snapshot() -> dict[str, Any]:
+    totals: dict[str, dict[str, Any]] = {
+        name: {
+            "builds": stats.builds,
+            "fallbacks": stats.fallbacks,
+            "copies": stats.copies,
+            "fallback_copies": stats.fallback_copies,
+            "build_seconds": {
+                phase: seconds for phase, seconds in stats.seconds.items() if seconds
+            },
+        }
+        for name, stats in types.items()
+    }
+    alive = []
+    for factory in list(factories):
+        build = factory.build
+        counters = totals.setdefault(
+            build.type,
+            {"builds": 0, "fallbacks": 0, "copies": 0, "fallback_copies": 0, "build_seconds": {}},
+        )
+        counters["fallback_copies" if build.fallback else "copies"] += build.copies
+        alive.append(
+            {
+                "type": build.type,
+                "fallback": build.fallback,
+                "fallback_parts": build.fallback_parts,
+                "copies": build.copies,
+                "build_seconds": dict(build.seconds),
+            }
+        )
+    return {"enabled": enabled, "types": totals, "factories": alive}
+
+
+def label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS: Final = (
+    ("builds", "duper_builds_total", "Factories built"),
+    ("fallbacks", "duper_fallbacks_total", "Objects and parts of objects copied by a fallback"),
+    ("copies", "duper_copies_total", "Copies produced by compiled factories"),
+    ("fallback_copies", "duper_fallback_copies_total", "Copies produced by fallbacks"),
+)
+
+
+def prometheus() -> str:
+    totals = snapshot()["types"]
+    lines = []
+    for key, metric, description in METRICS:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{type="{label(name)}"}} {t[key]}' for name, t in totals.items()]
+    metric = "duper_build_seconds_total"
+    lines += [f"# HELP {metric} Time spent building factories", f"# TYPE {metric} counter"]
+    for name, t in totals.items():
+        for phase_name, seconds in t["build_seconds"].items():
+            lines.append(f'{metric}{{type="{label(name)}",phase="{phase_name}"}} {seconds!r}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,199 @@
+import copy
+import gc
+
+import pytest
+
+import duper
+from duper import adaptive
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(adaptive, "background", False)
+    monkeypatch.setattr(adaptive, "threshold", 3)
+    monkeypatch.setattr(adaptive, "counted", {})
+    monkeypatch.setattr(adaptive, "hot", {})
+
+
+class Plain:
+    def __init__(self):
+        self.items = [1, 2]
+
+
+class Template:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def test_becomes_hot():
+    template = Template(a=[1, 2], b={"c": []})
+    for _ in range(adaptive.threshold):
+        assert id(template) not in adaptive.hot
+        result = duper.deepcopy(template)
+    assert adaptive.hot[id(template)].factory is not None
+
+    result = duper.deepcopy(template)
+    assert vars(result) == vars(template)
+    assert result.a is not template.a
+    assert result.b["c"] is not template.b["c"]
+
+
+def test_top_level_change_discards_factory():
+    template = Template(a=[1])
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    assert id(template) in adaptive.hot
+
+    template.b = [2]
+    assert vars(duper.deepcopy(template)) == {"a": [1], "b": [2]}
+    assert id(template) not in adaptive.hot
+
+    template.a = [3]
+    assert vars(duper.deepcopy(template)) == {"a": [3], "b": [2]}
+
+
+def test_nested_change_discards_factory():
+    template = Template(limits={"cpu": 1}, tags=[["a"]])
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    assert adaptive.hot[id(template)].factory is not None
+
+    template.limits["cpu"] = 2
+    assert duper.deepcopy(template).limits == {"cpu": 2}
+    assert id(template) not in adaptive.hot
+
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    template.tags[0].append("b")
+    assert duper.deepcopy(template).tags == [["a", "b"]]
+
+
+def test_objects_that_cant_be_referenced_weakly_are_not_counted():
+    template = {"a": [1]}
+    for _ in range(adaptive.threshold + 1):
+        assert duper.deepcopy(template) == template
+    assert not adaptive.counted and not adaptive.hot
+
+
+def test_reused_ids_are_not_counted():
+    for i in range(adaptive.threshold * 4):
+        assert duper.deepcopy(Template(a=[i])).a == [i]
+    assert [hits for ref, hits in adaptive.counted.values()] == [1] * len(adaptive.counted)
+    assert not adaptive.hot
+
+
+def test_hot_objects_are_not_kept_alive():
+    template = Template(a=[1])
+    template.child = Template(parent=template)
+    key = id(template)
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    copied = duper.deepcopy(template)
+    assert copied.child.parent is copied
+
+    del template, copied
+    gc.collect()
+    assert key not in adaptive.hot
+
+
+def test_forget():
+    template = Template(a=[1])
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    template.a.append(2)
+    adaptive.forget(template)
+    assert duper.deepcopy(template).a == [1, 2]
+    assert id(template) not in adaptive.hot
+
+
+def test_weakly_referenced_objects_are_dropped():
+    obj = Plain()
+    key = id(obj)
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(obj)
+    copied = duper.deepcopy(obj)
+    assert copied.items == [1, 2] and copied.items is not obj.items
+
+    del obj
+    assert key not in adaptive.hot
+
+
+def test_memo_is_passed_to_deepcopy():
+    shared = [1]
+    memo = {}
+    first = duper.deepcopy({"a": shared}, memo)
+    second = duper.deepcopy({"b": shared}, memo)
+    assert first["a"] is second["b"]
+    assert not adaptive.counted
+
+
+def test_uncompilable_objects_keep_using_deepcopy():
+    template = Template(a=[1])
+
+    class Broken:
+        def __reduce_ex__(self, protocol):
+            raise TypeError("nope")
+
+        def __deepcopy__(self, memo):
+            return self
+
+    template.b = Broken()
+    for _ in range(adaptive.threshold + 2):
+        result = duper.deepcopy(template)
+    assert result.a == [1] and result.a is not template.a
+
+
+def test_install():
+    template = Template(a=[1])
+    duper.install()
+    try:
+        assert copy.deepcopy is duper.deepcopy
+        for _ in range(adaptive.threshold + 1):
+            assert copy.deepcopy(template).a == [1]
+        assert adaptive.hot[id(template)].factory is not None
+    finally:
+        duper.uninstall()
+    assert copy.deepcopy is adaptive.original
+
+
+def test_background_build(monkeypatch):
+    monkeypatch.setattr(adaptive, "background", True)
+    template = Template(a=[1])
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    adaptive.executor.submit(lambda: None).result()
+    assert adaptive.hot[id(template)].factory is not None
+    assert duper.deepcopy(template).a == [1]
+
+
+def test_values_merged_by_compile_keep_factory():
+    # compile() replaces equal constants in tuples of the object with its own ones
+    template = Template(pairs=[(int("999"), int("1000"))], nested=((int("999"), 1.5),))
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    assert adaptive.hot[id(template)].factory is not None
+    copied = duper.deepcopy(template)
+    assert id(template) in adaptive.hot
+    assert copied.pairs == [(999, 1000)] and copied.pairs is not template.pairs
+
+    template.nested = ((999, -1.5),)
+    assert duper.deepcopy(template).nested == ((999, -1.5),)
+    assert id(template) not in adaptive.hot
+
+
+def test_top_level_check(monkeypatch):
+    monkeypatch.setattr(adaptive, "deep_check", False)
+    template = Template(limits={"cpu": 1})
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    monkeypatch.setattr(adaptive, "deep_check", True)  # applies to objects that become hot later
+
+    template.limits["cpu"] = 2
+    assert duper.deepcopy(template).limits == {"cpu": 1}
+    adaptive.forget(template)
+    assert duper.deepcopy(template).limits == {"cpu": 2}
+
+    for _ in range(adaptive.threshold):
+        duper.deepcopy(template)
+    template.limits = {"cpu": 3}
+    assert duper.deepcopy(template).limits == {"cpu": 3}
@@ -0,0 +1,90 @@
+import gc
+
+import pytest
+
+import duper
+
+
+class C:
+    def __init__(self):
+        self.items = [1, 2]
+        self.me = self
+
+
+@pytest.mark.parametrize(
+    "x",
+    [
+        {"a": [1, 2], "b": {"c": (3, [4])}},
+        [[1], [2]],
+        (1, 2),
+        42,
+        [],
+    ],
+)
+def test_batch(x):
+    produce = duper.deepdups_batch(x)
+    batch = produce(3)
+    assert batch == [x, x, x]
+    if isinstance(x, list):
+        assert batch[0] is not x
+        assert batch[0] is not batch[1]
+    assert produce(0) == []
+
+
+def test_batch_shared_references():
+    x = C()
+    batch = duper.deepdups_batch(x)(2)
+    assert batch[0] is not batch[1]
+    assert batch[0].me is batch[0]
+    assert batch[0].items is not batch[1].items
+
+
+def test_batch_local_names_dont_shadow_namespace():
+    class append:
+        pass
+
+    class batch:
+        pass
+
+    x = [append(), batch(), range]
+    copies = duper.deepdups_batch(x)(2)
+    assert [type(i) for i in copies[1]] == [append, batch, type]
+
+
+class Items(list):
+    pass
+
+
+def test_batch_fallback():
+    x = (Items(), 1)
+    x[0].append(x)
+    with pytest.warns(RuntimeWarning):
+        produce = duper.deepdups_batch(x, fallback=duper.warn)
+    first, second = produce(2)
+    assert first[0][0] is first
+    assert first is not second
+
+
+def test_batch_cycles():
+    x = ([], 1)
+    x[0].append(x)
+    first, second = duper.deepdups_batch(x)(2)
+    assert first[0][0] is first
+    assert second[0][0] is second
+    assert first is not second
+
+
+def test_batch_pause_gc():
+    states = []
+
+    class Probe:
+        def __deepcopy__(self, memo):
+            states.append(gc.isenabled())
+            return Probe()
+
+    produce = duper.deepdups_batch([Probe()], pause_gc=True)
+    states.clear()
+    assert gc.isenabled()
+    assert len(produce(2)) == 2
+    assert states == [False, False]
+    assert gc.isenabled()
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from duper.bench import break_even
+from duper.bench import measure
+from duper.bench.__main__ import main
+from duper.bench.shapes import SHAPES
+
+
+def node_count(x):
+    if isinstance(x, dict):
+        return 1 + sum(node_count(v) for v in x.values())
+    if isinstance(x, list):
+        return 1 + sum(node_count(v) for v in x)
+    if hasattr(x, "tags"):
+        return 1 + node_count(x.name) + node_count(x.value) + node_count(x.tags)
+    return 1
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_shapes_have_requested_size(shape):
+    assert 180 <= node_count(SHAPES[shape](200)) <= 220
+
+
+def test_break_even():
+    assert break_even({"build": 10, "copy": 1}, {"build": 0, "copy": 3}) == 5
+    assert break_even({"build": 0, "copy": 1}, {"build": 1, "copy": 3}) == 1
+    assert break_even({"build": 10, "copy": 3}, {"build": 0, "copy": 3}) is None
+
+
+def test_errors_are_recorded():
+    def prepare(x):
+        raise RecursionError("too deep")
+
+    assert measure(prepare, [], 0.001, 1) == {"error": "RecursionError: too deep"}
+    assert "error" in measure(lambda x: lambda: x, [], 0.001, 1)
+
+
+def test_cli(tmp_path, capsys):
+    path = tmp_path / "results.json"
+    arguments = ["--shapes", "json,deep", "--sizes", "10", "--min-time", "0.001", "--repeat", "1"]
+    assert main([*arguments, "-o", str(path)]) == 0
+    assert "json x 10:" in capsys.readouterr().out
+
+    results = json.loads(path.read_text())
+    assert isinstance(results["compiled"], bool)
+    json_result, deep_result = results["results"]
+    assert (json_result["shape"], json_result["size"]) == ("json", 10)
+    assert json_result["methods"]["duper"]["copy"] > 0
+    assert json_result["methods"]["duper_adaptive"]["copy"] > 0
+    assert json_result["methods"]["duper_adaptive_top"]["copy"] > 0
+    assert "deepcopy" in json_result["break_even"]["duper"]
+
+
+def test_cli_errors(capsys):
+    with pytest.raises(SystemExit):
+        main(["--shapes", "unknown"])
+    assert "unknown shapes: unknown" in capsys.readouterr().err
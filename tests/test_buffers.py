@@ -0,0 +1,113 @@
+import array
+import copy
+import pickle
+
+import pytest
+
+import duper
+
+
+FACTORIES = pytest.mark.parametrize(
+    "factory", [duper.ast_factory, duper.bytecode_factory], ids=["ast", "bytecode"]
+)
+
+
+class Packet(bytearray):
+    def __init__(self, payload):
+        super().__init__()
+        self.payload = payload
+
+    def __reduce_ex__(self, protocol):
+        assert protocol == 5
+        return Packet, (pickle.PickleBuffer(self.payload),)
+
+
+@FACTORIES
+def test_bytearray(factory):
+    x = {"buffer": bytearray(b"abc")}
+    dup = duper.deepdups(x, factory=factory)
+    x["buffer"][0] = ord("x")
+    copy = dup()
+    assert copy == {"buffer": bytearray(b"abc")}
+    assert dup()["buffer"] is not copy["buffer"]
+
+
+@FACTORIES
+@pytest.mark.parametrize("typecode", ["b", "H", "q", "d"])
+def test_array(factory, typecode):
+    x = array.array(typecode, [1, 2, 3])
+    copy = duper.deepdups([x], factory=factory)()[0]
+    assert copy == x
+    assert copy is not x
+    assert copy.typecode == typecode
+
+
+@FACTORIES
+def test_memoryview_refers_to_copy_of_its_object(factory):
+    buffer = bytearray(b"abc")
+    x = [buffer, memoryview(buffer)]
+    copy_buffer, copy_view = duper.deepdups(x, factory=factory)()
+    copy_view[0] = ord("x")
+    assert copy_buffer == bytearray(b"xbc")
+    assert buffer == bytearray(b"abc")
+    assert copy_view.obj is copy_buffer
+
+
+@FACTORIES
+def test_memoryview_keeps_format_shape_and_readonly(factory):
+    x = memoryview(array.array("i", range(6))).cast("B").cast("i", [2, 3]).toreadonly()
+    copy = duper.deepdups(x, factory=factory)()
+    assert (copy.format, copy.shape, copy.readonly) == ("i", (2, 3), True)
+    assert copy.tolist() == x.tolist()
+    assert copy.obj is not x.obj
+
+
+@FACTORIES
+def test_partial_memoryview_is_copied_on_its_own(factory):
+    buffer = bytearray(b"abcdef")
+    x = memoryview(buffer)[2:4]
+    copy = duper.deepdups(x, factory=factory)()
+    assert copy.tobytes() == b"cd"
+    assert not copy.readonly
+    buffer[2] = ord("x")
+    assert copy.tobytes() == b"cd"
+
+
+@FACTORIES
+def test_memoryview_of_bytes_is_shared(factory):
+    x = memoryview(b"abc")
+    assert duper.deepdups([x], factory=factory)()[0] is x
+
+
+@FACTORIES
+def test_pickle_buffer_from_reduce(factory):
+    x = Packet(bytearray(b"abc"))
+    copy = duper.deepdups(x, factory=factory)()
+    assert copy.payload.raw() == b"abc"
+    assert not copy.payload.raw().readonly
+    copy.payload.raw()[0] = ord("x")
+    assert x.payload == bytearray(b"abc")
+
+
+@FACTORIES
+def test_readonly_pickle_buffer(factory):
+    copy = duper.deepdups(Packet(b"abc"), factory=factory)()
+    assert copy.payload.raw().readonly
+    assert copy.payload.raw() == b"abc"
+
+
+class Versioned:
+    def __reduce_ex__(self, protocol):
+        return Versioned.restore, (protocol,)
+
+    @staticmethod
+    def restore(protocol):
+        x = Versioned()
+        x.protocol = protocol
+        return x
+
+
+@FACTORIES
+def test_protocol_4_for_objects_without_buffers(factory):
+    assert duper.deepdups(Versioned(), factory=factory)().protocol == 4
+    assert copy.deepcopy(Versioned()).protocol == 4
@@ -0,0 +1,88 @@
+import copy
+from functools import partial
+
+import pytest
+
+import duper
+from duper.factories.bytecode import bytecode_factory
+
+
+deepdups = partial(duper.deepdups, factory=bytecode_factory)
+
+
+class Vanilla:
+    def __init__(self, foo):
+        self.foo = foo
+
+    def __eq__(self, other):
+        return type(other) is Vanilla and self.foo == other.foo
+
+
+class NewArgsEx(int):
+    def __new__(cls, *, foo):
+        self = int.__new__(cls)
+        self.foo = foo
+        return self
+
+    def __getnewargs_ex__(self):
+        return (), {"foo": self.foo}
+
+
+@pytest.mark.parametrize(
+    "x",
+    [
+        {"a": 1, "b": [(1, 2, 3), (4, 5, 6)], "c": [None, ..., 1j]},
+        [[1, 2], {3, 4, 5}, frozenset({(1, 2)}), ([],), ((1,), 2)],
+        list(range(100)),
+        [[i] for i in range(300)],
+        {i: [i] for i in range(50)},
+        set(range(50)),
+        {"foo": Vanilla([42]), "bar": (Vanilla({}),)},
+    ],
+)
+def test_deepdups(x):
+    dup = deepdups(x)
+    y = dup()
+    assert y == x == copy.deepcopy(x)
+    assert y is not x
+    assert dup() is not y
+
+
+def test_shared_references():
+    shared = [[i] for i in range(300)]
+    x = [shared, shared, *shared, *shared]
+    y = deepdups(x)()
+    assert y == x
+    assert y[0] is y[1]
+    assert y[0] is not shared
+    assert all(a is b for a, b in zip(y[2:302], y[0]))
+    assert all(a is b for a, b in zip(y[302:], y[0]))
+
+
+def test_reflexive_instance():
+    class C:
+        def m(self):
+            return self
+
+    x = C()
+    x.foo = x
+    x.bar = x.m
+    y = deepdups(x)()
+    assert y is not x
+    assert y.foo is y
+    assert y.bar() is y
+
+
+def test_keyword_arguments():
+    x = [NewArgsEx(foo=[42])]
+    y = deepdups(x)()
+    assert type(y[0]) is NewArgsEx
+    assert y[0].foo == [42]
+    assert y[0].foo is not x[0].foo
+
+
+def test_reflexive_list_not_supported():
+    x = []
+    x.append(x)
+    with pytest.raises(duper.Error):
+        deepdups(x)
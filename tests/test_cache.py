@@ -0,0 +1,118 @@
+import collections
+import functools
+import os
+
+import pytest
+
+import duper
+from duper.factories import cache
+from duper.factories import registry
+from duper.factories.runtime import plans
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __eq__(self, other):
+        return type(other) is Point and (self.x, self.y) == (other.x, other.y)
+
+
+TEMPLATE = {
+    "points": [Point(1, [2]), Point(3, (4, 5))],
+    "ordered": collections.OrderedDict(a=[1]),
+    "buffer": bytearray(b"abc"),
+}
+
+
+def test_cache_is_reused_between_instances(tmp_path, monkeypatch):
+    produce = duper.deepdups(TEMPLATE, factory=duper.DiskCache(tmp_path))
+    assert produce() == TEMPLATE
+    assert len(os.listdir(tmp_path)) == 1
+
+    monkeypatch.setattr(cache, "compile_function", None)
+    loaded = duper.deepdups(TEMPLATE, factory=duper.DiskCache(tmp_path))
+    copy = loaded()
+    assert copy == TEMPLATE
+    assert copy["points"][0] is not TEMPLATE["points"][0]
+    assert type(copy["points"][0]) is Point
+
+
+def test_changed_object_is_compiled_again(tmp_path):
+    factory = duper.DiskCache(tmp_path)
+    assert duper.deepdups([[1]], factory=factory)() == [[1]]
+    assert duper.deepdups([[2]], factory=factory)() == [[2]]
+    assert len(os.listdir(tmp_path)) == 2
+
+
+@pytest.fixture
+def unregister():
+    yield
+    registry.emitters.pop(Point, None)
+    plans.pop(Point, None)
+
+
+def test_registering_emitter_changes_key(tmp_path, unregister):
+    x = [Point(1, [2])]
+    assert duper.deepdups(x, factory=duper.DiskCache(tmp_path))()[0] is not x[0]
+
+    duper.register(Point, duper.share)
+    assert duper.deepdups(x, factory=duper.DiskCache(tmp_path))()[0] is x[0]
+
+    duper.register(Point, lambda p: (Point, (p.x, p.y)))
+    copy = duper.deepdups(x, factory=duper.DiskCache(tmp_path))()
+    assert copy == x and copy[0] is not x[0]
+    # shared instance can't be imported, so only factories without it are cached
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_emitter_that_cant_be_identified_disables_cache(tmp_path, unregister):
+    duper.register(Point, functools.partial(lambda p, cls: (cls, (p.x, p.y)), cls=Point))
+    assert duper.deepdups([[1]], factory=duper.DiskCache(tmp_path))() == [[1]]
+    assert not tmp_path.exists() or not os.listdir(tmp_path)
+
+
+def test_unpicklable_object_is_not_cached(tmp_path):
+    x = [[lambda: None]]
+    assert duper.deepdups(x, factory=duper.DiskCache(tmp_path))() == x
+    assert not tmp_path.exists() or not os.listdir(tmp_path)
+
+
+def test_object_that_cant_be_imported_is_not_cached(tmp_path):
+    class Local:
+        pass
+
+    x = [Local()]
+    assert type(duper.deepdups(x, factory=duper.DiskCache(tmp_path))()[0]) is Local
+    assert not tmp_path.exists() or not os.listdir(tmp_path)
+
+
+def test_corrupted_cache_is_ignored(tmp_path):
+    factory = duper.DiskCache(tmp_path)
+    duper.deepdups([[1]], factory=factory)
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(b"garbage")
+    assert duper.deepdups([[1]], factory=factory)() == [[1]]
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        dict.update,
+        object.__new__,
+        collections.OrderedDict,
+        os.path.join,
+        collections,
+        (1, ("a", b"b")),
+    ],
+)
+def test_describe(value):
+    entry = cache.describe(value)
+    assert entry is not None
+    assert (entry[0] if len(entry) == 1 else cache.resolve(*entry)) == value
+
+
+@pytest.mark.parametrize("value", [[1], object(), (1, object), lambda: None])
+def test_describe_unsupported(value):
+    assert cache.describe(value) is None
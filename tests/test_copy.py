@@ -529,7 +529,6 @@ def test_deepcopy_list(self):
     assert x[0] is not y[0]
 
 
-@pytest.mark.xfail(strict=True, raises=duper.Error)
 @pytest.mark.parametrize("op", comparisons)
 def test_deepcopy_reflexive_list(op):
     x = []
@@ -562,7 +561,6 @@ def test_deepcopy_tuple_of_immutables(self):
     assert x is y
 
 
-@pytest.mark.xfail(strict=True, raises=duper.Error)
 @pytest.mark.parametrize("op", comparisons)
 def test_deepcopy_reflexive_tuple(op):
     x = ([], 4, 3)
@@ -584,7 +582,6 @@ def test_deepcopy_dict(self):
     assert x["foo"] is not y["foo"]
 
 
-@pytest.mark.xfail(strict=True, raises=duper.Error)
 @pytest.mark.parametrize("order_op,eq_op", zip(order_comparisons, equality_comparisons))
 def test_deepcopy_reflexive_dict_order(order_op, eq_op):
     x = {}
@@ -599,7 +596,6 @@ def test_deepcopy_reflexive_dict_order(order_op, eq_op):
     assert len(y) == 1
 
 
-@pytest.mark.xfail(strict=True, raises=duper.Error)
 def test_deepcopy_keepalive(self):
     memo = {}
     x = []
@@ -607,7 +603,6 @@ def test_deepcopy_keepalive(self):
     assert memo[id(memo)][0] is x
 
 
-@pytest.mark.xfail(strict=True, raises=duper.Error)
 def test_deepcopy_dont_memo_immutable(self):
     memo = {}
     x = [1, 2, 3, 4]
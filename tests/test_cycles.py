@@ -0,0 +1,78 @@
+import pytest
+
+import duper
+
+
+class Node:
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+
+
+def test_tree_with_parent_references():
+    root = Node()
+    child = Node(root)
+    Node(child)
+    copy = duper.deepdups(root)()
+    assert copy is not root
+    assert copy.children[0].parent is copy
+    assert copy.children[0].children[0].parent is copy.children[0]
+
+
+@pytest.mark.parametrize("container", [list, set])
+def test_container_referenced_from_its_items(container):
+    class Item:
+        def __init__(self, owner):
+            self.owner = owner
+
+        def __hash__(self):
+            return 0
+
+    x = container()
+    item = Item(x)
+    if container is list:
+        x.append(item)
+    else:
+        x.add(item)
+    copy = duper.deepdups(x)()
+    assert type(copy) is container
+    assert next(iter(copy)).owner is copy
+
+
+def test_dict_referenced_from_nested_values():
+    x = {"a": 1}
+    x["self"] = {"root": x, "items": [x]}
+    copy = duper.deepdups(x)()
+    assert copy["self"]["root"] is copy
+    assert copy["self"]["items"][0] is copy
+    assert list(copy) == ["a", "self"]
+
+
+def test_tuple_referenced_from_list_and_dict():
+    x = ([], {})
+    x[0].append(x)
+    x[1]["x"] = x
+    copy = duper.deepdups(x)()
+    assert copy[0][0] is copy
+    assert copy[1]["x"] is copy
+
+
+def test_tuple_referenced_from_instance():
+    node = Node()
+    x = (node,)
+    node.parent = x
+    copy = duper.deepdups(x)()
+    assert copy[0].parent is copy
+    assert copy[0] is not node
+
+
+def test_tuple_referenced_from_reduce_items():
+    class Items(list):
+        pass
+
+    x = (Items(), 1)
+    x[0].append(x)
+    with pytest.raises(duper.Error):
+        duper.deepdups(x)
@@ -0,0 +1,152 @@
+import collections
+import gc
+
+import pytest
+
+import duper
+from duper.factories import ast
+from duper.factories.ast import MAX_DEPTH
+from duper.factories.ast import reconstruct
+
+
+DEPTH = 600
+
+
+class Node:
+    def __init__(self, value, next=None):
+        self.value = value
+        self.next = next
+
+
+class Slotted:
+    __slots__ = ("value", "next")
+
+    def __init__(self, value, next=None):
+        self.value = value
+        self.next = next
+
+
+class Reduced:
+    def __init__(self, next):
+        self.next = next
+
+    def __reduce__(self):
+        return Reduced, (self.next,)
+
+
+def chain(wrap, end=None):
+    x = end
+    for i in range(DEPTH):
+        x = wrap(i, x)
+    return x
+
+
+def walk(x, step):
+    """Yields each level of a chain, without recursion"""
+    for _ in range(DEPTH):
+        yield x
+        x = step(x)
+
+
+CHAINS = {
+    "list": (lambda i, x: [i, x], lambda x: x[1]),
+    "dict": (lambda i, x: {"value": i, "next": x}, lambda x: x["next"]),
+    "tuple": (lambda i, x: (i, x, []), lambda x: x[1]),
+    "instance": (Node, lambda x: x.next),
+    "slots": (Slotted, lambda x: x.next),
+    "reduce": (lambda i, x: Reduced(x), lambda x: x.next),
+    "ordered_dict": (lambda i, x: collections.OrderedDict(next=x), lambda x: x["next"]),
+}
+
+
+@pytest.mark.parametrize("factory", [duper.ast_factory, duper.bytecode_factory])
+@pytest.mark.parametrize("kind", CHAINS)
+def test_deep_chain(kind, factory):
+    wrap, step = CHAINS[kind]
+    x = chain(wrap)
+    copy = duper.deepdups(x, factory=factory)()
+    for original, copied in zip(walk(x, step), walk(copy, step)):
+        assert type(copied) is type(original)
+        assert copied is not original
+
+
+def test_deep_constant_tuples_are_reused():
+    x = chain(lambda i, x: (i, x))
+    copy = duper.deepdups([x])()
+    assert copy[0] is x
+
+
+def test_deep_frozensets():
+    x = chain(lambda i, x: frozenset({i, x, Node(i)}))
+    copy = duper.deepdups(x)()
+    assert type(copy) is frozenset
+    assert len(copy) == 3
+
+
+def test_deep_chain_with_shared_and_parent_references():
+    shared = [1]
+    head = current = Node(0)
+    for i in range(1, DEPTH):
+        current.next = Node(i)
+        current.next.prev = current
+        current.next.shared = shared
+        current = current.next
+    copy = duper.deepdups(head)()
+    nodes = list(walk(copy, lambda x: x.next))
+    assert all(node.next.prev is node for node in nodes[:-1])
+    assert all(node.shared is nodes[1].shared for node in nodes[1:])
+    assert nodes[1].shared is not shared
+
+
+def test_deep_chain_referencing_root():
+    x = current = []
+    for _ in range(DEPTH):
+        current.append(current := [])
+    current.append(x)
+    copy = duper.deepdups(x)()
+    for level in walk(copy, lambda x: x[0]):
+        pass
+    assert level[0][0] is copy
+
+
+def test_deep_batch():
+    x = chain(lambda i, x: [i, x])
+    first, second = duper.deepdups_batch(x)(2)
+    assert first is not second
+    assert [level[0] for level in walk(first, lambda x: x[1])] == list(range(DEPTH))[::-1]
+
+
+def test_shallow_objects_are_not_split():
+    x = chain(lambda i, x: [i, x])
+    for _ in range(DEPTH - MAX_DEPTH):
+        x = x[1]
+    assert duper.ast_factory(x).__code__.co_nlocals == 0
+
+
+def test_names_of_many_objects_of_one_type():
+    x = [Node(i) for i in range(5000)]
+    expression, namespace = reconstruct(x)
+    assert {f"node{i}" for i in range(1, 5000)} <= namespace.used_names
+    assert max(len(name) for name in namespace.used_names if name.startswith("node")) == 8
+    copy = duper.deepdups(x)()
+    assert [node.value for node in copy] == list(range(5000))
+
+
+def test_names_are_unique_across_many():
+    first, second = duper.deepdups_many([[Node(1), Node(2)], [Node(3), Node(4)]])
+    assert [node.value for node in first() + second()] == [1, 2, 3, 4]
+
+
+def test_gc_is_paused_only_on_request(monkeypatch):
+    states = []
+    monkeypatch.setattr(ast, "reconstruct_root", lambda *args: states.append(gc.isenabled()))
+    reconstruct([1])
+    monkeypatch.setattr(ast, "pause_gc", True)
+    reconstruct([1])
+    gc.disable()
+    try:
+        reconstruct([1])
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+    assert states == [True, False, False]
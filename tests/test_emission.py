@@ -0,0 +1,114 @@
+import importlib.util
+
+import pytest
+
+import duper
+from duper.factories import emission
+from duper.factories.ast import reconstruct
+from duper.factories.shape import ShapeCache
+from duper.factories.source import generate_module
+
+
+@pytest.fixture
+def force(monkeypatch):
+    """Makes every container of constants emitted with strategy, where it's supported"""
+
+    def force(strategy):
+        monkeypatch.setattr(
+            emission,
+            "choices",
+            {
+                (cls, computed_hashes, size): (
+                    strategy if strategy in strategies else emission.LITERAL
+                )
+                for cls, strategies in emission.STRATEGIES.items()
+                for computed_hashes in (False, True)
+                for size in emission.SIZES
+            },
+        )
+
+    return force
+
+
+def test_calibrate(monkeypatch):
+    monkeypatch.setattr(emission, "choices", {})
+    assert emission.choose(dict, 1000, False) in emission.STRATEGIES[dict]
+    assert emission.choose(list, 2, True) in emission.STRATEGIES[list]
+    assert len(emission.choices) == 25
+
+
+def test_copy(force):
+    force(emission.COPY)
+    x = {"config": {"a": 1, "b": (2, 3)}, "items": [1, 2], "tags": {"x"}, "mutable": {"c": []}}
+    produce = duper.deepdups(x)
+    first, second = produce(), produce()
+    assert first == second == x
+    assert first["config"] is not second["config"] is not x["config"]
+    assert first["mutable"]["c"] is not second["mutable"]["c"]
+
+    x["config"]["a"] = 2  # templates are snapshots
+    assert produce()["config"]["a"] == 1
+
+    expression, namespace = reconstruct({"a": 1})
+    assert [type(value) for value in namespace.names.values()] == [dict]
+    assert namespace.templates == {id(value) for value in namespace.names.values()}
+
+
+def test_constructor(force):
+    force(emission.CONSTRUCTOR)
+    x = [[1, 2, 3], {1, 2}, {"a": 1}]
+    produce = duper.deepdups(x)
+    assert produce() == x
+    assert produce()[0] is not produce()[0]
+
+
+def test_shared_and_deep(force):
+    force(emission.COPY)
+    shared = {"a": 1}
+    x = {"first": shared, "second": [shared]}
+    copy = duper.deepdups(x)()
+    assert copy["first"] is copy["second"][0]
+    assert copy["first"] is not shared
+
+    x = leaf = []
+    for _ in range(300):
+        x = [x]
+    leaf.append({"b": 2})
+    assert duper.deepdups(x)() == x
+
+
+def test_literals(force):
+    force(emission.COPY)
+    previous = emission.literals(True)
+    try:
+        expression, namespace = reconstruct({"a": 1})
+    finally:
+        emission.literals(previous)
+    assert not namespace.names
+
+    # leaves of a shape must stay in constants of its factory
+    factory = ShapeCache()
+    assert factory({"a": 1, "b": 2})() == {"a": 1, "b": 2}
+    assert factory({"a": 3, "b": 4})() == {"a": 3, "b": 4}
+    assert list(factory.templates.values()) != [None]
+
+
+def test_disk_cache(force, tmp_path):
+    force(emission.COPY)
+    x = {"a": {"b": 1, "c": (2, "d")}}
+    duper.deepdups(x, factory=duper.DiskCache(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1
+    assert duper.deepdups(x, factory=duper.DiskCache(tmp_path))() == x
+
+
+def test_generated_module(force, tmp_path):
+    force(emission.COPY)
+    x = {"a": {"inf": float("inf"), "b": [1]}, "c": {"d": (1, 2)}}
+    source = generate_module(x)
+    assert "template.copy()" in source
+    path = tmp_path / "generated.py"
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location("generated", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.produce() == x
@@ -0,0 +1,104 @@
+import pytest
+
+import duper
+from duper.factories import registry
+from duper.factories.runtime import plans
+
+
+class Unsupported:
+    """Can be copied by deepcopy, but not reconstructed by duper"""
+
+    def __init__(self):
+        self.items = [1]
+
+
+def unsupported(x):
+    raise TypeError("nope")
+
+
+errors = []
+
+
+def collect(obj, memo, factory, error):
+    errors.append(str(error))
+    return lambda: ("copy", obj)
+
+
+@pytest.fixture(autouse=True)
+def clear():
+    errors.clear()
+    registry.emitters[Unsupported] = unsupported
+    plans.pop(Unsupported, None)
+    yield
+    del registry.emitters[Unsupported]
+    plans.pop(Unsupported, None)
+
+
+def test_part_falls_back():
+    part = Unsupported()
+    shared = [2]
+    x = {"a": [1, {"b": part}], "s": shared, "t": [shared]}
+    with pytest.warns(RuntimeWarning, match=r"Can't reconstruct obj\['a'\]\[1\]\['b'\]"):
+        produce = duper.deepdups(x, fallback=duper.warn)
+    copy = produce()
+    assert type(copy["a"][1]["b"]) is Unsupported
+    assert copy["a"][1]["b"] is not part
+    assert copy["a"][1]["b"].items == [1]
+    # the rest is still compiled
+    assert copy["s"] is copy["t"][0]
+    assert copy["s"] is not shared
+
+
+def test_custom_policy():
+    part = Unsupported()
+    x = [[1], part, {"c": part}]
+    copy = duper.deepdups(x, fallback=collect)()
+    assert copy == [[1], ("copy", part), {"c": ("copy", part)}]
+    assert copy[1] is copy[2]["c"]
+    assert errors == ["Can't reconstruct obj[1]: TypeError('nope')"]
+
+
+def test_instance_attribute_path():
+    class Holder:
+        def __init__(self):
+            self.part = Unsupported()
+
+    duper.deepdups({"h": Holder()}, fallback=collect)
+    assert errors == ["Can't reconstruct obj['h'].part: TypeError('nope')"]
+
+
+def test_deeply_nested_part():
+    x = leaf = []
+    for _ in range(300):
+        x = [x]
+    leaf.append(Unsupported())
+    copy = duper.deepdups(x, fallback=collect)()
+    assert errors == [f"Can't reconstruct obj{'[0]' * 301}: TypeError('nope')"]
+    for _ in range(300):
+        copy = copy[0]
+    assert copy[0][0] == "copy"
+
+
+def test_part_referencing_the_rest_fails_whole_object():
+    part = Unsupported()
+    x = {"items": [1]}
+    part.items = x["items"]
+    x["part"] = part
+    with pytest.warns(RuntimeWarning, match="Falling back"):
+        produce = duper.deepdups(x, fallback=duper.warn)
+    copy = produce()
+    assert copy["part"].items is copy["items"]
+    assert copy["items"] is not x["items"]
+
+
+def test_fail_is_strict():
+    with pytest.raises(duper.Error):
+        duper.deepdups([Unsupported()])
+
+
+def test_batch_and_many():
+    x = [[1], Unsupported()]
+    first, second = duper.deepdups_batch(x, fallback=collect)(2)
+    assert first[0] is not second[0]
+    produce, = duper.deepdups_many([x], fallback=collect)
+    assert produce()[1][0] == "copy"
@@ -0,0 +1,123 @@
+import collections
+
+import pytest
+
+import duper
+
+
+def config():
+    return {
+        "db": {"host": "localhost", "ports": [5432, 5433]},
+        "features": [{"name": "a", "on": True}, {"name": "b", "on": False}],
+        "debug": False,
+    }
+
+
+def test_refreshable():
+    x = config()
+    factory = duper.RefreshableFactory(x)
+    copy = factory()
+    assert copy == x
+    assert copy["db"] is not x["db"]
+    assert copy["features"][0] is not factory()["features"][0]
+
+
+@pytest.mark.parametrize(
+    "mutate, compiled",
+    [
+        (lambda x: None, 0),
+        (lambda x: x.update(debug=True), 2),
+        (lambda x: x["db"]["ports"].append(1), 3),
+        (lambda x: x["features"][1].update(on=1), 3),  # 1 == True, but it's a different value
+        (lambda x: x.pop("debug"), 1),
+        (lambda x: x["db"].update(user="root"), 3),
+    ],
+)
+def test_refresh_compiles_only_changes(mutate, compiled):
+    x = config()
+    factory = duper.RefreshableFactory(x)
+    mutate(x)
+    assert factory.refresh(x) == compiled
+    assert factory() == x
+    assert [type(f["on"]) for f in factory()["features"]] == [type(f["on"]) for f in x["features"]]
+
+
+def test_refresh_signed_zero():
+    x = {"a": 0.0, "b": {0.0}, "c": [0j]}
+    factory = duper.RefreshableFactory(x)
+    x["a"], x["b"], x["c"][0] = -0.0, {-0.0}, complex(0.0, -0.0)
+    assert factory.refresh(x) == 5
+    copy = factory()
+    assert str(copy["a"]) == "-0.0"
+    assert str(copy["b"]) == "{-0.0}"
+    assert str(copy["c"][0]) == str(complex(0.0, -0.0))
+
+
+def test_refresh_with_another_object():
+    factory = duper.RefreshableFactory(config())
+    assert factory.refresh([1, {"a": 2}]) == 4
+    assert factory() == [1, {"a": 2}]
+
+
+def test_shared_references_are_not_split():
+    shared = [1]
+    x = {"a": shared, "b": shared}
+    factory = duper.RefreshableFactory(x)
+    copy = factory()
+    assert copy["a"] is copy["b"]
+    assert copy["a"] is not shared
+
+    x["c"] = 1
+    factory.refresh(x)
+    copy = factory()
+    assert copy["a"] is copy["b"]
+    assert copy["c"] == 1
+
+    x["b"] = [1]
+    factory.refresh(x)
+    copy = factory()
+    assert copy["a"] is not copy["b"]
+
+
+class Slotted:
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+def test_shared_through_slots_and_reduce_state_is_not_split():
+    shared = [1]
+    x = {"a": Slotted(shared), "b": [Slotted(shared)]}
+    copy = duper.RefreshableFactory(x)()
+    assert copy["a"].items is copy["b"][0].items
+    assert copy["a"].items is not shared
+
+    x = {"a": collections.deque([shared]), "b": {"c": collections.deque([shared])}}
+    factory = duper.RefreshableFactory(x)
+    copy = factory()
+    assert copy["a"][0] is copy["b"]["c"][0]
+    x["d"] = 1
+    factory.refresh(x)
+    copy = factory()
+    assert copy["a"][0] is copy["b"]["c"][0]
+
+
+def test_deeply_nested():
+    x = leaf = []
+    for _ in range(5000):
+        x = [x]
+    leaf.append(1)
+    x = {"deep": x, "flat": 1}
+    factory = duper.RefreshableFactory(x)
+
+    x["flat"] = 2
+    assert factory.refresh(x) == 2
+    leaf.append(2)
+    assert factory.refresh(x) == 3  # top level, "deep" list and its only item
+    copy = factory()
+    assert copy["flat"] == 2
+    copy = copy["deep"]
+    for _ in range(5000):
+        copy = copy[0]
+    assert copy == [1, 2] and copy is not leaf
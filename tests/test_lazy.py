@@ -0,0 +1,172 @@
+import collections
+import copy
+import heapq
+import json
+import pickle
+
+import pytest
+
+import duper
+from duper.factories.lazy import LazyList
+from duper.factories.lazy import Unbuilt
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __eq__(self, other):
+        return type(other) is Point and vars(self) == vars(other)
+
+
+def data():
+    return {
+        "name": "config",
+        "db": {"hosts": ["a", "b"], "options": {"timeout": 1.5}},
+        "points": [Point(1, 2), Point(3, [4])],
+        "pairs": [(1, 2), ([3],)],
+        "empty": {},
+    }
+
+
+def is_unbuilt(container, key):
+    return type(dict.__getitem__(container, key)) is Unbuilt
+
+
+def test_lazydups_builds_on_access():
+    produce = duper.lazydups(x := data())
+    copy_ = produce()
+    assert isinstance(copy_, dict)
+    assert is_unbuilt(copy_, "db") and is_unbuilt(copy_, "points")
+    assert not is_unbuilt(copy_, "name")
+
+    db = copy_["db"]
+    assert db is copy_["db"]
+    assert not is_unbuilt(copy_, "db")
+    assert is_unbuilt(copy_, "points")
+    assert is_unbuilt(db, "hosts")
+
+    db["hosts"].append("c")
+    assert x["db"]["hosts"] == ["a", "b"]
+    assert produce()["db"]["hosts"] == ["a", "b"]
+
+
+def test_lazydups_equals_deepcopy():
+    x = data()
+    copy_ = duper.lazydups(x)()
+    assert copy_ == x
+    assert x == copy_
+    assert copy_["points"][1] is not x["points"][1]
+    assert copy_["points"][1].y is not x["points"][1].y
+    assert copy_["pairs"][1][0] is not x["pairs"][1][0]
+
+
+@pytest.mark.parametrize(
+    "read",
+    [
+        repr,
+        json.dumps,
+        dict,
+        lambda c: {**c},
+        lambda c: list(c.items()),
+        lambda c: list(c.values()),
+        lambda c: c.copy(),
+        lambda c: c | {},
+        lambda c: {} | c,
+        lambda c: pickle.loads(pickle.dumps(c)),
+        copy.deepcopy,
+        lambda c: [c.pop("db"), c.popitem(), c.get("name"), c.setdefault("points")],
+    ],
+)
+def test_lazy_dict_exposes_only_built_values(read):
+    x = {"db": {"hosts": ["a"]}, "name": "n", "points": [[1], [2]]}
+    assert Unbuilt.__name__ not in repr(read(duper.lazydups(x)()))
+
+
+@pytest.mark.parametrize(
+    "read",
+    [
+        repr,
+        json.dumps,
+        list,
+        tuple,
+        lambda c: list(reversed(c)),
+        lambda c: c[:],
+        lambda c: c + [],
+        lambda c: [] + c,
+        lambda c: c * 2,
+        lambda c: sorted(c),
+        lambda c: [c.pop(), c.pop(0)],
+        lambda c: pickle.loads(pickle.dumps(c)),
+    ],
+)
+def test_lazy_list_exposes_only_built_items(read):
+    assert Unbuilt.__name__ not in repr(read(duper.lazydups([[1], [2], [3]])()))
+
+
+def test_lazy_list_compares_and_searches_built_items():
+    copy_ = duper.lazydups(x := [[1], {"a": 2}, 3])()
+    assert copy_ == x
+    assert copy_ == duper.lazydups(x)()
+    assert {"a": 2} in copy_
+    assert copy_.index([1]) == 0
+    assert copy_.count(3) == 1
+    copy_.remove({"a": 2})
+    assert copy_ == [[1], 3]
+
+
+def test_lazydups_eager_for_shared_references():
+    shared = [1]
+    x = {"a": shared, "b": {"c": shared}}
+    copy_ = duper.lazydups(x)()
+    assert type(copy_) is dict
+    assert copy_["a"] is copy_["b"]["c"]
+
+
+@pytest.mark.parametrize("x", [1, (1, [2]), Point(1, [2]), {1, 2}])
+def test_lazydups_other_types(x):
+    assert duper.lazydups(x)() == x
+
+
+class Slotted:
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+def test_lazydups_eager_for_references_shared_through_slots_and_deque():
+    shared = [1]
+    copy_ = duper.lazydups({"a": Slotted(shared), "b": [Slotted(shared)]})()
+    assert type(copy_) is dict
+    assert copy_["a"].items is copy_["b"][0].items is not shared
+
+    copy_ = duper.lazydups({"a": collections.deque([shared]), "b": [collections.deque([shared])]})()
+    assert type(copy_) is dict
+    assert copy_["a"][0] is copy_["b"][0][0] is not shared
+
+
+def test_lazydups_deeply_nested():
+    x = leaf = []
+    for _ in range(5000):
+        x = [{"next": x}]
+    leaf.append([1])
+    copy_ = duper.lazydups(x)()
+    assert type(copy_) is LazyList
+    for _ in range(5000):
+        copy_ = copy_[0]["next"]
+    assert copy_ == [[1]]
+    assert copy_[0] is not leaf[0]
+
+
+def test_c_readers_see_placeholders():
+    copy_ = duper.lazydups([[3], [1], [2]])()
+    with pytest.raises(TypeError):
+        heapq.heapify(copy_)
+    assert all(type(item) is Unbuilt for item in list.__iter__(copy_))
+
+    items = copy_[:]
+    heapq.heapify(items)
+    assert items[0] == [1]
+    assert json.dumps(duper.lazydups({"a": [1]})()) == '{"a": [1]}'
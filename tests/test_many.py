@@ -0,0 +1,84 @@
+import sys
+
+import pytest
+
+import duper
+
+
+class C:
+    def __init__(self, value):
+        self.value = value
+        self.me = self
+
+
+class Uncopyable:
+    def __reduce__(self):
+        raise TypeError("nope")
+
+
+OBJECTS = [
+    {"a": [1, 2], "b": {"c": (3, [4])}},
+    [[1], [2]],
+    (1, 2),
+    42,
+    [],
+    [1, 2],
+    C([1]),
+]
+
+
+def test_many():
+    factories = duper.deepdups_many(OBJECTS)
+    assert len(factories) == len(OBJECTS)
+    for x, produce in zip(OBJECTS, factories):
+        copy = produce()
+        assert type(copy) is type(x)
+        if isinstance(x, C):
+            assert copy.me is copy
+            assert copy.value == x.value and copy.value is not x.value
+        else:
+            assert copy == x
+        if isinstance(x, list):
+            assert copy is not x
+
+
+def test_many_share_one_module():
+    first, second = duper.deepdups_many([[[1]], {"a": [C]}])
+    assert first.__globals__ is second.__globals__
+    assert first() == [[1]]
+    assert second() == {"a": [C]}
+
+
+def test_many_same_object_twice():
+    x = [C(1)]
+    first, second = duper.deepdups_many([x, x])
+    assert first()[0] is not second()[0]
+    assert first()[0].value == 1
+
+
+def test_many_local_names_dont_shadow_stored_objects():
+    c = C(1)
+    x = [c, c, list]
+    first, second = duper.deepdups_many([x, [type(c), len, c]])
+    assert first()[2] is list
+    copy = second()
+    assert copy[0] is C
+    assert copy[2].me is copy[2]
+
+
+def test_many_fallback():
+    factories = duper.deepdups_many([[Uncopyable()], [[1]]], fallback=duper.warn)
+    with pytest.raises(TypeError):
+        factories[0]()
+    assert factories[1]() == [[1]]
+
+
+def test_many_fail():
+    with pytest.raises(duper.Error):
+        duper.deepdups_many([[[1]], [Uncopyable()]])
+
+
+def test_many_without_gil(monkeypatch):
+    monkeypatch.setattr(sys, "_is_gil_enabled", lambda: False, raising=False)
+    objects = [{"i": [i]} for i in range(20)]
+    assert [produce() for produce in duper.deepdups_many(objects)] == objects
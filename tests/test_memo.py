@@ -0,0 +1,136 @@
+import copy
+
+import pytest
+
+import duper
+from duper.factories.ast import ast_memo_factory
+
+
+class Node:
+    def __init__(self, value):
+        self.value = value
+
+
+class Custom:
+    def __init__(self, value):
+        self.value = value
+
+    def __deepcopy__(self, memo):
+        result = Custom(copy.deepcopy(self.value, memo))
+        memo[id(self)] = result
+        return result
+
+
+class Delegating:
+    """Copies its value with duper, same as it would with copy.deepcopy"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __deepcopy__(self, memo):
+        return Delegating(duper.deepdupe(self.value, memo))
+
+
+def test_seeds_memo():
+    shared = [1]
+    x = {"a": shared, "b": [shared, (shared,)], "c": Node({"d": []})}
+    memo = {}
+    result = duper.deepdupe(x, memo)
+    assert result == {"a": [1], "b": [[1], ([1],)], "c": result["c"]}
+    assert result["a"] is result["b"][0] is result["b"][1][0]
+    assert memo[id(x)] is result
+    assert memo[id(x["c"])] is result["c"]
+    assert copy.deepcopy(shared, memo) is result["a"]
+    assert copy.deepcopy(x["c"].value, memo) is result["c"].value
+    assert x in memo[id(memo)]
+
+
+def test_honors_memo():
+    shared = [1]
+    x = {"a": shared, "b": [shared]}
+    memo = {id(shared): "copied"}
+    assert duper.deepdupe(x, memo) == {"a": "copied", "b": ["copied"]}
+
+    memo = {id(x): "copied"}
+    assert duper.deepdupe(x, memo) == "copied"
+
+
+def test_reusable():
+    shared = [1]
+    produce = ast_memo_factory({"a": shared, "b": shared})
+    first, second = produce(), produce({})
+    assert first == second == {"a": [1], "b": [1]}
+    assert first["a"] is first["b"]
+    assert first["a"] is not second["a"]
+
+
+@pytest.mark.parametrize("order", ["custom first", "custom last"])
+def test_shared_with_deepcopy(order):
+    shared = [1]
+    custom = Custom(shared)
+    x = {"c": custom, "s": shared} if order == "custom first" else {"s": shared, "c": custom}
+    result = duper.deepdupe(x, {})
+    assert result["c"].value is result["s"]
+    assert result["s"] == [1] and result["s"] is not shared
+
+
+@pytest.mark.parametrize(
+    "factory",
+    [
+        duper.ast_factory,
+        duper.bytecode_factory,
+        lambda x: lambda: duper.ast_batch_factory(x)(1)[0],
+        lambda x: duper.ast_many_factory([[], x])[1],
+    ],
+    ids=["ast", "bytecode", "batch", "many"],
+)
+@pytest.mark.parametrize("order", ["custom first", "custom last"])
+def test_factories_share_with_deepcopy(factory, order):
+    shared = [1]
+    custom = Custom(shared)
+    x = [custom, shared] if order == "custom first" else [shared, custom]
+    produce = factory(x)
+    first, second = produce(), produce()
+    for result in first, second:
+        c, s = result if order == "custom first" else result[::-1]
+        assert c.value is s
+        assert s == [1] and s is not shared
+    assert first[0] is not second[0] and first[1] is not second[1]
+
+
+def test_called_from_deepcopy():
+    shared = {"a": []}
+    x = [Delegating(shared), shared]
+    result = copy.deepcopy(x)
+    assert result[0].value is result[1]
+    assert result[1] == {"a": []} and result[1] is not shared
+
+
+def test_self_referential():
+    items = []
+    items.append(items)
+    node = Node(None)
+    node.value = node
+    x = {"items": items, "node": node}
+    memo = {}
+    result = ast_memo_factory(x)(memo)
+    assert result["items"][0] is result["items"]
+    assert result["node"].value is result["node"]
+    assert memo[id(items)] is result["items"]
+    assert memo[id(node)] is result["node"]
+
+
+def test_deeply_nested():
+    x = leaf = []
+    for _ in range(500):
+        x = [x]
+    memo = {}
+    result = duper.deepdupe(x, memo)
+    assert result == x
+    assert copy.deepcopy(leaf, memo) is not leaf
+    assert copy.deepcopy(x, memo) is result
+
+
+def test_immutable():
+    assert duper.deepdupe(1, {}) == 1
+    assert duper.deepdupe((1, "a"), {}) == (1, "a")
@@ -0,0 +1,90 @@
+import gc
+
+import pytest
+
+import duper
+from duper import metrics
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "types", {})
+    monkeypatch.setattr(metrics, "factories", metrics.weakref.WeakSet())
+
+
+class Unpicklable:
+    def __reduce_ex__(self, protocol):
+        raise TypeError("nope")
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", False)
+    produce = duper.deepdups({"a": [1]})
+    assert not isinstance(produce, metrics.Counted)
+
+
+@pytest.mark.parametrize("factory", [duper.ast_factory, duper.bytecode_factory])
+def test_builds_and_copies(enabled, factory):
+    produce = duper.deepdups({"a": [1]}, factory=factory)
+    for _ in range(3):
+        assert produce() == {"a": [1]}
+
+    totals = duper.stats()["types"]["dict"]
+    assert totals["builds"] == 1
+    assert totals["fallbacks"] == 0
+    # copy produced by check isn't counted
+    assert totals["copies"] == 3
+    assert {"analysis", "check"} <= totals["build_seconds"].keys()
+
+    del produce
+    gc.collect()
+    assert duper.stats()["types"]["dict"]["copies"] == 3
+    assert duper.stats()["factories"] == []
+
+
+def test_fallbacks(enabled):
+    produce = duper.deepdups(Unpicklable(), fallback=lambda obj, *_: lambda: [])
+    produce()
+    totals = duper.stats()["types"][metrics.type_name(Unpicklable)]
+    assert totals["fallbacks"] == 1
+    assert (totals["copies"], totals["fallback_copies"]) == (0, 1)
+
+
+def test_fallback_parts(enabled):
+    produce = duper.deepdups(
+        {"a": Unpicklable(), "b": [Unpicklable()], "c": [1]}, fallback=lambda obj, *_: lambda: []
+    )
+    assert produce() == {"a": [], "b": [[]], "c": [1]}
+    totals = duper.stats()["types"]["dict"]
+    assert totals["fallbacks"] == 2
+    # rest of the object is compiled, so its copies are counted as compiled
+    assert (totals["copies"], totals["fallback_copies"]) == (1, 0)
+    assert duper.stats()["factories"][0]["fallback_parts"] == 2
+
+
+def test_batch_and_many(enabled):
+    duper.deepdups_batch([[1]], check=False)(5)
+    for produce in duper.deepdups_many([[[1]], {"a": [1]}]):
+        produce()
+    totals = duper.stats()["types"]
+    assert totals["list"]["builds"] == 2
+    assert totals["list"]["copies"] == 6
+    assert totals["duper.deepdups_many"]["builds"] == 1
+    assert {"compile", "exec"} <= totals["duper.deepdups_many"]["build_seconds"].keys()
+
+
+def test_prometheus(enabled):
+    produce = duper.deepdups([[1]])
+    produce()
+    produce()
+    text = duper.stats("prometheus")
+    assert "# TYPE duper_builds_total counter" in text
+    assert 'duper_builds_total{type="list"} 1' in text
+    assert 'duper_copies_total{type="list"} 2' in text
+    assert 'duper_build_seconds_total{type="list",phase="compile"}' in text
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        duper.stats("xml")
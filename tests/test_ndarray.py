@@ -0,0 +1,104 @@
+import pytest
+
+import duper
+
+
+numpy = pytest.importorskip("numpy")
+
+FACTORIES = pytest.mark.parametrize(
+    "factory", [duper.ast_factory, duper.bytecode_factory], ids=["ast", "bytecode"]
+)
+
+
+@FACTORIES
+def test_writable_array_is_copied(factory):
+    x = numpy.arange(12, dtype=numpy.float64).reshape(3, 4)
+    copy = duper.deepdups(x, factory=factory)()
+    assert copy is not x
+    assert numpy.array_equal(copy, x)
+    assert copy.dtype == x.dtype
+    copy[0, 0] = 100
+    assert x[0, 0] == 0
+    assert duper.deepdups(x, factory=factory)()[0, 0] == 0
+
+
+@FACTORIES
+def test_copies_are_independent(factory):
+    dup = duper.deepdups({"state": numpy.zeros(4)}, factory=factory)
+    first, second = dup(), dup()
+    first["state"] += 1
+    assert not second["state"].any()
+
+
+@FACTORIES
+def test_template_is_snapshot(factory):
+    x = numpy.zeros(3)
+    dup = duper.deepdups(x, factory=factory)
+    x[0] = 1
+    assert dup()[0] == 0
+
+
+@FACTORIES
+def test_memory_layout_is_kept(factory):
+    x = numpy.asfortranarray(numpy.arange(6).reshape(2, 3))
+    copy = duper.deepdups(x, factory=factory)()
+    assert copy.flags.f_contiguous
+    assert numpy.array_equal(copy, x)
+
+
+@FACTORIES
+def test_readonly_array_is_shared(factory):
+    x = numpy.arange(3)
+    x.flags.writeable = False
+    assert duper.deepdups([x], factory=factory)()[0] is x
+
+
+@FACTORIES
+def test_readonly_view_of_writable_array_is_copied(factory):
+    base = numpy.arange(3)
+    x = base[:]
+    x.flags.writeable = False
+    copy = duper.deepdups(x, factory=factory)()
+    assert copy is not x
+    base[0] = 10
+    assert copy[0] == 0
+
+
+@FACTORIES
+def test_object_array_items_are_copied(factory):
+    x = numpy.array([[1], [2]] + [None], dtype=object)[:2]
+    copy = duper.deepdups(x, factory=factory)()
+    assert copy[0] == [1]
+    assert copy[0] is not x[0]
+
+
+@FACTORIES
+def test_shared_array_is_copied_once(factory):
+    x = numpy.zeros(2)
+    a, b = duper.deepdups([x, x], factory=factory)()
+    assert a is b
+    assert a is not x
+
+
+def test_batch_takes_copies_from_one_block():
+    x = {"a": numpy.arange(4.0), "b": numpy.float32(1.5), "c": numpy.zeros(())}
+    copies = duper.deepdups_batch(x)(3)
+    assert len(copies) == 3
+    assert copies[0]["a"].base is copies[1]["a"].base
+    for copy in copies:
+        assert numpy.array_equal(copy["a"], x["a"])
+        assert copy["b"] == x["b"]
+        assert copy["c"] is not x["c"]
+    copies[0]["a"][0] = 100
+    assert copies[1]["a"][0] == 0
+    assert x["a"][0] == 0
+
+
+def test_batch_of_zero_copies():
+    assert duper.deepdups_batch(numpy.arange(3))(0) == []
+
+
+@FACTORIES
+def test_immutable_tuple_with_types(factory):
+    x = [(int, 1), frozenset({str})]
+    assert duper.deepdups(x, factory=factory)() == x
@@ -0,0 +1,105 @@
+import types
+
+import pytest
+
+import duper
+from duper.factories import registry
+
+
+FACTORIES = [duper.ast_factory, duper.bytecode_factory]
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    registered = dict(registry.emitters)
+    yield
+    registry.emitters.clear()
+    registry.emitters.update(registered)
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __deepcopy__(self, memo):
+        raise AssertionError("emitter must be used instead")
+
+
+class Connection:
+    pass
+
+
+@pytest.mark.parametrize("factory", FACTORIES)
+def test_constructor(factory):
+    duper.register(Point, lambda p: (Point, (p.x,), {"y": p.y}))
+    shared = [1]
+    x = {"point": Point(shared, {"a": shared}), "shared": shared}
+    copy = duper.deepdups(x, factory=factory)()
+    assert type(copy["point"]) is Point
+    assert copy["point"].x is copy["point"].y["a"] is copy["shared"]
+    assert copy["shared"] is not shared
+
+
+@pytest.mark.parametrize("factory", FACTORIES)
+def test_share(factory):
+    duper.register(Connection, duper.share)
+    connection = Connection()
+    copy = duper.deepdups([connection, [connection]], factory=factory)()
+    assert copy[0] is copy[1][0] is connection
+
+
+def test_shortcut_and_plan():
+    duper.register(Point, lambda p: (Point, (p.x, p.y)))
+    copy = duper.deepdups(Point([1], 2))()
+    assert copy.x == [1]
+
+    duper.register(Connection, duper.share)
+    connection = Connection()
+    assert duper.deepdups(connection)() is connection
+
+
+def test_registered_after_copy():
+    connection = Connection()
+    assert duper.deepdups([connection])()[0] is not connection
+    duper.register(Connection, duper.share)
+    assert duper.deepdups([connection])()[0] is connection
+
+
+def test_deeply_nested():
+    duper.register(Point, lambda p: (Point, (p.x, p.y)))
+    x = leaf = []
+    for _ in range(300):
+        x = [x]
+    leaf.append(Point([1], leaf))
+    copy = duper.deepdups(x)()
+    for _ in range(300):
+        copy = copy[0]
+    assert copy[0].y is copy
+    assert copy[0].x == [1]
+
+
+@pytest.mark.parametrize("cls", [dict, int, bytearray, memoryview, types.MethodType])
+def test_reconstructed_by_duper(cls):
+    with pytest.raises(TypeError):
+        duper.register(cls, duper.share)
+    assert cls not in registry.emitters
+
+
+def test_share_is_unique():
+    assert not isinstance(duper.SHARE, str)
+    assert duper.share(Connection()) is duper.SHARE
+    assert repr(duper.SHARE) == "duper.SHARE"
+
+    duper.register(Point, lambda p: "share")
+    with pytest.raises(duper.Error):
+        duper.deepdups(Point(1, 2))
+
+
+def test_invalid():
+    with pytest.raises(TypeError):
+        duper.register(Point, "not callable")
+
+    duper.register(Point, lambda p: [Point, (p.x, p.y)])
+    with pytest.raises(duper.Error):
+        duper.deepdups(Point(1, 2))
@@ -0,0 +1,225 @@
+import copy
+import dataclasses
+import gc
+from collections import Counter
+from collections import OrderedDict
+from collections import defaultdict
+
+import pytest
+
+import duper
+from duper.factories.ast import ast_factory
+from duper.factories.bytecode import bytecode_factory
+from duper.factories.runtime import PLAIN
+from duper.factories.runtime import REDUCE
+from duper.factories.runtime import SLOTS
+from duper.factories.runtime import get_plan
+from duper.factories.runtime import inline_tail
+from duper.factories.runtime import plans
+
+
+class Plain:
+    def __init__(self):
+        self.a = [1]
+
+
+class Reduce(Plain):
+    def __reduce__(self):
+        return Reduce, ()
+
+
+class Slotted:
+    __slots__ = ("a",)
+
+
+class Getattr(Plain):
+    def __getattr__(self, name):
+        return None
+
+
+class NewArgs(Plain):
+    def __getnewargs__(self):
+        return ()
+
+
+@pytest.mark.parametrize(
+    "cls, plan",
+    [
+        (Plain, PLAIN),
+        (Reduce, REDUCE),
+        (Slotted, SLOTS),
+        (Getattr, REDUCE),
+        (NewArgs, REDUCE),
+        (list, REDUCE),
+        (type("Items", (list,), {}), REDUCE),
+    ],
+)
+def test_get_plan(cls, plan):
+    assert get_plan(cls) is plan
+    assert plans[cls] is plan
+
+
+def test_plans_dont_keep_classes_alive():
+    cls = type("Temporary", (Plain,), {})
+    duper.deepdups(cls())
+    assert cls in plans
+    size = len(plans)
+    del cls
+    gc.collect()
+    assert len(plans) == size - 1
+
+
+def test_plain_instances_copy():
+    x = Plain()
+    empty = Plain.__new__(Plain)
+    y, z = duper.deepdups([x, empty])()
+    assert y.a == x.a
+    assert y.a is not x.a
+    assert z.__dict__ == {}
+
+
+@dataclasses.dataclass(frozen=True)
+class Frozen:
+    items: list
+
+
+@pytest.mark.parametrize("factory", [ast_factory, bytecode_factory])
+def test_plain_instances_from_dict(factory):
+    x = Plain()
+    x.me = x
+    frozen = Frozen([1])
+    y, copied_frozen = factory([x, frozen])()
+    assert type(y.__dict__) is dict
+    assert y.__dict__.keys() == x.__dict__.keys()
+    assert y.me is y
+    assert y.a == [1] and y.a is not x.a
+    assert copied_frozen == frozen
+    assert copied_frozen.items is not frozen.items
+
+
+class Items(list):
+    pass
+
+
+class DoubleItems(list):
+    def append(self, item):
+        super().append(item * 2)
+
+
+class State:
+    def __init__(self, value):
+        self.value = value
+
+    def __getstate__(self):
+        return (self.value,)
+
+    def __setstate__(self, state):
+        (self.value,) = state
+
+
+class Restored(Plain):
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.restored = True
+
+
+@pytest.mark.parametrize("factory", [ast_factory, bytecode_factory])
+def test_setstate_is_called(factory):
+    assert get_plan(Restored) is REDUCE
+    y = factory([Restored()])()[0]
+    assert y.restored is True
+    assert y.a == [1]
+
+
+@pytest.mark.parametrize(
+    "cls, state, listiter, dictiter, expected",
+    [
+        (Items, {"a": 1}, True, False, True),
+        (DoubleItems, None, True, False, False),
+        (OrderedDict, None, False, True, True),
+        (defaultdict, None, False, True, True),
+        (Counter, None, False, True, False),
+        (State, (1,), False, False, True),
+        (Slotted, (None, {"a": 1}), False, False, False),
+    ],
+)
+def test_inline_tail(cls, state, listiter, dictiter, expected):
+    assert inline_tail(cls, state, listiter, dictiter) is expected
+
+
+@pytest.mark.parametrize("factory", [ast_factory, bytecode_factory])
+def test_reduce_tails(factory):
+    items = Items([1, [2]])
+    items.attr = {"a": [3]}
+    x = [
+        items,
+        DoubleItems([1, 2]),
+        OrderedDict(a=[1], b=2),
+        defaultdict(list, a=[1]),
+        Counter(a=2),
+        State([1]),
+    ]
+    y = factory(x)()
+    expected = copy.deepcopy(x)
+    assert [type(i) for i in y] == [type(i) for i in x]
+    assert y[:5] == expected[:5]
+    assert y[0].attr == items.attr
+    assert y[0][1] is not items[1]
+    assert y[5].value == [1]
+    assert y[5].value is not x[5].value
+
+
+class Point:
+    __slots__ = ("x", "__y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.__y = y
+
+
+class Point3D(Point):
+    __slots__ = ("z", "__dict__")
+
+
+class Keyword:
+    __slots__ = ("class",)
+
+
+class SlottedRestored:
+    __slots__ = ("a", "restored")
+
+    def __setstate__(self, state):
+        _, slots = state
+        self.a = slots["a"]
+        self.restored = True
+
+
+@pytest.mark.parametrize("factory", [ast_factory, bytecode_factory])
+def test_slots_setstate_is_called(factory):
+    x = SlottedRestored()
+    x.a = [1]
+    assert get_plan(SlottedRestored) is REDUCE
+    y = factory([x])()[0]
+    assert y.restored is True
+    assert y.a == [1] and y.a is not x.a
+
+
+@pytest.mark.parametrize("factory", [ast_factory, bytecode_factory])
+def test_slots(factory):
+    point = Point3D([1], 2)
+    point.z = point
+    point.extra = [3]
+    unset = Point3D.__new__(Point3D)
+    keyword = Keyword()
+    setattr(keyword, "class", [4])
+    x = [point, unset, keyword, Keyword()]
+
+    y = factory(x)()
+    assert y[0].x == [1] and y[0].x is not point.x
+    assert y[0]._Point__y == 2
+    assert y[0].z is y[0]
+    assert y[0].extra == [3] and y[0].extra is not point.extra
+    assert not hasattr(y[1], "x") and not hasattr(y[1], "z")
+    assert y[1].__dict__ == {}
+    assert getattr(y[2], "class") == [4]
+    assert not hasattr(y[3], "class")
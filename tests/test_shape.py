@@ -0,0 +1,91 @@
+import copy
+
+import pytest
+
+import duper
+from duper.factories.bytecode import bytecode_factory
+from duper.factories.shape import ShapeCache
+
+
+class Vanilla:
+    def __init__(self, foo):
+        self.foo = foo
+
+
+class Custom(Vanilla):
+    def __deepcopy__(self, memo):
+        return Custom(copy.deepcopy(self.foo, memo))
+
+
+def make(i):
+    shared = [i]
+    return {
+        "id": i,
+        "name": f"user{i}",
+        "score": i * 1.5,
+        "tags": ["x", "y", str(i)],
+        "pos": (i, [i + 1]),
+        "set": {i, i + 1, i + 2},
+        "frozen": frozenset({str(i)}),
+        "shared": [shared, shared],
+        "nested": {"a": {"b": [i, {"c": b"x" * i}]}},
+        "const": (True, None, 1.0),
+        "obj": Vanilla([i, str(i)]),
+    }
+
+
+@pytest.fixture(params=[duper.ast_factory, bytecode_factory])
+def cache(request):
+    return ShapeCache(request.param)
+
+
+def test_same_shape_compiled_once(cache):
+    for i in range(5):
+        x = make(i)
+        y = duper.deepdups(x, factory=cache)()
+        obj = y.pop("obj")
+        assert y == {k: v for k, v in copy.deepcopy(x).items() if k != "obj"}
+        assert obj.foo == x["obj"].foo
+        assert obj is not x["obj"]
+        assert y["shared"][0] is y["shared"][1]
+    assert len(cache.templates) == 1
+
+
+def test_different_shapes(cache):
+    objects = [{"a": [1]}, {"b": [1]}, {"a": [1, 2]}, {"a": [[1]]}, {"a": (1,)}, {"a": ["1"]}]
+    for x in objects:
+        assert duper.deepdups(x, factory=cache)() == x
+    assert len(cache.templates) == len(objects)
+
+
+def test_signed_zero_keys(cache):
+    for key in (0.0, -0.0, 0j, complex(0.0, -0.0)):
+        y = duper.deepdups({key: [1]}, factory=cache)()
+        assert str(next(iter(y))) == str(key)
+    assert len(cache.templates) == 4
+
+
+def test_shared_references_are_part_of_shape(cache):
+    a, b = [1], [1]
+    assert duper.deepdups([a, b], factory=cache)() == [[1], [1]]
+    y = duper.deepdups([a, a], factory=cache)()
+    assert y[0] is y[1]
+    assert len(cache.templates) == 2
+
+
+def test_unsupported_shapes_are_not_cached(cache):
+    x = {"a": [Custom([1])], "b": {(1, 2): [3]}}
+    y = duper.deepdups(x, factory=cache)()
+    assert y["a"][0].foo == [1]
+    assert y["b"] == {(1, 2): [3]}
+    assert not cache.templates
+
+
+def test_maxsize():
+    cache = ShapeCache(maxsize=2)
+    for i in range(4):
+        duper.deepdups({str(i): [i]}, factory=cache)
+    assert list(cache.templates) == [
+        ("dict", 1, str, "2", "list", 1, int),
+        ("dict", 1, str, "3", "list", 1, int),
+    ]
@@ -0,0 +1,119 @@
+import collections
+import copy
+import importlib.util
+import asyncio
+import multiprocessing.queues
+import os
+import queue
+import subprocess
+import sys
+
+import pytest
+
+from duper.__main__ import main
+from duper.factories.source import generate_module
+
+
+class Point:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Node:
+    def __init__(self, value):
+        self.value = value
+        self.me = self
+
+
+shared = [1]
+TEMPLATE = {
+    "point": Point(1, [2]),
+    "node": Node({"a": [1]}),
+    "ordered": collections.OrderedDict(a=[1]),
+    "types": (int, os.path.join),
+    "shared": [shared, shared],
+    "frozen": frozenset({1}),
+    "buffer": bytearray(b"abc"),
+}
+
+
+def load(path):
+    spec = importlib.util.spec_from_file_location("generated", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def check(copy):
+    assert copy.keys() == TEMPLATE.keys()
+    assert type(copy["point"]) is Point
+    assert (copy["point"].x, copy["point"].y) == (1, [2])
+    assert copy["point"].y is not TEMPLATE["point"].y
+    assert copy["node"].me is copy["node"]
+    assert copy["node"].value == {"a": [1]}
+    assert copy["ordered"] == TEMPLATE["ordered"]
+    assert copy["types"] == TEMPLATE["types"]
+    assert copy["shared"][0] is copy["shared"][1]
+    assert copy["shared"][0] is not shared
+    assert copy["frozen"] == TEMPLATE["frozen"]
+    assert copy["buffer"] == TEMPLATE["buffer"]
+
+
+def test_generated_module(tmp_path):
+    path = tmp_path / "generated.py"
+    path.write_text(generate_module(TEMPLATE, origin="tests.test_source:TEMPLATE"))
+    produce = load(path).produce
+    check(produce())
+    assert produce() is not produce()
+
+
+def test_generated_function_name(tmp_path):
+    path = tmp_path / "generated.py"
+    path.write_text(generate_module([[1]], "produce_defaults"))
+    assert load(path).produce_defaults() == [[1]]
+
+
+def test_aliases_are_numbered_per_name(tmp_path):
+    methods = [queue.Queue.put, asyncio.Queue.put, multiprocessing.queues.Queue.put, Point.__init__]
+    source = generate_module([methods, [Point.__init__]])
+    assert "as Queue1\n" in source and "as Queue2\n" in source and "Queue12" not in source
+    assert source.count("import Point") == 1
+    path = tmp_path / "generated.py"
+    path.write_text(source)
+    assert load(path).produce() == [methods, [Point.__init__]]
+
+
+def test_objects_that_cant_be_imported():
+    class Local:
+        pass
+
+    with pytest.raises(copy.Error, match="can.t be imported"):
+        generate_module([Local()])
+
+
+def test_cli(tmp_path, capsys):
+    path = tmp_path / "generated.py"
+    assert main(["compile", "tests.test_source:TEMPLATE", "-o", str(path)]) == 0
+    check(load(path).produce())
+
+    assert main(["compile", "tests.test_source:TEMPLATE"]) == 0
+    assert capsys.readouterr().out == path.read_text()
+
+
+def test_cli_errors(capsys):
+    with pytest.raises(SystemExit) as e:
+        main(["compile", "tests.test_source"])
+    assert e.value.code == 1
+    assert "module:attribute" in capsys.readouterr().err
+
+
+def test_module_entry_point(tmp_path):
+    path = tmp_path / "generated.py"
+    subprocess.run(
+        [sys.executable, "-m", "duper", "compile", "tests.test_source:TEMPLATE", "-o", path],
+        check=True,
+    )
+    check(load(path).produce())